@@ -0,0 +1,352 @@
+"""
+Aggregazioni per gruppo in un solo passaggio sui dati (per store, per gioco,
+per store e rating, ...).
+
+Le chiavi vengono normalizzate prima del raggruppamento: storeID 1, "1" e 1.0
+finiscono nello stesso gruppo (chiave 1), i valori mancanti o vuoti vengono
+esclusi. Ogni combinazione di chiavi diventa un ID di gruppo intero,
+e le statistiche si calcolano con operazioni numpy su tutti i gruppi insieme:
+    - size, count, sum, mean: np.bincount;
+    - min, max: np.minimum.at / np.maximum.at, o dall'ordinamento se serve
+      anche la mediana;
+    - median e percentili: ogni valore diventa una chiave a 64 bit (ID di
+      gruppo nei 32 bit alti, valore in una forma a 32 bit che ne conserva
+      l'ordine in quelli bassi) e un solo np.sort ordina per gruppo e poi
+      per valore; ogni gruppo è un tratto contiguo dell'array e il
+      percentile si legge per posizione, con interpolazione lineare come
+      pandas.
+
+I valori float32 (quelli del parser) entrano nei 32 bit così come sono; per
+gli altri si usa la posizione del valore nell'ordinamento della colonna,
+calcolata una volta e riusata tra più raggruppamenti dello stesso DataFrame
+(vedi aggregate_many).
+"""
+import numpy as np
+import pandas as pd
+
+DEFAULT_STATS = ("count", "mean", "min", "max", "median")
+
+# Statistiche supportate, oltre ai percentili ("p90" = 90° percentile)
+STATS = ("count", "sum", "mean", "min", "max", "median")
+
+# Oltre questo numero di combinazioni di chiavi, gli ID di gruppo si
+# compattano con np.unique invece che con un contatore per combinazione
+MAX_DENSE_GROUPS = 1 << 24
+
+
+def normalize_key(value):
+    """
+    Valore normalizzato di una chiave (None se mancante)
+
+    Gli ID numerici diventano interi (1, "1", " 01" e 1.0 -> 1), le altre
+    chiavi stringhe senza spazi ai bordi.
+    """
+    if value is None:
+        return None
+    if isinstance(value, (bool, np.bool_)):
+        return str(bool(value))
+    if isinstance(value, (float, np.floating)):
+        if np.isnan(value):
+            return None
+        if float(value).is_integer():
+            return int(value)
+        return repr(float(value))
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    label = str(value).strip()
+    if not label:
+        return None
+    if label.isdigit():
+        return int(label)
+    return label
+
+
+def _label_sort_key(label):
+    # ID numerici in ordine numerico, poi le altre chiavi in ordine alfabetico
+    return (0, label, "") if isinstance(label, int) else (1, 0, label)
+
+
+def normalize_keys(values):
+    """
+    Codici interi e chiavi normalizzate di una colonna chiave (vedi normalize_key)
+
+    La normalizzazione avviene sui soli valori distinti (pd.factorize), non
+    riga per riga; le colonne intere non vengono nemmeno convertite.
+
+    Args:
+        values: Series, array o lista
+
+    Returns:
+        (codici int64 con -1 per i mancanti, array delle chiavi in ordine:
+        int64 se sono tutte numeriche, altrimenti object)
+    """
+    series = values if isinstance(values, pd.Series) else pd.Series(values)
+    if pd.api.types.is_integer_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype):
+        codes, uniques = pd.factorize(series, sort=True)
+        return codes.astype(np.int64, copy=False), np.asarray(uniques, dtype=np.int64)
+
+    codes, uniques = pd.factorize(series)
+    labels = [normalize_key(value) for value in uniques]
+    ordered = sorted({label for label in labels if label is not None}, key=_label_sort_key)
+    position = {label: i for i, label in enumerate(ordered)}
+    # Un posto in più in fondo: il codice -1 di factorize resta -1
+    remap = np.array([position.get(label, -1) for label in labels] + [-1], dtype=np.int64)
+    numeric = all(isinstance(label, int) for label in ordered)
+    return remap[codes], np.array(ordered, dtype=np.int64 if numeric else object)
+
+
+def _float32_keys(values):
+    """
+    float32 -> uint32 con lo stesso ordinamento (bit di segno invertito,
+    negativi complementati); i NaN diventano la chiave massima
+    """
+    bits = values.view(np.uint32)
+    keys = np.where(bits >> 31 == 1, ~bits, bits | np.uint32(0x80000000))
+    keys[np.isnan(values)] = np.uint32(0xFFFFFFFF)
+    return keys
+
+
+def _float32_values(keys):
+    """Inversa di _float32_keys"""
+    bits = np.where(keys >> 31 == 1, keys & np.uint32(0x7FFFFFFF), ~keys)
+    return bits.view(np.float32).astype(np.float64)
+
+
+def _percentile_name(q):
+    return f"p{q:g}".replace(".", "_")
+
+
+class Aggregator:
+    """
+    Statistiche per gruppo su un DataFrame
+
+    Le conversioni delle colonne di valori (array float64, chiavi di
+    ordinamento) si calcolano una volta e valgono per tutti i raggruppamenti.
+
+    Args:
+        df: DataFrame
+        values: Colonne numeriche da aggregare
+    """
+
+    def __init__(self, df, values):
+        self.df = df
+        self.values = [column for column in values if column in df.columns]
+        self._arrays = {}
+        self._keys = {}
+
+    def _array(self, column):
+        """(valori float64 con i NaN a 0, righe con NaN)"""
+        if column not in self._arrays:
+            array = self.df[column].to_numpy(dtype="float64", na_value=np.nan)
+            nan = np.isnan(array)
+            if nan.any():
+                array = np.where(nan, 0.0, array)
+            self._arrays[column] = (array, nan)
+        return self._arrays[column]
+
+    def _order_keys(self, column):
+        """
+        Chiavi uint32 che ordinano i valori della colonna, NaN in fondo
+
+        Returns:
+            (chiavi, valori in ordine per decodificare le posizioni, o None se
+            le chiavi sono i bit float32 dei valori)
+        """
+        if column not in self._keys:
+            series = self.df[column]
+            if series.dtype == np.float32:
+                compact = series.to_numpy()
+                exact = True
+            else:
+                original = series.to_numpy(dtype="float64", na_value=np.nan)
+                compact = original.astype(np.float32)
+                exact = np.array_equal(compact.astype(np.float64), original, equal_nan=True)
+            if exact:
+                self._keys[column] = (_float32_keys(compact), None)
+            else:
+                # Posizione nell'ordinamento (argsort mette i NaN in fondo)
+                order = np.argsort(original)
+                keys = np.empty(len(original), dtype=np.uint32)
+                keys[order] = np.arange(len(original), dtype=np.uint32)
+                self._keys[column] = (keys, original[order])
+        return self._keys[column]
+
+    def _groups(self, by):
+        """
+        Gruppo di ogni riga e tabella delle chiavi
+
+        Returns:
+            (gruppo per riga: 0 = chiave mancante, i gruppi veri partono da 1;
+            numero di gruppi; dizionario {nome chiave: etichette per gruppo})
+        """
+        keys = []
+        names = []
+        for key in by:
+            if isinstance(key, str):
+                names.append(key)
+                key = self.df[key]
+            else:
+                names.append(getattr(key, "name", None) or f"key{len(names)}")
+            keys.append(normalize_keys(key))
+
+        if len(keys) == 1:
+            # Chiave singola: i codici sono già gli ID dei gruppi, in ordine
+            codes, labels = keys[0]
+            return codes + 1, len(labels), {names[0]: labels}
+
+        sizes = [max(len(labels), 1) for _, labels in keys]
+        combined = np.zeros(len(self.df), dtype=np.int64)
+        missing = np.zeros(len(self.df), dtype=bool)
+        for (codes, _), size in zip(keys, sizes):
+            missing |= codes < 0
+            combined = combined * size + np.maximum(codes, 0)
+
+        total = int(np.prod(sizes, dtype=np.float64))
+        if total <= MAX_DENSE_GROUPS:
+            present = np.flatnonzero(np.bincount(combined[~missing], minlength=total))
+            remap = np.zeros(total, dtype=np.int64)
+            remap[present] = np.arange(1, len(present) + 1)
+            groups = remap[combined]
+        else:
+            present, inverse = np.unique(combined[~missing], return_inverse=True)
+            groups = np.zeros(len(self.df), dtype=np.int64)
+            groups[~missing] = inverse + 1
+        groups[missing] = 0
+
+        # Da ID combinato alle etichette di ogni chiave
+        table = {}
+        rest = present
+        for name, (_, labels), size in zip(reversed(names), reversed(keys), reversed(sizes)):
+            table[name] = labels[rest % size]
+            rest = rest // size
+        return groups, len(present), {name: table[name] for name in names}
+
+    def by(self, by, stats=DEFAULT_STATS, percentiles=()):
+        """
+        Statistiche per gruppo
+
+        Args:
+            by: Colonna chiave o lista di chiavi (nomi di colonna o Series allineate al DataFrame)
+            stats: Statistiche per ogni colonna di valori (vedi STATS)
+            percentiles: Percentili da 0 a 100 (es. (25, 75, 90))
+
+        Returns:
+            DataFrame con una riga per gruppo (ordinato per chiave): colonne
+            chiave (valori normalizzati), size (righe del gruppo) e
+            <colonna>_<statistica>, es. salePrice_median, salePrice_p90
+
+        Raises:
+            ValueError: Se una statistica non è supportata
+        """
+        by = [by] if isinstance(by, str) or not isinstance(by, (list, tuple)) else list(by)
+        unknown = [stat for stat in stats if stat not in STATS]
+        if unknown:
+            raise ValueError(f"Statistiche non supportate: {', '.join(unknown)}")
+
+        groups, n_groups, table = self._groups(by)
+        result = dict(table)
+        # Indice 0 = righe senza chiave, escluse dai risultati
+        sizes = np.bincount(groups, minlength=n_groups + 1)
+        result["size"] = sizes[1:]
+
+        quantiles = []
+        for stat, q in (("min", 0.0), ("max", 1.0), ("median", 0.5)):
+            if stat in stats:
+                quantiles.append((stat, q))
+        quantiles += [(_percentile_name(q), q / 100.0) for q in percentiles]
+
+        shifted = None
+        for column in self.values:
+            array, nan = self._array(column)
+            count = sizes - (np.bincount(groups[nan], minlength=n_groups + 1) if nan.any() else 0)
+            if "count" in stats:
+                result[f"{column}_count"] = count[1:]
+            if "sum" in stats or "mean" in stats:
+                total = np.bincount(groups, weights=array, minlength=n_groups + 1)
+                if "sum" in stats:
+                    result[f"{column}_sum"] = total[1:]
+                if "mean" in stats:
+                    with np.errstate(invalid="ignore", divide="ignore"):
+                        result[f"{column}_mean"] = total[1:] / count[1:]
+
+            if "median" in stats or percentiles:
+                if shifted is None:
+                    shifted = groups.astype(np.uint64) << np.uint64(32)
+                for name, values in self._quantiles(column, shifted, sizes, count, quantiles).items():
+                    result[f"{column}_{name}"] = values
+            else:
+                for name, values in self._extremes(column, groups, count, stats).items():
+                    result[f"{column}_{name}"] = values
+        return pd.DataFrame(result)
+
+    def _extremes(self, column, groups, count, stats):
+        """min e max senza ordinamento"""
+        out = {}
+        array, nan = self._array(column)
+        empty = count[1:] == 0
+        for stat, ufunc, start in (("min", np.minimum, np.inf), ("max", np.maximum, -np.inf)):
+            if stat not in stats:
+                continue
+            extreme = np.full(len(count), start)
+            if nan.any():
+                ufunc.at(extreme, groups[~nan], array[~nan])
+            else:
+                ufunc.at(extreme, groups, array)
+            extreme = extreme[1:]
+            extreme[empty] = np.nan
+            out[stat] = extreme
+        return out
+
+    def _quantiles(self, column, shifted, sizes, count, quantiles):
+        """Quantili per gruppo con un solo sort delle chiavi (gruppo, valore)"""
+        keys, sorted_values = self._order_keys(column)
+        # Gruppo nei 32 bit alti e valore in quelli bassi: dopo il sort ogni
+        # gruppo è contiguo, in ordine di valore, con i NaN in fondo
+        combined = shifted | keys
+        combined.sort()
+
+        starts = np.cumsum(sizes) - sizes
+        starts, count = starts[1:], count[1:]
+        filled = count > 0
+        first = starts[filled]
+        last = first + count[filled] - 1
+
+        def value_at(positions):
+            low_bits = (combined[positions] & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+            return _float32_values(low_bits) if sorted_values is None else sorted_values[low_bits]
+
+        out = {}
+        for name, q in quantiles:
+            result = np.full(len(count), np.nan)
+            position = first + q * (last - first)
+            low = np.floor(position).astype(np.int64)
+            high = np.minimum(low + 1, last)
+            low_values = value_at(low)
+            result[filled] = low_values + (value_at(high) - low_values) * (position - low)
+            out[name] = result
+        return out
+
+
+def aggregate(df, by, values, stats=DEFAULT_STATS, percentiles=()):
+    """
+    Statistiche per gruppo in un solo passaggio (vedi Aggregator.by)
+
+    Esempio:
+        aggregate(deals, "storeID", ["salePrice", "savings"], percentiles=(25, 75))
+    """
+    return Aggregator(df, values).by(by, stats, percentiles)
+
+
+def aggregate_many(df, groupings, values, stats=DEFAULT_STATS, percentiles=()):
+    """
+    Più raggruppamenti sullo stesso DataFrame, ordinando i valori una sola volta
+
+    Args:
+        groupings: Dizionario {nome: chiave o lista di chiavi},
+            es. {"store": "storeID", "game": "gameID", "store_rating": ["storeID", "steamRating"]}
+
+    Returns:
+        Dizionario {nome: DataFrame come Aggregator.by}
+    """
+    aggregator = Aggregator(df, values)
+    return {name: aggregator.by(by, stats, percentiles) for name, by in groupings.items()}
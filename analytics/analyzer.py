@@ -1,5 +1,8 @@
 import pandas as pd
 
+from .aggregate import aggregate, normalize_key
+from .online_stats import DealStats
+
 def average_saving(df):
     if df.empty:
         return 0.0
@@ -22,32 +25,8 @@ def get_statistics(df):
     if df.empty:
         return {}
     
-    stats = {}
-    stats["total_deals"] = len(df)
-    
-    if "savings" in df.columns:
-        stats["avg_saving"] = df["savings"].mean()
-        stats["max_saving"] = df["savings"].max()
-        stats["deals_over_50"] = len(df[df["savings"] >= 50])
-        stats["deals_over_75"] = len(df[df["savings"] >= 75])
-        stats["deals_over_90"] = len(df[df["savings"] >= 90])
-    else:
-        stats["avg_saving"] = 0
-        stats["max_saving"] = 0
-        stats["deals_over_50"] = 0
-        stats["deals_over_75"] = 0
-        stats["deals_over_90"] = 0
-    
-    if "salePrice" in df.columns:
-        stats["min_price"] = df["salePrice"].min()
-        stats["max_price"] = df["salePrice"].max()
-        stats["avg_price"] = df["salePrice"].mean()
-    else:
-        stats["min_price"] = 0
-        stats["max_price"] = 0
-        stats["avg_price"] = 0
-    
-    return stats
+    # Accumulatori incrementali: un solo passaggio per colonna, soglie comprese
+    return DealStats().update(df).result()
 
 def best_store_for_game(df, stores_dict):
     if df.empty:
@@ -85,27 +64,28 @@ def store_analysis(df, stores_dict):
     if "storeID" not in df.columns:
         return pd.DataFrame()
     
+    # Un solo raggruppamento per tutti gli store; le chiavi normalizzate fanno
+    # corrispondere storeID numerici, stringhe e categorie
+    per_store = aggregate(df, "storeID", ["savings", "salePrice"], stats=("mean", "min", "max", "median"))
+    per_store = per_store.set_index("storeID")
+    
     store_stats = []
     for store_id, store_name in stores_dict.items():
-        store_deals = df[df["storeID"] == store_id]
-        
-        if store_deals.empty:
+        label = normalize_key(store_id)
+        if label not in per_store.index:
             continue
         
-        numero_offerte = len(store_deals)
-        risparmio_medio = store_deals["savings"].mean()
-        prezzo_medio = store_deals["salePrice"].mean()
-        prezzo_minimo = store_deals["salePrice"].min()
-        prezzo_massimo = store_deals["salePrice"].max()
-        
+        row = per_store.loc[label]
+        # float() evita che i float32 del parser compaiano come 43.529999 nelle tabelle
         stat = {
             "storeID": store_id,
             "storeName": store_name,
-            "numDeals": numero_offerte,
-            "avgSavings": risparmio_medio,
-            "avgPrice": prezzo_medio,
-            "minPrice": prezzo_minimo,
-            "maxPrice": prezzo_massimo
+            "numDeals": int(row["size"]),
+            "avgSavings": float(row.get("savings_mean", float("nan"))),
+            "avgPrice": float(row.get("salePrice_mean", float("nan"))),
+            "minPrice": float(row.get("salePrice_min", float("nan"))),
+            "maxPrice": float(row.get("salePrice_max", float("nan"))),
+            "medianPrice": float(row.get("salePrice_median", float("nan")))
         }
         store_stats.append(stat)
     
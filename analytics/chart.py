@@ -5,22 +5,46 @@ from PIL import Image
 import requests
 from io import BytesIO
 import numpy as np
+import asyncio
+from data import async_fetcher
 
 CHARTS_DIR = "charts"
 
+def decode_image(content, max_size=(100, 100)):
+    if not content:
+        return None
+    try:
+        img = Image.open(BytesIO(content))
+        img.thumbnail(max_size, Image.Resampling.LANCZOS)
+        return np.array(img)
+    except:
+        return None
+
 def load_image_from_url(url, max_size=(100, 100)):
     if not url:
         return None
     try:
         response = requests.get(url, timeout=5)
         if response.status_code == 200:
-            img = Image.open(BytesIO(response.content))
-            img.thumbnail(max_size, Image.Resampling.LANCZOS)
-            return np.array(img)
+            return decode_image(response.content, max_size)
     except:
         pass
     return None
 
+async def load_images_async(urls, max_size=(100, 100)):
+    """Scarica in parallelo le immagini indicate; restituisce una lista allineata a urls"""
+    async def load(url):
+        if not url:
+            return None
+        content = await async_fetcher.fetch_url(url)
+        return decode_image(content, max_size)
+    
+    return await asyncio.gather(*(load(url) for url in urls))
+
+def load_images(urls, max_size=(100, 100)):
+    """Versione sincrona di load_images_async"""
+    return async_fetcher.run(load_images_async(urls, max_size))
+
 def ensure_charts_dir():
     if not os.path.exists(CHARTS_DIR):
         os.makedirs(CHARTS_DIR)
@@ -37,13 +61,14 @@ def plot_savings_trend(df):
     colors = plt.cm.viridis(df_sorted["savings"] / df_sorted["savings"].max())
     bars = ax.barh(range(len(df_sorted)), df_sorted["savings"], color=colors, alpha=0.8, edgecolor="black", linewidth=0.5)
     
-    print("📥 Caricamento thumbnail dei giochi...")
+    if "thumb" in df_sorted.columns:
+        images = load_images(list(df_sorted["thumb"].fillna("")), max_size=(80, 80))
+    else:
+        images = [None] * len(df_sorted)
     for i, (idx, row) in enumerate(df_sorted.iterrows()):
-        thumb_url = row.get("thumb", "")
-        if thumb_url:
-            img = load_image_from_url(thumb_url, max_size=(80, 80))
-            if img is not None:
-                ax.imshow(img, extent=[-8, -1, i-0.4, i+0.4], aspect="auto", zorder=3)
+        img = images[i]
+        if img is not None:
+            ax.imshow(img, extent=[-8, -1, i-0.4, i+0.4], aspect="auto", zorder=3)
         
         ax.text(row["savings"], i, f"{row['savings']:.1f}%", va="center", ha="left", fontweight="bold", fontsize=9)
         ax.text(-9, i, f"${row['salePrice']:.2f}", va="center", ha="right", fontsize=8, color="gray")
@@ -62,8 +87,8 @@ def plot_savings_trend(df):
     
     filepath = os.path.join(CHARTS_DIR, "savings_trend.png")
     plt.savefig(filepath, dpi=300, bbox_inches="tight", facecolor="white")
-    print(f"✓ Grafico salvato: {filepath}")
     plt.close()
+    return filepath
 
 def plot_store_comparison(store_df):
     if store_df.empty:
@@ -96,8 +121,8 @@ def plot_store_comparison(store_df):
     plt.tight_layout()
     filepath = os.path.join(CHARTS_DIR, "store_comparison.png")
     plt.savefig(filepath, dpi=300, bbox_inches="tight", facecolor="white")
-    print(f"✓ Grafico salvato: {filepath}")
     plt.close()
+    return filepath
 
 def plot_game_prices(game_df, game_title, stores_dict, thumb_url=None):
     if game_df.empty or "price" not in game_df.columns:
@@ -164,7 +189,6 @@ def plot_game_prices(game_df, game_title, stores_dict, thumb_url=None):
             ax_main.legend(by_label.values(), by_label.keys(), loc="lower right", fontsize=10, framealpha=0.9)
     
     if thumb_url:
-        print("📥 Caricamento thumbnail del gioco...")
         img = load_image_from_url(thumb_url, max_size=(250, 250))
         if img is not None:
             ax_thumb.imshow(img)
@@ -175,6 +199,6 @@ def plot_game_prices(game_df, game_title, stores_dict, thumb_url=None):
     safe_title = "".join(c if c.isalnum() or c in (' ', '-', '_') else '_' for c in game_title)[:30]
     filepath = os.path.join(CHARTS_DIR, f"game_prices_{safe_title.replace(' ', '_')}.png")
     plt.savefig(filepath, dpi=300, bbox_inches="tight", facecolor="white")
-    print(f"✓ Grafico salvato: {filepath}")
     plt.close()
+    return filepath
 
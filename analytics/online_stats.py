@@ -0,0 +1,432 @@
+"""
+Statistiche incrementali sulle offerte, aggiornate batch per batch.
+
+Ogni accumulatore tiene uno stato di dimensione fissa (non dipende dal numero
+di offerte viste), si aggiorna con un batch alla volta (es. una pagina di
+stream_deals) e si può unire a un altro accumulatore dello stesso tipo (merge),
+per esempio quelli calcolati da processi diversi su pagine diverse:
+    - RunningStats: conteggio, media e varianza (Welford, nella forma a
+      blocchi di Chan per unire due insiemi), minimo e massimo;
+    - ThresholdCounter: quanti valori sono >= di ogni soglia, in un passaggio;
+    - QuantileSketch: percentili approssimati con errore relativo limitato
+      (bucket logaritmici come DDSketch: con accuratezza 0.01 il valore
+      restituito dista al massimo l'1% da quello esatto);
+    - DealStats: tutte le statistiche di get_statistics su prezzo e sconto.
+
+Gli accumulatori si possono serializzare con pickle (ProcessPoolExecutor) o
+con to_dict/from_dict (JSON).
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+# Soglie di sconto (%) contate da get_statistics (deals_over_50, ...)
+SAVING_THRESHOLDS = (50, 75, 90)
+
+# Percentili di prezzo e sconto calcolati da DealStats
+PERCENTILES = (25, 50, 75, 90)
+
+# Errore relativo massimo dei percentili
+RELATIVE_ACCURACY = 0.01
+
+# Valori in modulo sotto questa soglia finiscono nel bucket dello zero
+MIN_INDEXABLE = 1e-9
+
+
+def _column(batch, column):
+    """Colonna di un batch come float64 (le stringhe dell'API vengono convertite)"""
+    series = batch[column]
+    if not pd.api.types.is_numeric_dtype(series.dtype):
+        series = pd.to_numeric(series, errors="coerce")
+    return series.to_numpy(dtype="float64", na_value=np.nan)
+
+
+def _values(values):
+    """Array float64 senza NaN"""
+    array = np.asarray(values, dtype=np.float64)
+    return array[~np.isnan(array)]
+
+
+class RunningStats:
+    """Conteggio, media, varianza, minimo e massimo di un flusso di valori"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, values):
+        """Aggiunge un batch di valori (i NaN vengono ignorati)"""
+        values = _values(values)
+        if len(values):
+            mean = float(values.mean())
+            self._combine(len(values), mean, float(np.square(values - mean).sum()),
+                          float(values.min()), float(values.max()))
+        return self
+
+    def merge(self, other):
+        """Unisce le statistiche di un altro accumulatore"""
+        if other.count:
+            self._combine(other.count, other.mean, other.m2, other.min, other.max)
+        return self
+
+    def _combine(self, count, mean, m2, low, high):
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+        self.min = min(self.min, low)
+        self.max = max(self.max, high)
+
+    @property
+    def variance(self):
+        """Varianza campionaria (come pandas, ddof=1); NaN con meno di due valori"""
+        return self.m2 / (self.count - 1) if self.count > 1 else math.nan
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance) if self.count > 1 else math.nan
+
+    def result(self):
+        """Dizionario con count, mean, std, min, max (NaN se non ci sono valori)"""
+        empty = self.count == 0
+        return {
+            "count": self.count,
+            "mean": math.nan if empty else self.mean,
+            "std": self.std,
+            "min": math.nan if empty else self.min,
+            "max": math.nan if empty else self.max,
+        }
+
+    def to_dict(self):
+        return {"count": self.count, "mean": self.mean, "m2": self.m2,
+                "min": self.min if self.count else None, "max": self.max if self.count else None}
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.count, stats.mean, stats.m2 = data["count"], data["mean"], data["m2"]
+        if stats.count:
+            stats.min, stats.max = data["min"], data["max"]
+        return stats
+
+
+class ThresholdCounter:
+    """
+    Numero di valori maggiori o uguali a ogni soglia
+
+    Args:
+        thresholds: Soglie (es. (50, 75, 90))
+    """
+
+    def __init__(self, thresholds=SAVING_THRESHOLDS):
+        self.thresholds = tuple(sorted(thresholds))
+        self.counts = np.zeros(len(self.thresholds), dtype=np.int64)
+
+    def update(self, values):
+        """Aggiunge un batch di valori: un solo passaggio per tutte le soglie"""
+        values = _values(values)
+        if len(values):
+            # Per ogni valore, quante soglie sono <= del valore
+            passed = np.searchsorted(self.thresholds, values, side="right")
+            histogram = np.bincount(passed, minlength=len(self.thresholds) + 1)
+            # Valori >= soglia i: quelli che superano almeno i + 1 soglie
+            self.counts += np.cumsum(histogram[::-1])[::-1][1:]
+        return self
+
+    def merge(self, other):
+        if other.thresholds != self.thresholds:
+            raise ValueError("Soglie diverse: impossibile unire i contatori")
+        self.counts += other.counts
+        return self
+
+    def result(self):
+        """Dizionario {soglia: conteggio}"""
+        return {threshold: int(count) for threshold, count in zip(self.thresholds, self.counts)}
+
+    def to_dict(self):
+        return {"thresholds": list(self.thresholds), "counts": self.counts.tolist()}
+
+    @classmethod
+    def from_dict(cls, data):
+        counter = cls(data["thresholds"])
+        counter.counts = np.array(data["counts"], dtype=np.int64)
+        return counter
+
+
+class QuantileSketch:
+    """
+    Percentili approssimati di un flusso di valori con memoria limitata
+
+    I valori vengono contati in bucket logaritmici: il bucket i contiene i
+    valori tra gamma^(i-1) e gamma^i, con gamma = (1 + a) / (1 - a). Il
+    numero di bucket dipende solo dall'intervallo dei valori (da 0.01 a 1000
+    con a = 0.01 sono circa 600), non da quanti valori si aggiungono.
+
+    Args:
+        relative_accuracy: Errore relativo massimo a dei percentili
+    """
+
+    def __init__(self, relative_accuracy=RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.positive = {}
+        self.negative = {}
+        self.zeros = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _add(self, buckets, values):
+        indexes = np.ceil(np.log(values) / self._log_gamma).astype(np.int64)
+        # Gli indici di un batch sono pochi e vicini: un contatore per indice
+        lowest = int(indexes.min())
+        counts = np.bincount(indexes - lowest)
+        for offset in np.flatnonzero(counts).tolist():
+            index = lowest + offset
+            buckets[index] = buckets.get(index, 0) + int(counts[offset])
+
+    def update(self, values):
+        """Aggiunge un batch di valori (i NaN vengono ignorati)"""
+        values = _values(values)
+        if not len(values):
+            return self
+        self.count += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        positive = values >= MIN_INDEXABLE
+        negative = values <= -MIN_INDEXABLE
+        self.zeros += len(values) - int(np.count_nonzero(positive)) - int(np.count_nonzero(negative))
+        if positive.any():
+            self._add(self.positive, values[positive])
+        if negative.any():
+            self._add(self.negative, -values[negative])
+        return self
+
+    def merge(self, other):
+        if other.gamma != self.gamma:
+            raise ValueError("Accuratezza diversa: impossibile unire gli sketch")
+        for buckets, other_buckets in ((self.positive, other.positive), (self.negative, other.negative)):
+            for index, count in other_buckets.items():
+                buckets[index] = buckets.get(index, 0) + count
+        self.zeros += other.zeros
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def _value(self, index):
+        # Centro del bucket: al massimo a di errore relativo
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def quantile(self, q):
+        """
+        Percentile approssimato
+
+        Args:
+            q: Quantile tra 0 e 1 (0.5 = mediana)
+
+        Returns:
+            Valore (limitato a minimo e massimo visti), NaN se vuoto
+        """
+        if not self.count:
+            return math.nan
+        rank = q * (self.count - 1)
+        seen = 0
+        # Dal più piccolo: negativi dal modulo più grande, zeri, positivi
+        for index in sorted(self.negative, reverse=True):
+            seen += self.negative[index]
+            if seen > rank:
+                return max(-self._value(index), self.min)
+        seen += self.zeros
+        if seen > rank:
+            return 0.0
+        for index in sorted(self.positive):
+            seen += self.positive[index]
+            if seen > rank:
+                return min(max(self._value(index), self.min), self.max)
+        return self.max
+
+    def __len__(self):
+        """Numero di bucket usati"""
+        return len(self.positive) + len(self.negative) + (1 if self.zeros else 0)
+
+    def to_dict(self):
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "positive": {str(index): count for index, count in self.positive.items()},
+            "negative": {str(index): count for index, count in self.negative.items()},
+            "zeros": self.zeros,
+            "count": self.count,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data["relative_accuracy"])
+        sketch.positive = {int(index): count for index, count in data["positive"].items()}
+        sketch.negative = {int(index): count for index, count in data["negative"].items()}
+        sketch.zeros, sketch.count = data["zeros"], data["count"]
+        if sketch.count:
+            sketch.min, sketch.max = data["min"], data["max"]
+        return sketch
+
+
+class DealStats:
+    """
+    Statistiche di get_statistics calcolate batch per batch
+
+    Uso:
+        stats = DealStats()
+        df = deal_batches_to_dataframe(stream_deals(), on_batch=stats.update)
+        stats.result()  # pronto all'arrivo dell'ultima pagina
+
+    Args:
+        thresholds: Soglie di sconto da contare
+        percentiles: Percentili di prezzo e sconto (da 0 a 100)
+        relative_accuracy: Errore relativo massimo dei percentili
+    """
+
+    def __init__(self, thresholds=SAVING_THRESHOLDS, percentiles=PERCENTILES,
+                 relative_accuracy=RELATIVE_ACCURACY):
+        self.percentiles = tuple(percentiles)
+        self.rows = 0
+        self.has_price = False
+        self.has_savings = False
+        self.price = RunningStats()
+        self.savings = RunningStats()
+        self.saving_thresholds = ThresholdCounter(thresholds)
+        self.price_sketch = QuantileSketch(relative_accuracy)
+        self.saving_sketch = QuantileSketch(relative_accuracy)
+
+    def update(self, batch):
+        """
+        Aggiunge un batch di offerte
+
+        Args:
+            batch: DataFrame (es. deals_to_dataframe) o lista di offerte
+                dell'API (dizionari con salePrice e savings come stringhe)
+        """
+        if not isinstance(batch, pd.DataFrame):
+            batch = pd.DataFrame.from_records(batch) if batch else pd.DataFrame()
+        if batch.empty:
+            return self
+        self.rows += len(batch)
+        if "salePrice" in batch.columns:
+            self.has_price = True
+            prices = _column(batch, "salePrice")
+            self.price.update(prices)
+            self.price_sketch.update(prices)
+        if "savings" in batch.columns:
+            self.has_savings = True
+            savings = _column(batch, "savings")
+            self.savings.update(savings)
+            self.saving_thresholds.update(savings)
+            self.saving_sketch.update(savings)
+        return self
+
+    def merge(self, other):
+        """Unisce le statistiche di un altro DealStats (es. calcolato da un altro processo)"""
+        self.rows += other.rows
+        self.has_price = self.has_price or other.has_price
+        self.has_savings = self.has_savings or other.has_savings
+        self.price.merge(other.price)
+        self.savings.merge(other.savings)
+        self.saving_thresholds.merge(other.saving_thresholds)
+        self.price_sketch.merge(other.price_sketch)
+        self.saving_sketch.merge(other.saving_sketch)
+        return self
+
+    def result(self):
+        """
+        Statistiche nel formato di get_statistics
+
+        Returns:
+            Dizionario vuoto se non ci sono offerte; altrimenti total_deals,
+            avg_saving, max_saving, std_saving, deals_over_<soglia>, min_price,
+            max_price, avg_price, std_price, median_price e price_percentiles /
+            saving_percentiles ({percentile: valore})
+        """
+        if not self.rows:
+            return {}
+
+        stats = {"total_deals": self.rows}
+        over = self.saving_thresholds.result()
+        if self.has_savings:
+            savings = self.savings.result()
+            stats["avg_saving"] = savings["mean"]
+            stats["max_saving"] = savings["max"]
+            stats["std_saving"] = savings["std"]
+            stats["saving_percentiles"] = {q: self.saving_sketch.quantile(q / 100) for q in self.percentiles}
+        else:
+            stats["avg_saving"] = 0
+            stats["max_saving"] = 0
+            stats["std_saving"] = 0
+            stats["saving_percentiles"] = {}
+        for threshold, count in over.items():
+            stats[f"deals_over_{threshold:g}"] = count if self.has_savings else 0
+
+        if self.has_price:
+            prices = self.price.result()
+            stats["min_price"] = prices["min"]
+            stats["max_price"] = prices["max"]
+            stats["avg_price"] = prices["mean"]
+            stats["std_price"] = prices["std"]
+            stats["median_price"] = self.price_sketch.quantile(0.5)
+            stats["price_percentiles"] = {q: self.price_sketch.quantile(q / 100) for q in self.percentiles}
+        else:
+            stats["min_price"] = 0
+            stats["max_price"] = 0
+            stats["avg_price"] = 0
+            stats["std_price"] = 0
+            stats["median_price"] = 0
+            stats["price_percentiles"] = {}
+        return stats
+
+    def to_dict(self):
+        return {
+            "percentiles": list(self.percentiles),
+            "rows": self.rows,
+            "has_price": self.has_price,
+            "has_savings": self.has_savings,
+            "price": self.price.to_dict(),
+            "savings": self.savings.to_dict(),
+            "saving_thresholds": self.saving_thresholds.to_dict(),
+            "price_sketch": self.price_sketch.to_dict(),
+            "saving_sketch": self.saving_sketch.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls(data["saving_thresholds"]["thresholds"], data["percentiles"],
+                    data["price_sketch"]["relative_accuracy"])
+        stats.rows, stats.has_price, stats.has_savings = data["rows"], data["has_price"], data["has_savings"]
+        stats.price = RunningStats.from_dict(data["price"])
+        stats.savings = RunningStats.from_dict(data["savings"])
+        stats.saving_thresholds = ThresholdCounter.from_dict(data["saving_thresholds"])
+        stats.price_sketch = QuantileSketch.from_dict(data["price_sketch"])
+        stats.saving_sketch = QuantileSketch.from_dict(data["saving_sketch"])
+        return stats
+
+
+def statistics_from_batches(batches, **options):
+    """
+    Statistiche di un flusso di batch senza tenere in memoria le offerte
+
+    Args:
+        batches: Iteratore di batch (es. stream_deals)
+        options: Opzioni di DealStats
+
+    Returns:
+        Dizionario come DealStats.result
+    """
+    stats = DealStats(**options)
+    for batch in batches:
+        stats.update(batch)
+    return stats.result()
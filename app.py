@@ -1,12 +1,43 @@
-from data.fetcher import get_deals, search_games, get_game_details, get_stores
-from data.parser import deals_to_dataframe, game_details_to_dataframe, search_results_to_dataframe
-from data.saver import save_data
-from data.wishlist import add_to_wishlist, remove_from_wishlist, get_wishlist, check_wishlist_prices
+from data.fetcher import stream_deals, search_games, open_game_details_stream, get_stores, STREAM_CHUNK_SIZE
+from data.parser import deal_batches_to_dataframe, game_deal_batches_to_dataframe, search_results_to_dataframe
+from data.saver import save_data, save_batches, frame_batches
+from data.wishlist import add_to_wishlist, remove_from_wishlist, get_wishlist, check_wishlist_report, alerts_from_diff
 from data.filters import filter_deals, apply_advanced_filters
+from data.query import compile_query, query_from_filters, QueryError
+from data.deals_index import DealsIndex
+from data.title_index import search_titles, update_index
+from data.model import normalize_deals, join_games
+from data.history import record_snapshot, all_time_low
+from data.diff import diff_with_previous, summarize_diff
+from data.scheduler import run_due_checks
 from data.custom_stores import get_all_stores_info, get_custom_stores, search_url_for_store
 from analytics.analyzer import average_saving, top_savings, best_store_for_game, store_analysis, get_statistics
+from analytics.online_stats import DealStats
 from analytics.chart import plot_savings_trend, plot_store_comparison, plot_game_prices
 import os
+import time
+import jobs
+
+# Numero massimo di pagine di offerte da scaricare (None = tutto il catalogo)
+MAX_DEAL_PAGES = None
+
+# Per quanto tempo (secondi) le offerte dell'ultima analisi valgono per la verifica degli alert
+SNAPSHOT_MAX_AGE = 15 * 60
+
+# Offerte dell'ultima analisi completa: {"deals", "games", "time", "index" (creato al primo filtro)}
+_last_snapshot = {}
+
+def snapshot_is_fresh():
+    """True se le offerte dell'ultima analisi completa sono abbastanza recenti"""
+    return bool(_last_snapshot) and time.time() - _last_snapshot["time"] <= SNAPSHOT_MAX_AGE
+
+def snapshot_index():
+    """Indice sulle offerte dell'ultima analisi (costruito una volta per snapshot)"""
+    if "index" not in _last_snapshot:
+        _last_snapshot["index"] = DealsIndex(_last_snapshot["deals"])
+        stats = _last_snapshot["index"].get_stats()
+        print(f"✓ Indice su {stats['rows']} offerte creato in {stats['build_ms']:.1f} ms")
+    return _last_snapshot["index"]
 
 def load_stores():
     stores = get_stores()
@@ -25,16 +56,45 @@ def analyze_all_deals():
     print("="*70)
     
     print("\n📡 Recupero offerte da CheapShark...")
-    deals = get_deals()
-    print(f"✓ Trovate {len(deals)} offerte")
-    
-    df = deals_to_dataframe(deals)
+    # Statistiche aggiornate pagina per pagina: pronte all'arrivo dell'ultima
+    deal_stats = DealStats()
+    df = deal_batches_to_dataframe(stream_deals(max_pages=MAX_DEAL_PAGES), on_batch=deal_stats.update)
+    print(f"✓ Trovate {len(df)} offerte")
     
     if df.empty:
         print("❌ Nessun dato disponibile")
         return
     
-    stats = get_statistics(df)
+    # Tabella giochi + tabella offerte stretta; i titoli si uniscono solo per la visualizzazione
+    games, deals = normalize_deals(df, ["dealID"])
+    del df
+    
+    # Aggiunge lo snapshot allo storico locale dei prezzi
+    history_result = record_snapshot(deals)
+    print(f"✓ Storico prezzi: {history_result['inserted']} variazioni registrate")
+    
+    # Confronto con lo snapshot dell'esecuzione precedente
+    diff, had_previous = diff_with_previous(deals, games=games)
+    if had_previous:
+        counts = summarize_diff(diff)
+        print(f"✓ Rispetto all'ultima analisi: {counts['new']} nuove, {counts['ended']} terminate, "
+              f"{counts['price_dropped']} prezzi scesi, {counts['price_raised']} prezzi saliti, "
+              f"{counts['changed']} con prezzo pieno cambiato")
+        if not diff.empty:
+            diff_path = save_data(diff, "deals_diff", format='csv')
+            if diff_path:
+                print(f"💾 Variazioni salvate in {diff_path}")
+        for alert in alerts_from_diff(diff):
+            print(f"🔔 {alert['title']}: ${alert['currentPrice']:.2f} (target ${float(alert['targetPrice']):.2f})")
+    
+    # Verifica degli alert e filtri possono usare queste offerte invece di interrogare l'API
+    _last_snapshot.clear()
+    _last_snapshot.update(deals=deals, games=games, time=time.time())
+    
+    # Titoli e prezzi migliori per la ricerca offline (search_game)
+    jobs.submit("Indice titoli", update_index, join_games(deals, games, ["title", "steamAppID"]))
+    
+    stats = deal_stats.result()
     
     print("\n" + "─"*70)
     print("📊 STATISTICHE GENERALI")
@@ -43,6 +103,7 @@ def analyze_all_deals():
     print(f"  • Risparmio medio: {stats['avg_saving']:.2f}%")
     print(f"  • Risparmio massimo: {stats['max_saving']:.2f}%")
     print(f"  • Prezzo medio: ${stats['avg_price']:.2f}")
+    print(f"  • Prezzo mediano: ${stats['median_price']:.2f}")
     print(f"  • Prezzo minimo: ${stats['min_price']:.2f}")
     print(f"  • Prezzo massimo: ${stats['max_price']:.2f}")
     print(f"\n  🎯 Offerte con sconto ≥50%: {stats['deals_over_50']}")
@@ -52,7 +113,7 @@ def analyze_all_deals():
     print("\n" + "─"*70)
     print("🏆 TOP 5 OFFERTE CON PIÙ RISPARMIO")
     print("─"*70)
-    top_5 = top_savings(df, 5)
+    top_5 = join_games(top_savings(deals, 5), games, ["title"])
     numero = 1
     for idx in top_5.index:
         row = top_5.loc[idx]
@@ -61,7 +122,7 @@ def analyze_all_deals():
         numero += 1
     
     stores_dict = load_stores()
-    store_df = store_analysis(df, stores_dict)
+    store_df = store_analysis(deals, stores_dict)
     
     if not store_df.empty:
         print("\n" + "─"*70)
@@ -72,34 +133,73 @@ def analyze_all_deals():
         store_df_display["Risparmio Medio (%)"] = store_df_display["Risparmio Medio (%)"].round(2)
         store_df_display["Prezzo Medio ($)"] = store_df_display["Prezzo Medio ($)"].round(2)
         print(store_df_display.to_string(index=False))
-        plot_store_comparison(store_df)
+        jobs.submit_chart("Grafico confronto store", plot_store_comparison, store_df)
     
-    # Salvataggio in CSV
-    csv_path = save_data(df, "deals", format='csv')
-    if csv_path:
-        print(f"\n💾 Dati salvati in {csv_path}")
+    # Export e grafici proseguono in background: il menu torna subito disponibile
+    df = join_games(deals, games)
+    jobs.submit("Export CSV", run_export, save_data, df, "deals", format='csv')
     
     # Offri export multipli
     export_more = input("\n💾 Vuoi esportare anche in altri formati? (s/n): ").strip().lower()
     if export_more == 's':
-        json_path = save_data(df, "deals", format='json')
-        if json_path:
-            print(f"✅ Export JSON completato: {json_path}")
-        else:
-            print("❌ Export JSON fallito")
+        jobs.submit("Export JSON", run_export, save_data, df, "deals", format='json')
         
         try:
             import openpyxl
-            xlsx_path = save_data(df, "deals", format='excel')
-            if xlsx_path:
-                print(f"✅ Export Excel completato: {xlsx_path}")
-            else:
-                print("❌ Export Excel fallito")
+            # Workbook write-only a batch: la memoria non cresce con il numero di righe
+            jobs.submit("Export Excel", run_export, save_batches, frame_batches(df), "deals", format='excel')
         except ImportError:
             print("⚠️  Export Excel non disponibile (installa openpyxl: pip install openpyxl)")
+        
+        try:
+            import pyarrow
+            jobs.submit("Export Parquet", run_export, save_data, df, "deals", format='parquet',
+                        partition_by=['date', 'storeID'])
+        except ImportError:
+            print("⚠️  Export Parquet non disponibile (installa pyarrow: pip install pyarrow)")
     
-    plot_savings_trend(df)
-    print("\n✅ Analisi completata! Grafici salvati nella cartella 'charts/'")
+    jobs.submit_chart("Grafico top 20 offerte", plot_savings_trend,
+                      join_games(top_savings(deals, 20), games, ["title", "thumb"]))
+    print("\n✅ Analisi completata! Export e grafici in corso in background (cartelle 'exports/' e 'charts/')")
+
+def run_export(save_fn, *args, **kwargs):
+    """Esegue una funzione di salvataggio e segnala come errore un export non scritto"""
+    path = save_fn(*args, **kwargs)
+    if not path:
+        raise RuntimeError("nessun file scritto")
+    return path
+
+def report_jobs():
+    """Mostra le attività in background terminate dall'ultima volta"""
+    for job in jobs.collect_finished():
+        if job.status == jobs.FAILED:
+            print(f"❌ {job.name} fallito: {job.error}")
+        elif isinstance(job.result, str):
+            print(f"✅ {job.name} completato: {job.result}")
+        else:
+            print(f"✅ {job.name} completato")
+
+def show_jobs():
+    """Mostra lo stato di tutte le attività in background"""
+    all_jobs = jobs.get_jobs()
+    if not all_jobs:
+        print("\n📭 Nessuna attività in background")
+        return
+    
+    print("\n" + "─"*70)
+    print("⏳ ATTIVITÀ IN BACKGROUND")
+    print("─"*70)
+    icons = {jobs.PENDING: "🕒", jobs.RUNNING: "⏳", jobs.DONE: "✅", jobs.FAILED: "❌"}
+    for job in all_jobs:
+        line = f"  {icons[job.status]} {job.name}"
+        if job.elapsed is not None:
+            line += f" ({job.elapsed:.1f}s)"
+        if job.status == jobs.FAILED:
+            line += f" - {job.error}"
+        elif isinstance(job.result, str):
+            line += f" → {job.result}"
+        print(line)
+        job.reported = True
 
 def search_game():
     print("\n" + "="*70)
@@ -112,8 +212,11 @@ def search_game():
         print("❌ Nome non valido")
         return
     
-    print(f"\n🔎 Ricerca di '{title}'...")
-    results = search_games(title)
+    # Prima l'indice locale dei titoli (nessuna richiesta, tollera errori di battitura)
+    results = search_titles(title)
+    offline = bool(results)
+    if not offline:
+        results = search_online(title)
     
     if not results:
         print("❌ Nessun gioco trovato")
@@ -121,24 +224,32 @@ def search_game():
     
     df = search_results_to_dataframe(results)
     
-    print(f"\n✅ Trovati {len(df)} giochi:")
+    source = " (indice locale, prezzi dell'ultima analisi)" if offline else ""
+    print(f"\n✅ Trovati {len(df)} giochi{source}:")
     print("─"*70)
-    numero = 1
-    for idx in df.index:
-        row = df.loc[idx]
-        if row['steamAppID']:
-            steam_info = f"Steam ID: {row['steamAppID']}"
-        else:
-            steam_info = "Non su Steam"
-        print(f"  {numero}. {row['title']}")
-        print(f"     💰 Prezzo migliore: ${row['cheapest']:.2f} | {steam_info}")
-        numero += 1
+    show_search_results(df)
     
-    choice = input("\n📝 Inserisci il numero del gioco per vedere i dettagli (0 per annullare): ").strip()
+    if offline:
+        choice = input("\n📝 Inserisci il numero del gioco per vedere i dettagli (0 per annullare, o per cercare online): ").strip()
+    else:
+        choice = input("\n📝 Inserisci il numero del gioco per vedere i dettagli (0 per annullare): ").strip()
     
     if choice == "0":
         return
     
+    if offline and choice.lower() == "o":
+        results = search_online(title)
+        if not results:
+            print("❌ Nessun gioco trovato")
+            return
+        df = search_results_to_dataframe(results)
+        print(f"\n✅ Trovati {len(df)} giochi:")
+        print("─"*70)
+        show_search_results(df)
+        choice = input("\n📝 Inserisci il numero del gioco per vedere i dettagli (0 per annullare): ").strip()
+        if choice == "0":
+            return
+    
     try:
         idx = int(choice) - 1
         
@@ -150,20 +261,47 @@ def search_game():
             print("❌ Scelta non valida")
             return
         
-        game_id = df.iloc[idx]["gameID"]
+        game_id = str(df.iloc[idx]["gameID"])
         game_title = df.iloc[idx]["title"]
         show_game_details(game_id, game_title)
         
     except ValueError:
         print("❌ Inserisci un numero valido")
 
+def search_online(title):
+    """Ricerca con l'API; i risultati vengono aggiunti all'indice locale dei titoli"""
+    print(f"\n🔎 Ricerca di '{title}'...")
+    results = search_games(title)
+    if results:
+        jobs.submit("Indice titoli", update_index, search_results_to_dataframe(results))
+    return results
+
+def show_search_results(df):
+    numero = 1
+    for idx in df.index:
+        row = df.loc[idx]
+        if row['steamAppID']:
+            steam_info = f"Steam ID: {row['steamAppID']}"
+        else:
+            steam_info = "Non su Steam"
+        print(f"  {numero}. {row['title']}")
+        if row['cheapest'] == row['cheapest']:
+            print(f"     💰 Prezzo migliore: ${row['cheapest']:.2f} | {steam_info}")
+        else:
+            print(f"     💰 Prezzo migliore: n/d | {steam_info}")
+        numero += 1
+
 def show_game_details(game_id, game_title):
     print("\n" + "="*70)
     print(f" " * 20 + f"DETTAGLI: {game_title}")
     print("="*70)
     
     print("\n📡 Recupero dettagli...")
-    game_data = get_game_details(game_id)
+    # Offerte decodificate a pezzi direttamente nel DataFrame; info e
+    # cheapestPriceEver sono disponibili a lettura completata
+    with open_game_details_stream(game_id) as stream:
+        deals_df = game_deal_batches_to_dataframe(stream.batches(STREAM_CHUNK_SIZE))
+        game_data = stream.extra
     
     if not game_data:
         print("❌ Dettagli non disponibili")
@@ -195,7 +333,12 @@ def show_game_details(game_id, game_title):
             except:
                 pass
     
-    deals_df = game_details_to_dataframe(game_data)
+    # Minimo registrato nello storico locale (se il gioco è già stato visto)
+    local_lows = all_time_low(game_id)
+    if not local_lows.empty:
+        best_low = local_lows.sort_values("lowPrice").iloc[0]
+        date_str = best_low["date"].strftime("%d/%m/%Y")
+        print(f"  📉 Minimo nello storico locale: ${best_low['lowPrice']:.2f} ({date_str})")
     
     if not deals_df.empty:
         stores_dict = load_stores()
@@ -226,8 +369,10 @@ def show_game_details(game_id, game_title):
             print(f"  • Risparmi: ${saved:.2f}")
         
         thumb_url = info.get("thumb", "")
-        plot_game_prices(deals_df, game_title, stores_dict, thumb_url)
-        print(f"\n✅ Grafico salvato nella cartella 'charts/'")
+        # Come gli altri grafici: pyplot viene usato da un solo thread alla volta
+        jobs.submit_chart(f"Grafico prezzi {game_title}", plot_game_prices,
+                          deals_df, game_title, stores_dict, thumb_url)
+        print("\n⏳ Grafico in preparazione in background (cartella 'charts/')")
         
         # Mostra link per ricerca su store aggiuntivi
         show_additional_stores_links(game_title)
@@ -247,22 +392,8 @@ def show_game_details(game_id, game_title):
     else:
         print("\n❌ Nessuna offerta disponibile al momento")
 
-def analyze_with_filters():
-    """Analizza le offerte con filtri avanzati"""
-    print("\n" + "="*70)
-    print(" " * 15 + "ANALISI OFFERTE CON FILTRI")
-    print("="*70)
-    
-    print("\n📡 Recupero offerte da CheapShark...")
-    deals = get_deals()
-    print(f"✓ Trovate {len(deals)} offerte")
-    
-    df = deals_to_dataframe(deals)
-    
-    if df.empty:
-        print("❌ Nessun dato disponibile")
-        return
-    
+def ask_guided_filters():
+    """Chiede i filtri uno alla volta e restituisce l'espressione equivalente (None se nessun filtro)"""
     print("\n🔧 Configura i filtri (lascia vuoto per saltare):")
     
     # Prezzo minimo
@@ -291,9 +422,58 @@ def analyze_with_filters():
         except:
             print("  ⚠️  Formato non valido, verranno mostrati tutti gli store")
     
-    # Applica filtri
-    filtered_df = filter_deals(df, min_price=min_price, max_price=max_price, 
-                               min_savings=min_savings, store_id=store_ids)
+    return query_from_filters({
+        'min_price': min_price,
+        'max_price': max_price,
+        'min_savings': min_savings,
+        'store_ids': store_ids
+    })
+
+def analyze_with_filters():
+    """Analizza le offerte con filtri avanzati"""
+    print("\n" + "="*70)
+    print(" " * 15 + "ANALISI OFFERTE CON FILTRI")
+    print("="*70)
+    
+    print("\n🔎 Puoi scrivere un filtro, ad esempio: salePrice <= 10 and savings >= 75 and store in (1, 7)")
+    expression = input("  Filtro (lascia vuoto per la procedura guidata): ").strip()
+    if not expression:
+        expression = ask_guided_filters()
+    
+    query = None
+    if expression:
+        try:
+            query = compile_query(expression)
+        except QueryError as e:
+            print(f"\n❌ Filtro non valido: {e}")
+            return
+        # Cosa viene chiesto all'API e cosa viene filtrato dopo il download
+        print("\n" + "\n".join("  " + line for line in query.explain().splitlines()))
+    
+    filtered_df = None
+    if query is not None and snapshot_is_fresh():
+        # Offerte dell'ultima analisi ancora valide: nessun download, query sull'indice
+        try:
+            index = snapshot_index()
+            filtered_df = index.search(query)
+            games = _last_snapshot["games"]
+            print(f"✓ Filtro applicato alle offerte dell'ultima analisi in {index.get_stats()['last_query_ms']:.2f} ms")
+        except QueryError:
+            # Campi non presenti nello snapshot (es. titolo): si scaricano le offerte
+            filtered_df = None
+    
+    if filtered_df is None:
+        print("\n📡 Recupero offerte da CheapShark...")
+        try:
+            if query is not None:
+                df = query.fetch(max_pages=MAX_DEAL_PAGES)
+            else:
+                df = deal_batches_to_dataframe(stream_deals(max_pages=MAX_DEAL_PAGES))
+        except QueryError as e:
+            print(f"\n❌ Filtro non valido: {e}")
+            return
+        games, filtered_df = normalize_deals(df)
+        del df
     
     if filtered_df.empty:
         print("\n❌ Nessuna offerta corrisponde ai filtri selezionati")
@@ -315,17 +495,17 @@ def analyze_with_filters():
     print("\n" + "─"*70)
     print("🏆 TOP 10 OFFERTE FILTRATE")
     print("─"*70)
-    top_10 = top_savings(filtered_df, 10)
+    top_10 = join_games(top_savings(filtered_df, 10), games, ["title"])
     for i, (idx, row) in enumerate(top_10.iterrows(), 1):
         print(f"  {i}. {row['title']}")
         print(f"     💰 ${row['salePrice']:.2f} | 💸 {row['savings']:.2f}%")
     
     # Export
-    export_format = input("\n💾 Formato export (csv/json/excel, default: csv): ").strip().lower() or 'csv'
-    if export_format not in ['csv', 'json', 'excel']:
+    export_format = input("\n💾 Formato export (csv/json/excel/parquet/feather, default: csv): ").strip().lower() or 'csv'
+    if export_format not in ['csv', 'json', 'excel', 'parquet', 'feather']:
         export_format = 'csv'
     
-    saved_path = save_data(filtered_df, "filtered_deals", format=export_format)
+    saved_path = save_data(join_games(filtered_df, games), "filtered_deals", format=export_format)
     if saved_path:
         print(f"✅ Dati salvati in {saved_path}")
     else:
@@ -364,18 +544,38 @@ def manage_wishlist():
     
     print("\nOpzioni:")
     print("  1. Verifica prezzi e mostra alert")
-    print("  2. Rimuovi un gioco")
-    print("  3. Torna al menu principale")
+    print("  2. Verifica solo i giochi da aggiornare")
+    print("  3. Rimuovi un gioco")
+    print("  4. Torna al menu principale")
     
     choice = input("\nScegli un'opzione: ").strip()
     
     if choice == "1":
         check_price_alerts()
     elif choice == "2":
+        check_due_alerts()
+    elif choice == "3":
         remove_game_from_wishlist(wishlist)
     else:
         return
 
+def check_due_alerts():
+    """Verifica solo i giochi della wishlist il cui controllo è scaduto (vedi data/scheduler.py)"""
+    print("\n📡 Verifica dei giochi da aggiornare...")
+    report = run_due_checks()
+    print(f"✓ Controllati {report['processed']} giochi su {report['due']} da aggiornare", end="")
+    if report["deferred"]:
+        print(f" ({report['deferred']} rimandati al prossimo giro)")
+    else:
+        print()
+    if report["failed"]:
+        print(f"⚠️  {len(report['failed'])} giochi non verificati")
+    if report["next_due"]:
+        from datetime import datetime
+        next_check = datetime.fromtimestamp(report["next_due"]).strftime("%d/%m/%Y %H:%M")
+        print(f"🕒 Prossimo controllo previsto: {next_check}")
+    show_alerts(report["alerts"])
+
 def check_price_alerts():
     """Verifica i prezzi della wishlist e mostra gli alert"""
     wishlist = get_wishlist()
@@ -391,9 +591,28 @@ def check_price_alerts():
         print("💡 Modifica i giochi nella wishlist per impostare un prezzo target")
         return
     
-    print(f"\n📡 Verifica prezzi per {len(games_with_target)} giochi in corso...")
-    alerts = check_wishlist_prices()
+    snapshot_df = _last_snapshot["deals"] if snapshot_is_fresh() else None
     
+    print(f"\n📡 Verifica prezzi per {len(games_with_target)} giochi in corso...")
+    report = check_wishlist_report(games_with_target, snapshot_df=snapshot_df)
+    alerts = report["alerts"]
+    if report["from_snapshot"]:
+        print(f"✓ {report['from_snapshot']} giochi verificati con le offerte dell'ultima analisi")
+    
+    if report["failed"]:
+        reasons = {
+            "timeout": "tempo scaduto", "deadline": "controllo interrotto", "error": "errore API",
+            "not_found": "gioco non trovato", "no_deals": "nessuna offerta", "invalid": "dati non validi",
+            "missing_id": "ID gioco mancante"
+        }
+        print(f"⚠️  {len(report['failed'])} giochi non verificati:")
+        for failure in report["failed"]:
+            print(f"   • {failure['title']}: {reasons.get(failure['reason'], failure['reason'])}")
+    
+    show_alerts(alerts)
+
+def show_alerts(alerts):
+    """Mostra gli alert dei prezzi della wishlist"""
     if not alerts:
         print("✅ Nessun alert: nessun gioco ha raggiunto il prezzo target")
         return
@@ -515,13 +734,15 @@ def show_menu():
     print("  4. 📌 Gestisci wishlist")
     print("  5. 🔔 Verifica alert prezzi")
     print("  6. 📋 Visualizza tutti gli store disponibili")
-    print("  7. 🧹 Pulisci schermo")
-    print("  8. ❌ Esci")
+    print("  7. ⏳ Stato attività in background")
+    print("  8. 🧹 Pulisci schermo")
+    print("  9. ❌ Esci")
     print("="*70)
 
 def main():
     try:
         while True:
+            report_jobs()
             show_menu()
             choice = input("\nScegli un'opzione: ").strip()
             
@@ -538,8 +759,14 @@ def main():
             elif choice == "6":
                 list_all_stores()
             elif choice == "7":
-                clear_screen()
+                show_jobs()
             elif choice == "8":
+                clear_screen()
+            elif choice == "9":
+                if jobs.pending_jobs():
+                    print("\n⏳ Attendo il completamento delle attività in background...")
+                    jobs.flush()
+                    report_jobs()
                 print("\nArrivederci!")
                 break
             else:
@@ -0,0 +1,82 @@
+"""
+Benchmark del picco di memoria (RSS) degli export: DataFrame intero vs flusso di batch.
+
+Ogni combinazione formato/modalità gira in un processo separato.
+
+Modalità:
+    frame   DataFrame completo in memoria + save_data (percorso classico)
+    stream  batch generati uno alla volta + save_batches (memoria costante)
+
+Uso:
+    python -m benchmarks.bench_export --rows 200000
+    python -m benchmarks.bench_export --rows 1000000 --formats excel
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_json_stream import peak_rss_mb
+
+
+def synthetic_batches(rows, batch_size):
+    from benchmarks.bench_parser import synthetic_deals
+    from data.parser import deals_to_dataframe
+
+    for start in range(0, rows, batch_size):
+        yield deals_to_dataframe(synthetic_deals(min(batch_size, rows - start), seed=start))
+
+
+def run_mode(mode, export_format, rows, batch_size):
+    import pandas as pd
+    from data import saver
+
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    if mode == "frame":
+        df = pd.concat(synthetic_batches(rows, batch_size), ignore_index=True)
+        if export_format == "jsonl":
+            export_format = "json"
+        path = saver.save_data(df, "bench_export", format=export_format)
+    else:
+        path = saver.save_batches(synthetic_batches(rows, batch_size), "bench_export", format=export_format)
+    elapsed = time.perf_counter() - start
+    size = os.path.getsize(path) / 1024 / 1024 if path else 0
+    print(f"{mode}\t{export_format}\t{elapsed:.2f}\t{size:.1f}\t{baseline:.1f}\t{peak_rss_mb():.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark picco RSS degli export")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--formats", default="csv,jsonl,excel")
+    parser.add_argument("--mode", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--format", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.format, args.rows, args.batch_size)
+        return
+
+    print(f"Export di {args.rows:,} offerte, batch da {args.batch_size:,}\n")
+    print(f"  {'modalità':<8} {'formato':<8} {'tempo s':>8} {'file MB':>8} {'RSS base MB':>12} {'RSS picco MB':>13}")
+    project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=project_dir)
+    # Gli export finiscono in una cartella temporanea, non in exports/ del progetto
+    with tempfile.TemporaryDirectory() as tmp:
+        for export_format in args.formats.split(","):
+            for mode in ("frame", "stream"):
+                output = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.bench_export", "--mode", mode, "--format", export_format,
+                     "--rows", str(args.rows), "--batch-size", str(args.batch_size)],
+                    capture_output=True, text=True, check=True, cwd=tmp, env=env,
+                ).stdout.strip().splitlines()[-1]
+                name, fmt, elapsed, size, baseline, peak = output.split("\t")
+                print(f"  {name:<8} {fmt:<8} {float(elapsed):>8.2f} {float(size):>8.1f} "
+                      f"{float(baseline):>12.1f} {float(peak):>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
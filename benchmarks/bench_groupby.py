@@ -0,0 +1,105 @@
+"""
+Benchmark delle aggregazioni per gruppo (analytics/aggregate.py).
+
+Su uno snapshot sintetico confronta:
+    - il vecchio store_analysis (una maschera df["storeID"] == id per store);
+    - store_analysis attuale (un solo raggruppamento);
+    - pandas groupby con le stesse statistiche;
+    - aggregate_many per store, per gioco e per (store, rating) con mediana
+      e percentili, contro i tre groupby pandas equivalenti.
+
+Uso:
+    python -m benchmarks.bench_groupby --rows 10000000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from analytics.aggregate import aggregate_many
+from analytics.analyzer import store_analysis
+from benchmarks.bench_index import synthetic_snapshot
+
+RATINGS = ["Overwhelmingly Positive", "Very Positive", "Mostly Positive", "Mixed", "Mostly Negative", "N/A"]
+
+GROUPINGS = {
+    "store": "storeID",
+    "game": "gameID",
+    "store_rating": ["storeID", "steamRating"],
+}
+
+PERCENTILES = (25, 75, 90)
+
+
+def store_analysis_loop(df, stores_dict):
+    """store_analysis prima del raggruppamento unico: una scansione per store"""
+    store_stats = []
+    for store_id, store_name in stores_dict.items():
+        store_deals = df[df["storeID"] == store_id]
+        if store_deals.empty:
+            continue
+        store_stats.append({
+            "storeID": store_id,
+            "storeName": store_name,
+            "numDeals": len(store_deals),
+            "avgSavings": float(store_deals["savings"].mean()),
+            "avgPrice": float(store_deals["salePrice"].mean()),
+            "minPrice": float(store_deals["salePrice"].min()),
+            "maxPrice": float(store_deals["salePrice"].max()),
+        })
+    return pd.DataFrame(store_stats)
+
+
+def pandas_groupings(df):
+    results = {}
+    for name, by in GROUPINGS.items():
+        grouped = df.groupby(by, observed=True)[["salePrice", "savings"]]
+        stats = grouped.agg(["count", "mean", "min", "max", "median"])
+        quantiles = grouped.quantile([q / 100 for q in PERCENTILES])
+        results[name] = (stats, quantiles)
+    return results
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark aggregazioni per gruppo")
+    parser.add_argument("--rows", type=int, default=10000000)
+    parser.add_argument("--stores", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    df = synthetic_snapshot(args.rows, args.stores, args.seed)
+    rng = np.random.default_rng(args.seed)
+    df["steamRating"] = pd.Categorical(rng.choice(RATINGS, args.rows))
+    stores_dict = {str(store_id): f"Store {store_id}" for store_id in range(1, args.stores + 1)}
+    print(f"Snapshot di {args.rows:,} offerte, {args.stores} store, "
+          f"{df['gameID'].nunique():,} giochi\n")
+
+    loop, expected = timed(lambda: store_analysis_loop(df, stores_dict))
+    single, result = timed(lambda: store_analysis(df, stores_dict))
+    assert np.allclose(result["avgPrice"], expected["avgPrice"])
+    assert (result["numDeals"] == expected["numDeals"]).all()
+    grouped, _ = timed(lambda: df.groupby("storeID", observed=True)[["salePrice", "savings"]]
+                       .agg(["count", "mean", "min", "max", "median"]))
+    print("store_analysis (per store: conteggio, media, minimo, massimo, mediana)")
+    print(f"  {'maschera per store':<34} {loop * 1000:>9.0f} ms")
+    print(f"  {'raggruppamento unico':<34} {single * 1000:>9.0f} ms")
+    print(f"  {'pandas groupby':<34} {grouped * 1000:>9.0f} ms\n")
+
+    engine, tables = timed(lambda: aggregate_many(df, GROUPINGS, ["salePrice", "savings"],
+                                                  percentiles=PERCENTILES))
+    reference, _ = timed(lambda: pandas_groupings(df))
+    groups = ", ".join(f"{name} {len(table):,}" for name, table in tables.items())
+    print(f"Per store, gioco e (store, rating) con mediana e percentili {PERCENTILES} ({groups} gruppi)")
+    print(f"  {'aggregate_many':<34} {engine * 1000:>9.0f} ms")
+    print(f"  {'pandas groupby + quantile':<34} {reference * 1000:>9.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark dello storico prezzi (data/history.py).
+
+Inserisce una serie di snapshot sintetici in cui solo una parte dei prezzi
+cambia tra un'esecuzione e l'altra, poi misura le query puntuali.
+
+Uso:
+    python -m benchmarks.bench_history --pairs 200000 --snapshots 50
+    python -m benchmarks.bench_history --pairs 1000000 --snapshots 30 --change-rate 0.5
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from data import history
+
+
+def snapshot_frame(game_ids, store_ids, prices):
+    return pd.DataFrame({
+        "gameID": pd.array(game_ids, dtype="Int32"),
+        "storeID": pd.Categorical(store_ids.astype(str)),
+        "salePrice": prices.astype("float32"),
+        "normalPrice": np.full(len(prices), 59.99, dtype="float32"),
+        "savings": ((1 - prices / 59.99) * 100).astype("float32"),
+    })
+
+
+def timed_queries(label, fn, args_list):
+    start = time.perf_counter()
+    for args in args_list:
+        fn(*args)
+    elapsed = (time.perf_counter() - start) / len(args_list)
+    print(f"  {label:<28} {elapsed * 1000:8.2f} ms/query")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark storico prezzi SQLite")
+    parser.add_argument("--pairs", type=int, default=200000, help="Coppie gioco/store per snapshot")
+    parser.add_argument("--snapshots", type=int, default=50)
+    parser.add_argument("--change-rate", type=float, default=0.2, help="Quota di prezzi che cambia per snapshot")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    game_ids = np.arange(args.pairs) // 4 + 1
+    store_ids = np.arange(args.pairs) % 4 + 1
+    prices = rng.choice([4.99, 9.99, 19.99, 29.99, 59.99], args.pairs)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        history.HISTORY_FILE = os.path.join(tmp, "history.sqlite")
+        print(f"{args.snapshots} snapshot da {args.pairs:,} coppie, cambio prezzi {args.change_rate:.0%}\n")
+
+        start = time.perf_counter()
+        inserted = 0
+        for i in range(args.snapshots):
+            changed = rng.random(args.pairs) < args.change_rate
+            prices = np.where(changed, np.round(prices * rng.uniform(0.5, 1.2, args.pairs), 2), prices)
+            result = history.record_snapshot(snapshot_frame(game_ids, store_ids, prices), timestamp=1000 + i * 3600)
+            inserted += result["inserted"]
+        elapsed = time.perf_counter() - start
+        total_rows = args.pairs * args.snapshots
+        print(f"  inserimento: {elapsed:.2f} s  ({total_rows / elapsed:,.0f} righe snapshot/s)")
+        print(f"  righe registrate: {inserted:,} su {total_rows:,} (dedup {1 - inserted / total_rows:.0%})")
+
+        stats = history.get_history_stats()
+        print(f"  database: {stats['size_bytes'] / 1024 / 1024:.1f} MB\n")
+
+        games = rng.integers(1, game_ids[-1] + 1, args.queries)
+        timed_queries("price_history(game)", history.price_history, [(g,) for g in games])
+        timed_queries("price_history(game, store)", history.price_history, [(g, 1) for g in games])
+        timed_queries("all_time_low(game)", history.all_time_low, [(g,) for g in games])
+        since = 1000 + (args.snapshots - 1) * 3600
+        timed_queries("deals_started_since(ultimo)", history.deals_started_since, [(since, None, 100)] * 20)
+        history.close()
+
+
+if __name__ == "__main__":
+    main()
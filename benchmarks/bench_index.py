@@ -0,0 +1,90 @@
+"""
+Benchmark dell'indice sugli snapshot (data/deals_index.py) contro la scansione completa.
+
+Per ogni query misura filter_deals (scansione), Query.apply (scansione con
+maschera unica) e DealsIndex (solo ID delle righe, e DataFrame risultato);
+il punto di pareggio è il numero di query dopo il quale la costruzione
+dell'indice è ripagata rispetto a filter_deals.
+
+Uso:
+    python -m benchmarks.bench_index --rows 1000000
+    python -m benchmarks.bench_index --rows 5000000 --repeat 20
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from data.deals_index import DealsIndex
+from data.filters import filter_deals
+from data.query import compile_query
+
+# (descrizione, argomenti di filter_deals, espressione equivalente)
+QUERIES = [
+    ("prezzo <= 1", {"max_price": 1}, "salePrice <= 1"),
+    ("prezzo 5-10, sconto >= 75", {"min_price": 5, "max_price": 10, "min_savings": 75},
+     "salePrice >= 5 and salePrice <= 10 and savings >= 75"),
+    ("store 1,7, prezzo <= 10", {"max_price": 10, "store_id": [1, 7]}, "salePrice <= 10 and store in (1, 7)"),
+    ("sconto >= 90", {"min_savings": 90}, "savings >= 90"),
+    ("store 3", {"store_id": 3}, "store == 3"),
+    ("prezzo <= 40 (poco selettiva)", {"max_price": 40}, "salePrice <= 40"),
+    # Estremi inclusi e uguaglianza su prezzi float32 (9.99 non è esatto in binario)
+    ("prezzo >= 9.99 (estremo incluso)", {"min_price": 9.99}, "salePrice >= 9.99"),
+    ("prezzo == 14.99", {"min_price": 14.99, "max_price": 14.99}, "salePrice == 14.99"),
+]
+
+
+def synthetic_snapshot(rows, stores, seed):
+    rng = np.random.default_rng(seed)
+    normal = rng.choice([9.99, 14.99, 19.99, 29.99, 39.99, 59.99], rows)
+    savings = rng.integers(0, 96, rows)
+    sale = np.round(normal * (1 - savings / 100), 2)
+    return pd.DataFrame({
+        "gameID": pd.array(np.arange(rows) // 3 + 1, dtype="Int32"),
+        "storeID": pd.Categorical(rng.integers(1, stores + 1, rows).astype(str)),
+        "salePrice": sale.astype("float32"),
+        "normalPrice": normal.astype("float32"),
+        "savings": savings.astype("float32"),
+    })
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark indice snapshot vs scansione")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--stores", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    df = synthetic_snapshot(args.rows, args.stores, args.seed)
+    index = DealsIndex(df)
+    print(f"Snapshot di {args.rows:,} offerte, {args.stores} store")
+    print(f"Costruzione indice: {index.build_seconds * 1000:.1f} ms\n")
+
+    print(f"  {'query':<32} {'righe':>9} {'scan ms':>9} {'query ms':>9} {'ID ms':>8} {'indice ms':>10} {'pareggio':>9}")
+    for label, kwargs, expression in QUERIES:
+        query = compile_query(expression)
+        scan, expected = timed(lambda: filter_deals(df, **kwargs), args.repeat)
+        fused, applied = timed(lambda: query.apply(df), args.repeat)
+        ids, _ = timed(lambda: index.search_rows(query), args.repeat)
+        indexed, result = timed(lambda: index.search(query), args.repeat)
+        assert len(result) == len(expected) == len(applied), (label, len(result), len(expected), len(applied))
+        saved = scan - indexed
+        breakeven = f"{index.build_seconds / saved:.1f}" if saved > 0 else "mai"
+        print(f"  {label:<32} {len(result):>9,} {scan * 1000:>9.2f} {fused * 1000:>9.2f} "
+              f"{ids * 1000:>8.3f} {indexed * 1000:>10.3f} {breakeven:>9}")
+
+    stats = index.get_stats()
+    print(f"\nQuery sull'indice: {stats['queries']}, media {stats['avg_query_ms']:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
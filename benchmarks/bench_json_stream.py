@@ -0,0 +1,94 @@
+"""
+Benchmark del picco di memoria (RSS): response.json() vs decodifica incrementale.
+
+Il server locale serve un'unica pagina /deals molto grande; ogni modalità gira
+in un processo separato per misurare il proprio picco di RSS.
+
+Modalità:
+    json    response.json() + deals_to_dataframe sull'intero payload (percorso classico)
+    stream  iter_deals a batch, ogni batch convertito e poi scartato (memoria limitata)
+    concat  iter_deals a batch, DataFrame finale completo (memoria = solo il DataFrame)
+
+Uso:
+    python -m benchmarks.bench_json_stream --rows 300000
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import time
+
+os.environ.setdefault("CHEAPSHARK_CACHE", "0")
+
+
+def peak_rss_mb():
+    # VmHWM è il picco del processo corrente; ru_maxrss (in KB su Linux) viene
+    # ereditato dal padre attraverso fork/exec ed è solo un ripiego
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_mode(mode, base_url, rows, chunk_size):
+    from data import client
+    from data.fetcher import iter_deals
+    from data.parser import deals_to_dataframe, deal_batches_to_dataframe
+
+    client.configure(base_url=base_url)
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+
+    if mode == "json":
+        deals = client.get_json("deals", {"pageSize": rows}, use_cache=False)
+        df = deals_to_dataframe(deals)
+        count = len(df)
+    elif mode == "stream":
+        count = 0
+        for batch in iter_deals(page_size=rows, chunk_size=chunk_size):
+            count += len(deals_to_dataframe(batch))
+    else:
+        df = deal_batches_to_dataframe(iter_deals(page_size=rows, chunk_size=chunk_size))
+        count = len(df)
+
+    elapsed = time.perf_counter() - start
+    print(f"{mode}\t{count}\t{elapsed:.2f}\t{baseline:.1f}\t{peak_rss_mb():.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark picco RSS decodifica JSON")
+    parser.add_argument("--rows", type=int, default=300000)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--mode", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--base-url", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.base_url, args.rows, args.chunk_size)
+        return
+
+    from tools.cheapshark_server import serve_in_background
+
+    server, base_url = serve_in_background(games=args.rows // 3 + 1, max_page_size=args.rows)
+    print(f"Payload: {args.rows:,} offerte in una sola risposta, batch da {args.chunk_size}\n")
+    print(f"  {'modalità':<8} {'righe':>9} {'tempo s':>8} {'RSS base MB':>12} {'RSS picco MB':>13}")
+    try:
+        for mode in ("json", "stream", "concat"):
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_json_stream", "--mode", mode,
+                 "--base-url", base_url, "--rows", str(args.rows), "--chunk-size", str(args.chunk_size)],
+                capture_output=True, text=True, check=True,
+            ).stdout.strip().splitlines()[-1]
+            name, count, elapsed, baseline, peak = output.split("\t")
+            print(f"  {name:<8} {int(count):>9,} {float(elapsed):>8.2f} {float(baseline):>12.1f} {float(peak):>13.1f}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark delle statistiche incrementali (analytics/online_stats.py).
+
+Su uno snapshot sintetico diviso in pagine come quelle di /deals misura:
+    - get_statistics com'era (una scansione per ogni soglia e aggregato)
+      e get_statistics attuale, sul DataFrame completo;
+    - DealStats aggiornato pagina per pagina (costo per pagina);
+    - DealStats calcolato da più processi e unito con merge;
+    - l'errore dei percentili approssimati rispetto a quelli esatti.
+
+Uso:
+    python -m benchmarks.bench_online_stats --rows 1000000 --workers 4
+"""
+import argparse
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from analytics.analyzer import get_statistics
+from analytics.online_stats import DealStats, PERCENTILES
+from benchmarks.bench_index import synthetic_snapshot
+
+
+def get_statistics_scan(df):
+    """get_statistics prima degli accumulatori: una scansione per soglia"""
+    return {
+        "total_deals": len(df),
+        "avg_saving": df["savings"].mean(),
+        "max_saving": df["savings"].max(),
+        "deals_over_50": len(df[df["savings"] >= 50]),
+        "deals_over_75": len(df[df["savings"] >= 75]),
+        "deals_over_90": len(df[df["savings"] >= 90]),
+        "min_price": df["salePrice"].min(),
+        "max_price": df["salePrice"].max(),
+        "avg_price": df["salePrice"].mean(),
+    }
+
+
+def stats_for_pages(df, page_size):
+    stats = DealStats()
+    for offset in range(0, len(df), page_size):
+        stats.update(df.iloc[offset:offset + page_size])
+    return stats
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark statistiche incrementali")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--page-size", type=int, default=60)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    df = synthetic_snapshot(args.rows, 30, args.seed)
+    pages = -(-args.rows // args.page_size)
+    print(f"Snapshot di {args.rows:,} offerte in {pages:,} pagine da {args.page_size}\n")
+
+    scan, expected = timed(lambda: get_statistics_scan(df))
+    single, result = timed(lambda: get_statistics(df))
+    for key, value in expected.items():
+        assert np.isclose(value, result[key]), (key, value, result[key])
+
+    stream, stats = timed(lambda: stats_for_pages(df, args.page_size))
+    state = len(pickle.dumps(stats))
+
+    chunk = -(-args.rows // args.workers)
+    parts = [df.iloc[start:start + chunk] for start in range(0, args.rows, chunk)]
+
+    def parallel():
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            merged = DealStats()
+            for partial in executor.map(stats_for_pages, parts, [args.page_size] * len(parts)):
+                merged.merge(partial)
+        return merged
+
+    multi, merged = timed(parallel)
+    assert merged.result()["price_percentiles"] == stats.result()["price_percentiles"]
+    assert np.isclose(merged.result()["avg_price"], stats.result()["avg_price"])
+
+    print(f"  {'get_statistics (scansioni)':<36} {scan * 1000:>9.1f} ms")
+    print(f"  {'get_statistics (accumulatori)':<36} {single * 1000:>9.1f} ms")
+    print(f"  {'DealStats pagina per pagina':<36} {stream * 1000:>9.1f} ms "
+          f"({stream / pages * 1e6:.0f} µs per pagina)")
+    print(f"  {f'DealStats su {args.workers} processi + merge':<36} {multi * 1000:>9.1f} ms")
+    print(f"  stato serializzato: {state / 1024:.1f} KB (DataFrame: {df.memory_usage(deep=True).sum() / 1e6:.0f} MB)\n")
+
+    final = stats.result()
+    print(f"  {'percentile':<12} {'prezzo':>9} {'esatto':>9} {'errore':>8}   {'sconto':>8} {'esatto':>8}")
+    prices = df["salePrice"].to_numpy(dtype="float64")
+    savings = df["savings"].to_numpy(dtype="float64")
+    for q in PERCENTILES:
+        exact_price = np.nanpercentile(prices, q)
+        exact_saving = np.nanpercentile(savings, q)
+        approx = final["price_percentiles"][q]
+        error = abs(approx - exact_price) / exact_price * 100 if exact_price else 0.0
+        print(f"  p{q:<11} {approx:>9.3f} {exact_price:>9.3f} {error:>7.2f}%   "
+              f"{final['saving_percentiles'][q]:>8.2f} {exact_saving:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
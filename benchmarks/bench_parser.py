@@ -0,0 +1,95 @@
+"""
+Benchmark di deals_to_dataframe: parser schema-driven vs parser riga per riga.
+
+Misura righe/secondo e byte/riga (memory_usage deep) su offerte sintetiche.
+
+Uso:
+    python -m benchmarks.bench_parser --rows 1000000
+"""
+import argparse
+import random
+import time
+
+import pandas as pd
+
+from data.parser import deals_to_dataframe
+
+
+def legacy_deals_to_dataframe(deals):
+    """Implementazione precedente: un dizionario per riga e pd.to_numeric per colonna"""
+    if not deals:
+        return pd.DataFrame()
+
+    rows = []
+    for deal in deals:
+        rows.append({
+            "title": deal.get("title", ""),
+            "salePrice": deal.get("salePrice", "0"),
+            "normalPrice": deal.get("normalPrice", "0"),
+            "savings": deal.get("savings", "0"),
+            "steamRating": deal.get("steamRatingText", "N/A"),
+            "storeID": deal.get("storeID", ""),
+            "gameID": deal.get("gameID", ""),
+            "thumb": deal.get("thumb", ""),
+        })
+
+    df = pd.DataFrame(rows)
+    df["salePrice"] = pd.to_numeric(df["salePrice"], errors="coerce")
+    df["normalPrice"] = pd.to_numeric(df["normalPrice"], errors="coerce")
+    df["savings"] = pd.to_numeric(df["savings"], errors="coerce")
+    return df
+
+
+def synthetic_deals(rows, seed=42):
+    rng = random.Random(seed)
+    ratings = ["Overwhelmingly Positive", "Very Positive", "Mostly Positive", "Mixed", None]
+    deals = []
+    for i in range(rows):
+        game_id = rng.randint(1, max(1, rows // 3))
+        normal = rng.choice([4.99, 9.99, 19.99, 29.99, 59.99])
+        sale = round(normal * rng.choice([1, 0.9, 0.75, 0.5, 0.25, 0.1]), 2)
+        deals.append({
+            "internalName": f"GAME{game_id}",
+            "title": f"Game {game_id}",
+            "dealID": f"deal{i}",
+            "storeID": str(rng.randint(1, 35)),
+            "gameID": str(game_id),
+            "salePrice": f"{sale:.2f}",
+            "normalPrice": f"{normal:.2f}",
+            "isOnSale": "1",
+            "savings": f"{(1 - sale / normal) * 100:.6f}",
+            "steamRatingText": rng.choice(ratings),
+            "steamAppID": str(100000 + game_id),
+            "thumb": f"https://cdn.example.com/steam/apps/{100000 + game_id}/capsule_sm_120.jpg",
+        })
+    return deals
+
+
+def measure(label, fn, deals):
+    start = time.perf_counter()
+    df = fn(deals)
+    elapsed = time.perf_counter() - start
+    size = df.memory_usage(deep=True).sum()
+    print(f"  {label:<14} {len(deals) / elapsed:12,.0f} righe/s  {size / len(deals):8.1f} byte/riga  "
+          f"({elapsed:.2f} s, {size / 1024 ** 2:.1f} MB)")
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parser offerte")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    print(f"Generazione di {args.rows:,} offerte sintetiche...")
+    deals = synthetic_deals(args.rows)
+
+    print("Risultati:")
+    before = measure("prima", legacy_deals_to_dataframe, deals)
+    after = measure("schema", deals_to_dataframe, deals)
+    print("\nTipi colonne (schema):")
+    print(after.dtypes.to_string())
+    del before
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark della pipeline fetch → parse → analyze → plot contro il server
+CheapShark locale (tools/cheapshark_server.py), senza accesso alla rete.
+
+Uso:
+    python -m benchmarks.bench_pipeline --games 20000 --latency 0.01
+    python -m benchmarks.bench_pipeline --fixtures fixtures/cheapshark.jsonl.gz
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault("CHEAPSHARK_CACHE", "0")
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+from data import client
+from data.fetcher import stream_deals, get_stores
+from data.parser import deal_batches_to_dataframe
+from analytics.analyzer import get_statistics, store_analysis, top_savings
+from analytics.chart import plot_store_comparison
+from tools.cheapshark_server import serve_in_background
+
+
+def timed(label, results, fn, *args, **kwargs):
+    start = time.perf_counter()
+    value = fn(*args, **kwargs)
+    results.append((label, time.perf_counter() - start))
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pipeline su CheapShark locale")
+    parser.add_argument("--games", type=int, default=20000)
+    parser.add_argument("--deals-per-game", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--fixtures", default=None)
+    parser.add_argument("--max-pages", type=int, default=None)
+    parser.add_argument("--plot", action="store_true", help="Include il rendering del grafico store")
+    args = parser.parse_args()
+
+    server, base_url = serve_in_background(
+        games=args.games, deals_per_game=args.deals_per_game, latency=args.latency,
+        error_rate=args.error_rate, throttle_rate=args.throttle_rate, fixtures=args.fixtures,
+    )
+    client.configure(base_url=base_url, backoff_base=0.05, rate_limit=1000, rate_burst=100)
+
+    results = []
+    try:
+        df = timed("fetch+parse", results, deal_batches_to_dataframe,
+                   stream_deals(max_pages=args.max_pages))
+        stores = timed("stores", results, get_stores)
+        stores_dict = {str(s["storeID"]): s["storeName"] for s in stores}
+        timed("statistics", results, get_statistics, df)
+        timed("top_savings", results, top_savings, df, 20)
+        store_df = timed("store_analysis", results, store_analysis, df, stores_dict)
+        if args.plot:
+            timed("plot_store_comparison", results, plot_store_comparison, store_df)
+    finally:
+        server.shutdown()
+
+    print(f"\nOfferte: {len(df)}  |  richieste server: {server.requests} "
+          f"(5xx: {server.errors}, 429: {server.throttled})")
+    total = 0.0
+    for label, elapsed in results:
+        total += elapsed
+        print(f"  {label:<24} {elapsed * 1000:10.1f} ms")
+    print(f"  {'totale':<24} {total * 1000:10.1f} ms")
+    if len(df):
+        print(f"  throughput fetch+parse: {len(df) / results[0][1]:,.0f} righe/s")
+    print(f"  client: {client.get_stats()}")
+
+
+if __name__ == "__main__":
+    main()
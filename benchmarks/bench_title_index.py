@@ -0,0 +1,114 @@
+"""
+Benchmark della ricerca offline per titolo (data/title_index.py).
+
+Costruisce l'indice su un catalogo sintetico di titoli, lo salva e lo
+ricarica, poi misura la latenza delle ricerche con e senza errori di
+battitura (lettere scambiate, mancanti, numeri romani, accenti).
+
+Uso:
+    python -m benchmarks.bench_title_index --games 100000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from data.title_index import TitleIndex
+
+WORDS = [
+    "dark", "souls", "final", "fantasy", "witcher", "wild", "hunt", "grand", "theft", "auto",
+    "legend", "batman", "arkham", "knight", "city", "origins", "assassin's", "creed",
+    "fallout", "elder", "scrolls", "portal", "half-life", "dragon", "tomb", "raider", "hollow",
+    "pokémon", "édition", "space", "station", "farming", "simulator", "racing", "legends",
+]
+SYLLABLES = ["ka", "lor", "vex", "tri", "mon", "sha", "del", "qua", "zen", "ro", "bri", "tan", "ul", "fy", "gor"]
+SUFFIXES = ["", "", "", " II", " III", " IV", " 2", " 3", ": Remastered", " - GOTY Edition", " & Friends"]
+
+# (query, titolo atteso tra i primi risultati)
+QUERIES = [
+    ("Final Fantasy VII", "Final Fantasy VII"),
+    ("final fantasy 7", "Final Fantasy VII"),
+    ("fnial fantsy 7", "Final Fantasy VII"),
+    ("witcher 3 wild hunt", "The Witcher 3: Wild Hunt"),
+    ("wticher wild hunt", "The Witcher 3: Wild Hunt"),
+    ("assassins creed", "Assassin's Creed"),
+    ("pokemon farming sim", "Pokémon Farming Simulator"),
+    ("hollow knigt", "Hollow Knight"),
+    ("grnd theft auto v", "Grand Theft Auto V"),
+]
+KNOWN_TITLES = sorted({expected for _, expected in QUERIES})
+
+
+def synthetic_catalog(games, seed):
+    rng = np.random.default_rng(seed)
+    # Vocabolario realistico: poche parole comuni e molte parole rare
+    invented = {"".join(rng.choice(SYLLABLES, rng.integers(2, 4))) for _ in range(20000)}
+    vocabulary = np.array(WORDS * 20 + sorted(invented))
+    lengths = rng.integers(2, 5, games)
+    words = rng.choice(vocabulary, lengths.sum())
+    suffixes = rng.choice(SUFFIXES, games)
+    titles = []
+    position = 0
+    for length, suffix in zip(lengths, suffixes):
+        titles.append(" ".join(words[position:position + length]).title() + suffix)
+        position += length
+    titles[:len(KNOWN_TITLES)] = KNOWN_TITLES
+    return pd.DataFrame({
+        "gameID": np.arange(1, games + 1),
+        "title": titles,
+        "steamAppID": "",
+        "cheapest": np.round(rng.uniform(0.99, 59.99, games), 2),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ricerca offline per titolo")
+    parser.add_argument("--games", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    catalog = synthetic_catalog(args.games, args.seed)
+    index = TitleIndex()
+    start = time.perf_counter()
+    index.update_from_frame(catalog)
+    build = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "title_index.npz")
+        start = time.perf_counter()
+        index.save(path)
+        save = time.perf_counter() - start
+        size = os.path.getsize(path)
+        start = time.perf_counter()
+        index = TitleIndex.load(path)
+        load = time.perf_counter() - start
+
+    # Aggiornamento incrementale: 1% di giochi nuovi dopo il caricamento
+    extra = synthetic_catalog(args.games // 100, args.seed + 1)
+    extra["gameID"] += args.games
+    start = time.perf_counter()
+    index.update_from_frame(extra)
+    update = time.perf_counter() - start
+
+    print(f"Catalogo di {args.games:,} giochi")
+    print(f"  costruzione: {build * 1000:.0f} ms, salvataggio: {save * 1000:.0f} ms ({size / 1e6:.1f} MB), "
+          f"caricamento: {load * 1000:.0f} ms, +{len(extra):,} giochi: {update * 1000:.0f} ms\n")
+
+    print(f"  {'query':<22} {'ms':>7}  {'posizione':>9}  primo risultato")
+    for query, expected in QUERIES:
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            results = index.search(query)
+        elapsed = (time.perf_counter() - start) / args.repeat
+        titles = [result["external"] for result in results]
+        rank = titles.index(expected) + 1 if expected in titles else "-"
+        first = titles[0] if titles else "(nessuno)"
+        print(f"  {query:<22} {elapsed * 1000:>7.3f}  {rank:>9}  {first}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+Modalità daemon: controllo periodico della wishlist senza interfaccia.
+
+A ogni ciclo lo scheduler (data/scheduler.py) controlla solo i giochi
+scaduti, entro il budget di richieste; gli alert vengono salvati
+nell'outbox (data/outbox.py), che scarta i duplicati per (gameID, dealID,
+prezzo), e poi consegnati ai sink configurati (data/sinks.py). Un sink non
+raggiungibile viene ritentato ai cicli successivi, anche dopo un riavvio.
+
+Dopo ogni ciclo una riga di log e il file di metriche riportano durata del
+ciclo, backlog dello scheduler (giochi scaduti rimasti fuori dal budget) e
+dell'outbox (alert non ancora consegnati per sink), memoria e CPU.
+
+Uso:
+    python daemon.py --sink stdout --sink webhook=http://localhost:9000/alerts
+    python daemon.py --once --sink smtp=localhost:1025
+"""
+import argparse
+import json
+import os
+import resource
+import signal
+import threading
+import time
+from datetime import datetime
+
+from data import client, history, outbox, wishlist_store
+from data.saver import atomic_write
+from data.scheduler import RefreshScheduler, REQUEST_BUDGET
+from data.sinks import make_sink
+from data.wishlist import load_wishlist
+
+# Attesa massima tra due cicli (secondi)
+DEFAULT_INTERVAL = 300
+
+# Attesa minima tra due cicli (secondi), anche con backlog
+MIN_SLEEP = 5
+
+# Ogni quanto ricalcolare la volatilità dallo storico (secondi)
+VOLATILITY_REFRESH = 3600
+
+# Alert consegnati per sink a ogni ciclo
+DELIVERY_BATCH = 100
+
+METRICS_FILE = os.path.join("history", "daemon_metrics.json")
+
+
+def _rss_mb():
+    """Memoria residente attuale in MB (picco se /proc non è disponibile)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class PriceWatchDaemon:
+    """
+    Ciclo di controllo prezzi, outbox e consegna degli alert
+
+    Args:
+        sinks: Lista di sink (vedi data/sinks.py)
+        interval: Attesa massima tra due cicli in secondi
+        request_budget: Richieste API massime per ciclo
+        metrics_file: File JSON aggiornato dopo ogni ciclo (None per disattivarlo)
+    """
+
+    def __init__(self, sinks, interval=DEFAULT_INTERVAL, request_budget=REQUEST_BUDGET,
+                 metrics_file=METRICS_FILE):
+        self.sinks = sinks
+        self.interval = interval
+        self.metrics_file = metrics_file
+        self.scheduler = RefreshScheduler(request_budget=request_budget)
+        self.cycles = 0
+        self.totals = {"checked": 0, "failed": 0, "alerts": 0, "new_alerts": 0, "delivered": 0,
+                       "delivery_failures": 0}
+        self.last_metrics = None
+        self._volatility = None
+        self._volatility_at = 0.0
+        self._stop = threading.Event()
+
+    def stop(self, *args):
+        """Termina il daemon alla fine del ciclo in corso"""
+        self._stop.set()
+
+    def _load(self, now):
+        # La wishlist viene riletta a ogni ciclo (può essere modificata dall'app
+        # interattiva); la volatilità, più costosa, solo ogni VOLATILITY_REFRESH
+        items = load_wishlist()
+        if self._volatility is None or now - self._volatility_at >= VOLATILITY_REFRESH:
+            ids = [item.get("gameID") for item in items if item.get("targetPrice")]
+            self._volatility = history.price_volatility(ids)
+            self._volatility_at = now
+        self.scheduler.load(items, volatility=self._volatility)
+
+    def deliver(self):
+        """
+        Consegna ai sink gli alert in attesa (al massimo DELIVERY_BATCH per sink)
+
+        Returns:
+            (consegnati, falliti)
+        """
+        delivered = failed = 0
+        for sink in self.sinks:
+            for alert_id, alert in outbox.pending(sink.name, limit=DELIVERY_BATCH):
+                try:
+                    sink.send(alert)
+                except Exception as e:
+                    outbox.mark_failed(alert_id, sink.name, e)
+                    failed += 1
+                    # Sink non raggiungibile: si riprova al prossimo ciclo
+                    break
+                outbox.mark_delivered(alert_id, sink.name)
+                delivered += 1
+        return delivered, failed
+
+    def run_cycle(self, now=None):
+        """
+        Esegue un ciclo: controllo dei giochi scaduti, outbox e consegna
+
+        Returns:
+            Dizionario delle metriche del ciclo
+        """
+        start = time.perf_counter()
+        cpu_start = time.process_time()
+        now = time.time() if now is None else now
+
+        self._load(now)
+        report = self.scheduler.run_once(now=now)
+        new_alerts = outbox.enqueue(report["alerts"])
+        delivered, delivery_failures = self.deliver()
+        outbox.prune()
+
+        self.cycles += 1
+        metrics = {
+            "cycle": self.cycles,
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "duration": round(time.perf_counter() - start, 3),
+            "cpu_seconds": round(time.process_time() - cpu_start, 3),
+            "wishlist": len(self.scheduler),
+            "due": report["due"],
+            "checked": report["checked"],
+            "failed": len(report["failed"]),
+            "backlog": report["deferred"],
+            "next_due": report["next_due"],
+            "alerts": len(report["alerts"]),
+            "new_alerts": new_alerts,
+            "delivered": delivered,
+            "delivery_failures": delivery_failures,
+            "outbox_backlog": outbox.backlog([sink.name for sink in self.sinks]),
+            "rss_mb": round(_rss_mb(), 1),
+        }
+        for key in self.totals:
+            self.totals[key] += metrics[key]
+        metrics["totals"] = dict(self.totals)
+        self.last_metrics = metrics
+        self._write_metrics(metrics)
+        return metrics
+
+    def _write_metrics(self, metrics):
+        if not self.metrics_file:
+            return
+        try:
+            with atomic_write(self.metrics_file) as f:
+                json.dump(metrics, f, indent=2, ensure_ascii=False)
+        except OSError as e:
+            print(f"⚠️  Impossibile scrivere le metriche: {e}", flush=True)
+
+    def sleep_time(self, metrics, now=None):
+        """Attesa prima del prossimo ciclo: fino alla prossima scadenza, entro [MIN_SLEEP, interval]"""
+        now = time.time() if now is None else now
+        # Giochi scaduti fuori budget, o alert da consegnare a sink funzionanti: si riparte presto
+        pending_alerts = any(metrics["outbox_backlog"].values()) and not metrics["delivery_failures"]
+        if metrics["backlog"] or pending_alerts:
+            return MIN_SLEEP
+        next_due = metrics["next_due"]
+        if next_due is None:
+            return self.interval
+        return min(max(next_due - now, MIN_SLEEP), self.interval)
+
+    def run(self, max_cycles=None):
+        """Esegue cicli fino a stop() (o SIGTERM/SIGINT) o a max_cycles"""
+        attempts = 0
+        while not self._stop.is_set():
+            attempts += 1
+            try:
+                metrics = self.run_cycle()
+                print(format_metrics(metrics), flush=True)
+                wait = self.sleep_time(metrics)
+            except Exception as e:
+                # Un ciclo fallito (es. database bloccato) non ferma il daemon
+                print(f"❌ Ciclo fallito: {e}", flush=True)
+                wait = self.interval
+            if max_cycles is not None and attempts >= max_cycles:
+                break
+            self._stop.wait(wait)
+
+
+def format_metrics(metrics):
+    """Riga di log di un ciclo"""
+    backlog = sum(metrics["outbox_backlog"].values())
+    return (f"[{metrics['timestamp']}] ciclo {metrics['cycle']}: {metrics['duration']:.2f}s, "
+            f"controllati {metrics['checked']}/{metrics['due']} scaduti, falliti {metrics['failed']}, "
+            f"backlog {metrics['backlog']}, alert {metrics['new_alerts']} nuovi/{metrics['alerts']}, "
+            f"consegnati {metrics['delivered']}, outbox {backlog}, RSS {metrics['rss_mb']:.0f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Controllo periodico della wishlist con alert")
+    parser.add_argument("--sink", action="append", default=None,
+                        help="Destinazione alert: stdout, webhook=URL, smtp=host:porta (ripetibile)")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL,
+                        help="Attesa massima tra due cicli in secondi")
+    parser.add_argument("--budget", type=int, default=REQUEST_BUDGET, help="Richieste API massime per ciclo")
+    parser.add_argument("--once", action="store_true", help="Esegue un solo ciclo ed esce")
+    parser.add_argument("--max-cycles", type=int, default=None)
+    parser.add_argument("--metrics-file", default=METRICS_FILE)
+    parser.add_argument("--base-url", default=None, help="URL base dell'API (es. server locale di test)")
+    args = parser.parse_args()
+
+    if args.base_url:
+        client.configure(base_url=args.base_url)
+    try:
+        sinks = [make_sink(spec) for spec in (args.sink or ["stdout"])]
+    except ValueError as e:
+        parser.error(str(e))
+
+    daemon = PriceWatchDaemon(sinks, interval=args.interval, request_budget=args.budget,
+                              metrics_file=args.metrics_file)
+    signal.signal(signal.SIGTERM, daemon.stop)
+    signal.signal(signal.SIGINT, daemon.stop)
+    print(f"👀 Daemon avviato: sink {', '.join(sink.name for sink in sinks)}, "
+          f"intervallo massimo {args.interval:.0f}s", flush=True)
+    try:
+        daemon.run(max_cycles=1 if args.once else args.max_cycles)
+    finally:
+        outbox.close()
+        history.close()
+        wishlist_store.close()
+        client.close_session()
+    print("👋 Daemon terminato", flush=True)
+
+
+if __name__ == "__main__":
+    main()
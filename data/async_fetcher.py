@@ -0,0 +1,228 @@
+"""
+Versione asyncio di data/fetcher.py.
+
+Le richieste condividono la sessione keep-alive, la cache su disco e il
+token bucket di data/client.py, ma le attese (rate limit, backoff,
+Retry-After) avvengono con asyncio.sleep e la concorrenza è limitata da un
+semaforo. Il singolo GET gira in un thread del pool di default, così
+l'event loop non resta mai bloccato dalla rete.
+
+Esempio:
+    from data import async_fetcher
+    deals, stores = async_fetcher.run(asyncio.gather(
+        async_fetcher.get_deals(), async_fetcher.get_stores()))
+"""
+import asyncio
+import time
+import weakref
+
+import requests
+
+from . import cache, client
+from .fetcher import DEALS_PAGE_SIZE, GAMES_BULK_SIZE
+
+# Numero massimo di richieste in volo per event loop
+MAX_CONCURRENCY = 8
+
+_semaphores = weakref.WeakKeyDictionary()
+
+
+def _get_semaphore():
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+        _semaphores[loop] = semaphore
+    return semaphore
+
+
+def run(coro, detach=False):
+    """
+    Esegue una coroutine su un nuovo event loop (per chiamanti sincroni)
+
+    Args:
+        detach: Se True non attende, alla chiusura del loop, le richieste
+            ancora in corso nei thread (es. abbandonate per una scadenza):
+            terminano da sole entro i timeout di rete
+    """
+    if not detach:
+        return asyncio.run(coro)
+
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        # close() chiude il pool di thread senza attenderlo (wait=False)
+        loop.close()
+
+
+async def request(endpoint, params=None, use_cache=True):
+    """
+    GET asincrona con cache, rate limit condiviso, retry e gestione 429
+
+    Le coroutine che chiedono la stessa risorsa nello stesso momento
+    condividono un'unica richiesta (vedi client.flights).
+
+    Returns:
+        requests.Response con status 2xx, oppure cache.CachedResponse
+    """
+    key = (cache.make_key(endpoint, params), use_cache)
+    return await client.flights.do_async(key, _request, endpoint, params, use_cache)
+
+
+async def _request(endpoint, params, use_cache):
+    cached = None
+    headers = {}
+    if use_cache:
+        cached, fresh = await asyncio.to_thread(cache.lookup, endpoint, params)
+        if fresh:
+            return cached
+        headers = cache.validators(cached)
+
+    async with _get_semaphore():
+        start = time.perf_counter()
+        attempt = 0
+
+        while True:
+            await client.rate_limiter.acquire_async()
+            response = None
+            try:
+                response = await asyncio.to_thread(client.send_once, endpoint, params, headers)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= client.MAX_RETRIES:
+                    client._record(endpoint, time.perf_counter() - start, attempt, error=True)
+                    raise
+            else:
+                result = await asyncio.to_thread(client.finish_response, endpoint, params, response,
+                                                 cached, use_cache, attempt, start)
+                if result is not None:
+                    return result
+
+            await asyncio.sleep(client.retry_delay(response, attempt))
+            attempt += 1
+
+
+async def get_json(endpoint, params=None, use_cache=True):
+    response = await request(endpoint, params, use_cache)
+    return response.json()
+
+
+async def get_deals(store_id=None, upper_price=None, params=None):
+    params = dict(params or {})
+
+    if store_id:
+        params["storeID"] = store_id
+
+    if upper_price:
+        params["upperPrice"] = upper_price
+
+    return await get_json("deals", params)
+
+
+async def search_games(title):
+    return await get_json("games", {"title": title})
+
+
+async def get_game_details(game_id):
+    return await get_json("games", {"id": game_id})
+
+
+async def get_stores():
+    return await get_json("stores")
+
+
+async def get_games_bulk(game_ids, skip_errors=False):
+    """Versione asincrona di fetcher.get_games_bulk: i lotti da 25 ID partono tutti insieme"""
+    ids = sorted(set(str(game_id) for game_id in game_ids if game_id not in (None, "")))
+    if not ids:
+        return {}
+
+    chunks = [ids[i:i + GAMES_BULK_SIZE] for i in range(0, len(ids), GAMES_BULK_SIZE)]
+    tasks = [get_json("games", {"ids": ",".join(chunk)}) for chunk in chunks]
+    responses = await asyncio.gather(*tasks, return_exceptions=skip_errors)
+
+    results = {}
+    for data in responses:
+        if isinstance(data, BaseException):
+            continue
+        if data:
+            results.update(data)
+    return results
+
+
+async def stream_deals(store_id=None, upper_price=None, page_size=DEALS_PAGE_SIZE,
+                       max_pages=None, max_workers=MAX_CONCURRENCY, params=None):
+    """
+    Versione asincrona di fetcher.stream_deals
+
+    Yields:
+        Liste di offerte (una per pagina), in ordine di arrivo
+    """
+    params = dict(params or {})
+    if store_id:
+        params["storeID"] = store_id
+    if upper_price:
+        params["upperPrice"] = upper_price
+
+    def page_params(page_number):
+        item = dict(params)
+        item["pageNumber"] = page_number
+        item["pageSize"] = page_size
+        return item
+
+    first = await request("deals", page_params(0))
+    try:
+        total_pages = int(first.headers.get("X-Total-Page-Count", 1))
+    except ValueError:
+        total_pages = 1
+    if max_pages is not None:
+        total_pages = min(total_pages, max_pages)
+
+    first_batch = first.json()
+    if first_batch:
+        yield first_batch
+    if total_pages <= 1 or not first_batch:
+        return
+
+    pending = set()
+    next_page = 1
+    try:
+        while next_page < total_pages and len(pending) < max_workers:
+            pending.add(asyncio.ensure_future(get_json("deals", page_params(next_page))))
+            next_page += 1
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                batch = task.result()
+                if next_page < total_pages:
+                    pending.add(asyncio.ensure_future(get_json("deals", page_params(next_page))))
+                    next_page += 1
+                if batch:
+                    yield batch
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def fetch_url(url, timeout=5):
+    """
+    Scarica un URL esterno (es. thumbnail) senza passare dal rate limiter dell'API
+
+    Returns:
+        Il contenuto in byte, oppure None in caso di errore
+    """
+    async with _get_semaphore():
+        try:
+            response = await asyncio.to_thread(client.get_session().get, url, timeout=timeout)
+        except requests.RequestException:
+            return None
+    if response.status_code != 200:
+        return None
+    return response.content
+
+
+def get_limiter_stats():
+    """Statistiche del rate limiter condiviso (attese e pause per 429)"""
+    return client.rate_limiter.get_stats()
@@ -0,0 +1,217 @@
+"""
+Cache su disco delle risposte HTTP dell'API CheapShark.
+
+Le risposte sono salvate in un database SQLite, con chiave URL base + endpoint +
+parametri (le risposte di un server di prova non vengono servite per l'API reale).
+Ogni endpoint ha il suo TTL; le voci scadute vengono rivalidate con
+ETag/Last-Modified quando il server li fornisce. La dimensione totale è
+limitata ed eviction segue l'ordine LRU (ultimo accesso).
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+CACHE_DIR = "cache"
+CACHE_FILE = os.path.join(CACHE_DIR, "http_cache.sqlite")
+
+# TTL in secondi per endpoint
+CACHE_TTL = {
+    "stores": 24 * 3600,
+    "deals": 5 * 60,
+    "games": 60 * 60,
+}
+DEFAULT_TTL = 5 * 60
+
+# Dimensione massima della cache su disco (byte)
+CACHE_MAX_BYTES = 100 * 1024 * 1024
+
+CACHE_ENABLED = os.environ.get("CHEAPSHARK_CACHE", "1") != "0"
+
+# Header conservati insieme al body (servono per paginazione e rivalidazione)
+KEPT_HEADERS = ("Content-Type", "ETag", "Last-Modified", "X-Total-Page-Count")
+
+_conn = None
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "stale": 0, "revalidated": 0, "stored": 0, "evicted": 0}
+
+
+class CachedResponse:
+    """Risposta servita dalla cache, con la stessa interfaccia minima di requests.Response"""
+
+    def __init__(self, content, headers, status_code=200):
+        self.content = content
+        self.headers = headers
+        self.status_code = status_code
+        self.from_cache = True
+
+    def json(self):
+        return json.loads(self.content)
+
+    def close(self):
+        pass
+
+
+def _get_conn():
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(CACHE_FILE) or ".", exist_ok=True)
+        conn = sqlite3.connect(CACHE_FILE, check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                endpoint TEXT NOT NULL,
+                body BLOB NOT NULL,
+                headers TEXT NOT NULL,
+                stored_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                size INTEGER NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_access ON responses(last_access)")
+        conn.commit()
+        _conn = conn
+    return _conn
+
+
+def make_key(endpoint, params=None):
+    """Chiave di cache stabile per URL base (client.BASE_URL) + endpoint + parametri"""
+    # Import locale: client importa questo modulo; BASE_URL può cambiare con client.configure
+    from .client import BASE_URL
+
+    url = f"{BASE_URL}/{endpoint}"
+    if not params:
+        return url
+    items = sorted((str(k), str(v)) for k, v in params.items())
+    return url + "?" + "&".join(f"{k}={v}" for k, v in items)
+
+
+def ttl_for(endpoint):
+    return CACHE_TTL.get(endpoint, DEFAULT_TTL)
+
+
+def lookup(endpoint, params=None):
+    """
+    Cerca una risposta in cache
+
+    Returns:
+        (CachedResponse, fresh) oppure (None, False) se assente
+    """
+    if not CACHE_ENABLED:
+        return None, False
+
+    key = make_key(endpoint, params)
+    now = time.time()
+    with _lock:
+        conn = _get_conn()
+        row = conn.execute("SELECT body, headers, stored_at FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            _stats["misses"] += 1
+            return None, False
+        conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+        conn.commit()
+
+    body, headers, stored_at = row
+    fresh = now - stored_at < ttl_for(endpoint)
+    with _lock:
+        if fresh:
+            _stats["hits"] += 1
+        else:
+            _stats["stale"] += 1
+    return CachedResponse(body, json.loads(headers)), fresh
+
+
+def validators(cached):
+    """Header condizionali per rivalidare una voce scaduta"""
+    headers = {}
+    if cached is None:
+        return headers
+    if cached.headers.get("ETag"):
+        headers["If-None-Match"] = cached.headers["ETag"]
+    if cached.headers.get("Last-Modified"):
+        headers["If-Modified-Since"] = cached.headers["Last-Modified"]
+    return headers
+
+
+def refresh(endpoint, params=None):
+    """Segna come di nuovo valida una voce dopo una risposta 304"""
+    key = make_key(endpoint, params)
+    now = time.time()
+    with _lock:
+        conn = _get_conn()
+        conn.execute("UPDATE responses SET stored_at = ?, last_access = ? WHERE key = ?", (now, now, key))
+        conn.commit()
+        _stats["revalidated"] += 1
+
+
+def store(endpoint, params, response):
+    """Salva in cache il body e gli header rilevanti di una risposta"""
+    if not CACHE_ENABLED:
+        return
+
+    key = make_key(endpoint, params)
+    body = response.content
+    headers = {}
+    for name in KEPT_HEADERS:
+        value = response.headers.get(name)
+        if value is not None:
+            headers[name] = value
+    now = time.time()
+
+    with _lock:
+        conn = _get_conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (key, endpoint, body, headers, stored_at, last_access, size) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, endpoint, body, json.dumps(headers), now, now, len(body)),
+        )
+        _stats["stored"] += 1
+        _evict(conn)
+        conn.commit()
+
+
+def _evict(conn):
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+    if total <= CACHE_MAX_BYTES:
+        return
+
+    cursor = conn.execute("SELECT key, size FROM responses ORDER BY last_access")
+    to_delete = []
+    for key, size in cursor:
+        if total <= CACHE_MAX_BYTES:
+            break
+        to_delete.append((key,))
+        total -= size
+    conn.executemany("DELETE FROM responses WHERE key = ?", to_delete)
+    _stats["evicted"] += len(to_delete)
+
+
+def clear():
+    """Svuota la cache"""
+    with _lock:
+        conn = _get_conn()
+        conn.execute("DELETE FROM responses")
+        conn.commit()
+
+
+def get_cache_stats():
+    """
+    Restituisce le statistiche della cache
+
+    Returns:
+        Dizionario con hits, misses, stale, revalidated, stored, evicted, hit_rate
+    """
+    with _lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"] + stats["stale"]
+    stats["hit_rate"] = (stats["hits"] + stats["revalidated"]) / lookups if lookups else 0.0
+    return stats
+
+
+def reset_cache_stats():
+    with _lock:
+        for name in _stats:
+            _stats[name] = 0
@@ -0,0 +1,286 @@
+"""
+Client HTTP condiviso per le chiamate all'API CheapShark.
+
+Usa una sola requests.Session con pool di connessioni keep-alive, timeout
+di connessione/lettura configurabili e retry con backoff esponenziale
+(con jitter) sugli errori 5xx e di connessione. Le risposte 429 sospendono
+il rate limiter condiviso per il tempo indicato da Retry-After. Richieste
+identiche concorrenti vengono unite in una sola (single-flight). Per ogni
+endpoint tiene contatori di richieste, retry, errori e latenza.
+"""
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import cache
+from .ratelimit import TokenBucket, parse_retry_after
+from .singleflight import SingleFlight
+
+BASE_URL = os.environ.get("CHEAPSHARK_BASE_URL", "https://www.cheapshark.com/api/1.0")
+
+# Timeout in secondi (connessione, lettura)
+CONNECT_TIMEOUT = 5.0
+READ_TIMEOUT = 20.0
+
+# Retry con backoff esponenziale: attesa = BACKOFF_BASE * 2^tentativo, con jitter
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 10.0
+
+# Dimensione del pool di connessioni keep-alive
+POOL_SIZE = 16
+
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+# Budget di richieste: RATE_LIMIT al secondo con burst fino a RATE_BURST
+RATE_LIMIT = 10.0
+RATE_BURST = 10
+
+rate_limiter = TokenBucket(RATE_LIMIT, RATE_BURST)
+
+# Richieste identiche in volo nello stesso momento condividono un'unica chiamata
+flights = SingleFlight()
+
+_session = None
+_transport = None
+_session_lock = threading.Lock()
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def configure(base_url=None, connect_timeout=None, read_timeout=None,
+              max_retries=None, backoff_base=None, pool_size=None,
+              rate_limit=None, rate_burst=None):
+    """
+    Modifica la configurazione del client
+
+    Args:
+        base_url: URL base dell'API (es. un server locale di test)
+        connect_timeout: Timeout di connessione in secondi
+        read_timeout: Timeout di lettura in secondi
+        max_retries: Numero massimo di retry per richiesta
+        backoff_base: Attesa base in secondi per il backoff
+        pool_size: Numero di connessioni mantenute nel pool
+        rate_limit: Richieste al secondo consentite
+        rate_burst: Richieste consentite in un singolo burst
+    """
+    global BASE_URL, CONNECT_TIMEOUT, READ_TIMEOUT, MAX_RETRIES, BACKOFF_BASE, POOL_SIZE
+    global RATE_LIMIT, RATE_BURST, rate_limiter
+
+    if base_url is not None:
+        BASE_URL = base_url.rstrip("/")
+    if connect_timeout is not None:
+        CONNECT_TIMEOUT = connect_timeout
+    if read_timeout is not None:
+        READ_TIMEOUT = read_timeout
+    if max_retries is not None:
+        MAX_RETRIES = max_retries
+    if backoff_base is not None:
+        BACKOFF_BASE = backoff_base
+    if pool_size is not None:
+        POOL_SIZE = pool_size
+        close_session()
+    if rate_limit is not None or rate_burst is not None:
+        if rate_limit is not None:
+            RATE_LIMIT = rate_limit
+        if rate_burst is not None:
+            RATE_BURST = rate_burst
+        rate_limiter = TokenBucket(RATE_LIMIT, RATE_BURST)
+
+
+def get_session():
+    """Restituisce la sessione condivisa, creandola alla prima chiamata"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = _transport
+                if adapter is None:
+                    adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=0)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def set_transport(adapter=None):
+    """
+    Sostituisce il trasporto HTTP della sessione condivisa
+
+    Args:
+        adapter: Adapter requests da usare (es. registrazione/replay),
+            None per tornare al pool di connessioni standard
+    """
+    global _transport
+    close_session()
+    _transport = adapter
+
+
+def close_session():
+    """Chiude la sessione condivisa e le connessioni aperte"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def _record(endpoint, elapsed, retries, error=False):
+    with _stats_lock:
+        stat = _stats.get(endpoint)
+        if stat is None:
+            stat = {"requests": 0, "retries": 0, "errors": 0, "total_time": 0.0, "max_time": 0.0}
+            _stats[endpoint] = stat
+        stat["requests"] += 1
+        stat["retries"] += retries
+        stat["total_time"] += elapsed
+        if elapsed > stat["max_time"]:
+            stat["max_time"] = elapsed
+        if error:
+            stat["errors"] += 1
+
+
+def get_stats():
+    """
+    Restituisce i contatori per endpoint
+
+    Returns:
+        Dizionario {endpoint: {requests, retries, errors, total_time, max_time, avg_time}}
+    """
+    with _stats_lock:
+        result = {}
+        for endpoint, stat in _stats.items():
+            item = dict(stat)
+            item["avg_time"] = stat["total_time"] / stat["requests"] if stat["requests"] else 0.0
+            result[endpoint] = item
+        return result
+
+
+def reset_stats():
+    """Azzera i contatori"""
+    with _stats_lock:
+        _stats.clear()
+
+
+def backoff_delay(attempt):
+    """Attesa prima del retry numero `attempt` (full jitter)"""
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt))
+    return random.uniform(0, delay)
+
+
+def retry_delay(response, attempt):
+    """
+    Attesa prima del prossimo tentativo
+
+    Per un 429 usa Retry-After (se presente) e sospende il rate limiter
+    condiviso, così anche le altre richieste in corso rallentano.
+    """
+    if response is not None and response.status_code == 429:
+        delay = parse_retry_after(response.headers.get("Retry-After"), backoff_delay(attempt))
+        rate_limiter.pause(delay)
+        return delay
+    return backoff_delay(attempt)
+
+
+def send_once(endpoint, params=None, headers=None, stream=False):
+    """Esegue un singolo tentativo di GET, senza retry"""
+    url = f"{BASE_URL}/{endpoint}"
+    return get_session().get(url, params=params, headers=headers,
+                             timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), stream=stream)
+
+
+def finish_response(endpoint, params, response, cached, use_cache, attempt, start):
+    """
+    Gestisce la risposta di un tentativo
+
+    Returns:
+        La risposta finale (o quella in cache dopo un 304), oppure None se
+        il tentativo va ripetuto
+    """
+    if response.status_code == 304 and cached is not None:
+        _record(endpoint, time.perf_counter() - start, attempt)
+        cache.refresh(endpoint, params)
+        return cached
+
+    if response.status_code in RETRY_STATUS and attempt < MAX_RETRIES:
+        response.close()
+        return None
+
+    try:
+        response.raise_for_status()
+    except requests.HTTPError:
+        _record(endpoint, time.perf_counter() - start, attempt, error=True)
+        raise
+    _record(endpoint, time.perf_counter() - start, attempt)
+    if use_cache:
+        cache.store(endpoint, params, response)
+    return response
+
+
+def request(endpoint, params=None, stream=False, use_cache=True):
+    """
+    Esegue una GET su un endpoint con cache, rate limit, retry e backoff
+
+    Se in cache c'è una risposta ancora valida viene restituita senza
+    accedere alla rete; se è scaduta viene rivalidata con ETag/Last-Modified.
+    Se la stessa richiesta è già in corso in un altro thread, ne attende il
+    risultato invece di inviarne una nuova.
+
+    Args:
+        endpoint: Nome dell'endpoint (es. "deals", "games", "stores")
+        params: Parametri query string
+        stream: Se True il body non viene scaricato subito (la cache viene saltata)
+        use_cache: Se False la cache su disco viene ignorata
+
+    Returns:
+        requests.Response con status 2xx, oppure cache.CachedResponse
+    """
+    if stream:
+        return _request(endpoint, params, stream, False)
+    key = (cache.make_key(endpoint, params), use_cache)
+    return flights.do(key, _request, endpoint, params, False, use_cache)
+
+
+def _request(endpoint, params, stream, use_cache):
+    cached = None
+    headers = {}
+    if use_cache:
+        cached, fresh = cache.lookup(endpoint, params)
+        if fresh:
+            return cached
+        headers = cache.validators(cached)
+
+    start = time.perf_counter()
+    attempt = 0
+
+    while True:
+        rate_limiter.acquire()
+        response = None
+        try:
+            response = send_once(endpoint, params, headers, stream)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt >= MAX_RETRIES:
+                _record(endpoint, time.perf_counter() - start, attempt, error=True)
+                raise
+        else:
+            result = finish_response(endpoint, params, response, cached, use_cache, attempt, start)
+            if result is not None:
+                return result
+
+        time.sleep(retry_delay(response, attempt))
+        attempt += 1
+
+
+def get_flight_stats():
+    """Contatori del single-flight: calls, executed, deduplicated"""
+    return flights.get_stats()
+
+
+def get_json(endpoint, params=None, use_cache=True):
+    """Esegue una GET e restituisce il body JSON decodificato"""
+    return request(endpoint, params, use_cache=use_cache).json()
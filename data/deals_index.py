@@ -0,0 +1,342 @@
+"""
+Indice in memoria su uno snapshot delle offerte, per molte query sugli stessi dati.
+
+Costruito una sola volta per snapshot, contiene:
+    - per salePrice, savings e normalPrice: l'ordinamento delle righe e i
+      valori ordinati, così un intervallo (es. 5 <= prezzo < 10) si trova con
+      due ricerche binarie (searchsorted) invece di una scansione;
+    - per ogni store: una bitmap delle righe (np.packbits, 1 bit per riga).
+
+Una query con più condizioni parte dall'intervallo più selettivo e ne filtra
+gli ID di riga con le altre condizioni (bitmap degli store e confronti sui
+soli candidati); le condizioni che l'indice non copre vengono valutate solo
+sulle righe rimaste. Il DataFrame non viene copiato: il risultato è una
+selezione delle righe trovate. Le righe arrivate dopo la costruzione si
+aggiungono con merge, senza riordinare tutto lo snapshot.
+
+L'indice misura il tempo di costruzione e quello di ogni query (get_stats),
+per confrontarlo con una scansione completa (vedi benchmarks/bench_index.py).
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from .query import as_column_type, compile_query, evaluate_node, numeric_values, FIELDS
+
+# Colonne numeriche indicizzate
+INDEXED_COLUMNS = ("salePrice", "savings", "normalPrice")
+
+STORE_COLUMN = "storeID"
+
+# Oltre 1/DENSE_RATIO delle righe candidate, l'intersezione usa una maschera
+# su tutto lo snapshot invece degli ID ordinati
+DENSE_RATIO = 16
+
+
+class DealsIndex:
+    """
+    Indice ordinato e bitmap per store su un DataFrame delle offerte
+
+    Args:
+        df: DataFrame delle offerte (deals_to_dataframe o tabella offerte di normalize_deals)
+        columns: Colonne numeriche da indicizzare (quelle assenti vengono ignorate)
+    """
+
+    def __init__(self, df, columns=INDEXED_COLUMNS):
+        start = time.perf_counter()
+        self.df = df
+        self.rows = len(df)
+        self._values = {}
+        self._order = {}
+        self._sorted = {}
+        self._valid = {}
+        for column in columns:
+            if column not in df.columns:
+                continue
+            # Valori nel tipo della colonna (float32 per prezzi e sconti): gli
+            # estremi delle query vengono convertiti nello stesso tipo
+            values = numeric_values(df[column])
+            # ID di riga a 32 bit: metà memoria rispetto a int64
+            order = np.argsort(values).astype(np.int32)
+            self._values[column] = values
+            self._order[column] = order
+            self._sorted[column] = values[order]
+            # argsort mette i NaN in fondo: restano fuori da ogni intervallo
+            self._valid[column] = int(np.count_nonzero(~np.isnan(values)))
+
+        self._stores = {}
+        if STORE_COLUMN in df.columns:
+            stores = df[STORE_COLUMN].astype("category")
+            codes = stores.cat.codes.to_numpy()
+            for code, store_id in enumerate(stores.cat.categories.astype(str)):
+                self._stores[store_id] = np.packbits(codes == code)
+
+        self.build_seconds = time.perf_counter() - start
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.last_query_seconds = None
+
+    def __len__(self):
+        return self.rows
+
+    def merge(self, df):
+        """
+        Aggiunge righe allo snapshot senza ricostruire l'indice
+
+        I nuovi valori vengono ordinati e inseriti tra quelli già ordinati con
+        una ricerca binaria; le bitmap degli store si estendono con i bit
+        delle nuove righe.
+
+        Args:
+            df: DataFrame con le stesse colonne dello snapshot (es. una pagina
+                di offerte arrivata dopo la costruzione)
+        """
+        if df.empty:
+            return
+        start = time.perf_counter()
+        offset = self.rows
+        categories = [column for column in self.df.columns if isinstance(self.df[column].dtype, pd.CategoricalDtype)]
+        merged = pd.concat([self.df, df], ignore_index=True)
+        for column in categories:
+            # Categorie diverse tra i due DataFrame: concat restituisce object
+            if not isinstance(merged[column].dtype, pd.CategoricalDtype):
+                merged[column] = merged[column].astype("category")
+        self.df = merged
+        self.rows = len(merged)
+
+        for column, old_values in self._values.items():
+            if column in df.columns:
+                values = numeric_values(df[column]).astype(old_values.dtype, copy=False)
+            else:
+                values = np.full(len(df), np.nan, dtype=old_values.dtype)
+            order = np.argsort(values).astype(np.int32)
+            new_sorted = values[order]
+            valid = int(np.count_nonzero(~np.isnan(values)))
+            old_valid = self._valid[column]
+            old_sorted = self._sorted[column]
+            old_order = self._order[column]
+            # side="right": a parità di valore le nuove righe vanno dopo le vecchie
+            positions = np.searchsorted(old_sorted[:old_valid], new_sorted[:valid], side="right")
+            self._sorted[column] = np.concatenate([
+                np.insert(old_sorted[:old_valid], positions, new_sorted[:valid]),
+                old_sorted[old_valid:], new_sorted[valid:],
+            ])
+            self._order[column] = np.concatenate([
+                np.insert(old_order[:old_valid], positions, order[:valid] + offset),
+                old_order[old_valid:], order[valid:] + offset,
+            ]).astype(np.int32)
+            self._values[column] = np.concatenate([old_values, values])
+            self._valid[column] = old_valid + valid
+
+        if STORE_COLUMN in df.columns:
+            size = (self.rows + 7) // 8
+            for store_id, bitmap in self._stores.items():
+                self._stores[store_id] = np.concatenate([bitmap, np.zeros(size - len(bitmap), dtype=np.uint8)])
+            stores = df[STORE_COLUMN].astype("category")
+            codes = stores.cat.codes.to_numpy()
+            for code, store_id in enumerate(stores.cat.categories.astype(str)):
+                rows = np.flatnonzero(codes == code) + offset
+                if not len(rows):
+                    continue
+                bitmap = self._stores.setdefault(store_id, np.zeros(size, dtype=np.uint8))
+                np.bitwise_or.at(bitmap, rows >> 3, (1 << (7 - (rows & 7))).astype(np.uint8))
+
+        self.build_seconds += time.perf_counter() - start
+
+    def store_ids(self):
+        """ID degli store presenti nello snapshot"""
+        return list(self._stores)
+
+    def range_rows(self, column, low=None, high=None, low_inclusive=True, high_inclusive=True):
+        """
+        ID delle righe con valore nell'intervallo, in ordine di valore
+
+        Args:
+            column: Colonna indicizzata
+            low, high: Estremi (None = illimitato)
+        """
+        sorted_values = self._sorted[column]
+        start = 0
+        end = self._valid[column]
+        if low is not None:
+            low = as_column_type(sorted_values, low)
+            start = int(np.searchsorted(sorted_values[:end], low, side="left" if low_inclusive else "right"))
+        if high is not None:
+            high = as_column_type(sorted_values, high)
+            end = int(np.searchsorted(sorted_values[:end], high, side="right" if high_inclusive else "left"))
+        return self._order[column][start:max(start, end)]
+
+    def store_bitmap(self, store_ids):
+        """Bitmap (packbits) delle righe di uno o più store"""
+        bitmap = np.zeros((self.rows + 7) // 8, dtype=np.uint8)
+        for store_id in store_ids:
+            store_bitmap = self._stores.get(str(store_id))
+            if store_bitmap is not None:
+                bitmap |= store_bitmap
+        return bitmap
+
+    def lookup(self, ranges=None, store_ids=None):
+        """
+        ID delle righe che soddisfano tutte le condizioni (in ordine crescente)
+
+        Args:
+            ranges: Dizionario {colonna: (minimo, massimo, minimo incluso, massimo incluso)};
+                minimo/massimo None = illimitato
+            store_ids: Store ammessi (None = tutti)
+        """
+        start = time.perf_counter()
+        rows = self._lookup(ranges or {}, store_ids)
+        self._record(time.perf_counter() - start)
+        return rows
+
+    def _lookup(self, ranges, store_ids):
+        slices = {column: self.range_rows(column, *bounds) for column, bounds in ranges.items()}
+        if not slices:
+            if store_ids is None:
+                return np.arange(self.rows, dtype=np.int32)
+            return np.flatnonzero(np.unpackbits(self.store_bitmap(store_ids), count=self.rows)).astype(np.int32)
+
+        # Parte dall'intervallo più selettivo (meno righe da filtrare)
+        driver = min(slices, key=lambda column: len(slices[column]))
+        rows = slices[driver]
+        if len(rows) * DENSE_RATIO > self.rows:
+            return self._lookup_dense(rows, ranges, driver, store_ids)
+
+        candidates = np.sort(rows)
+        for column, bounds in ranges.items():
+            if column != driver and len(candidates):
+                candidates = candidates[self._in_range(self._values[column][candidates], *bounds)]
+        if store_ids is not None and len(candidates):
+            # Bit della riga i: byte i >> 3, posizione 7 - (i & 7)
+            bitmap = self.store_bitmap(store_ids)
+            bits = (bitmap[candidates >> 3] >> (7 - (candidates & 7)).astype(np.uint8)) & 1
+            candidates = candidates[bits.astype(bool)]
+        return candidates
+
+    def _lookup_dense(self, rows, ranges, driver, store_ids):
+        # Molte righe candidate: una maschera su tutto lo snapshot costa meno
+        # che ordinare e filtrare gli ID uno per uno
+        mask = np.zeros(self.rows, dtype=bool)
+        mask[rows] = True
+        for column, bounds in ranges.items():
+            if column != driver:
+                mask &= self._in_range(self._values[column], *bounds)
+        if store_ids is not None:
+            mask &= np.unpackbits(self.store_bitmap(store_ids), count=self.rows).view(bool)
+        return np.flatnonzero(mask).astype(np.int32)
+
+    @staticmethod
+    def _in_range(values, low, high, low_inclusive, high_inclusive):
+        keep = ~np.isnan(values)
+        if low is not None:
+            low = as_column_type(values, low)
+            keep &= values >= low if low_inclusive else values > low
+        if high is not None:
+            high = as_column_type(values, high)
+            keep &= values <= high if high_inclusive else values < high
+        return keep
+
+    def _record(self, elapsed):
+        self.queries += 1
+        self.query_seconds += elapsed
+        self.last_query_seconds = elapsed
+
+    def filter(self, min_price=None, max_price=None, min_savings=None, store_id=None):
+        """Come filters.filter_deals, ma usando l'indice"""
+        ranges = {}
+        if min_price is not None or max_price is not None:
+            ranges["salePrice"] = (min_price, max_price, True, True)
+        if min_savings is not None:
+            ranges["savings"] = (min_savings, None, True, True)
+        store_ids = None
+        if store_id is not None:
+            store_ids = store_id if isinstance(store_id, (list, tuple, set)) else [store_id]
+        return self.take(self.lookup(ranges, store_ids))
+
+    def search(self, query):
+        """
+        Esegue un'espressione di filtro (data/query.py) sullo snapshot
+
+        Args:
+            query: Espressione (stringa) o Query compilata
+
+        Returns:
+            DataFrame delle righe trovate
+
+        Raises:
+            query.QueryError: Se l'espressione non è valida o usa campi assenti
+        """
+        return self.take(self.search_rows(query))
+
+    def search_rows(self, query):
+        """
+        Come search, ma restituisce solo gli ID delle righe (in ordine crescente)
+
+        Le condizioni in and su colonne indicizzate e store usano l'indice; le
+        altre vengono valutate solo sulle righe candidate.
+        """
+        if isinstance(query, str):
+            query = compile_query(query)
+        start = time.perf_counter()
+        ranges, store_ids, residual = self._plan(query.tree)
+        rows = self._lookup(ranges, store_ids)
+        if residual and len(rows):
+            node = residual[0] if len(residual) == 1 else ("and", residual)
+            if len(rows) == self.rows:
+                # Nessuna condizione indicizzata: scansione senza copia
+                rows = np.flatnonzero(evaluate_node(node, self.df))
+            else:
+                rows = rows[evaluate_node(node, self.df.iloc[rows])]
+        self._record(time.perf_counter() - start)
+        return rows
+
+    def _plan(self, tree):
+        """Divide le condizioni in and tra intervalli, store e resto"""
+        ranges = {}
+        store_ids = None
+        residual = []
+        conjuncts = tree[1] if tree[0] == "and" else [tree]
+        for node in conjuncts:
+            if node[0] != "cmp":
+                residual.append(node)
+                continue
+            _, field, op, value = node
+            column = FIELDS[field][0]
+            numeric = isinstance(value, (int, float)) and not isinstance(value, bool)
+            if column in self._sorted and numeric and op in ("<", "<=", ">", ">=", "=="):
+                low, high, low_inclusive, high_inclusive = ranges.get(column, (None, None, True, True))
+                if op in (">", ">=", "=="):
+                    inclusive = op != ">"
+                    if low is None or value > low or (value == low and not inclusive):
+                        low, low_inclusive = value, inclusive
+                if op in ("<", "<=", "=="):
+                    inclusive = op != "<"
+                    if high is None or value < high or (value == high and not inclusive):
+                        high, high_inclusive = value, inclusive
+                ranges[column] = (low, high, low_inclusive, high_inclusive)
+            elif field == "storeID" and self._stores and op in ("==", "in"):
+                wanted = {str(v) for v in (value if op == "in" else (value,))}
+                store_ids = wanted if store_ids is None else store_ids & wanted
+            else:
+                residual.append(node)
+        return ranges, store_ids, residual
+
+    def take(self, rows):
+        """Righe del DataFrame per ID (nell'ordine originale)"""
+        return self.df.iloc[rows].reset_index(drop=True)
+
+    def get_stats(self):
+        """
+        Tempi dell'indice
+
+        Returns:
+            Dizionario con rows, build_ms, queries, avg_query_ms, last_query_ms
+        """
+        return {
+            "rows": self.rows,
+            "build_ms": self.build_seconds * 1000,
+            "queries": self.queries,
+            "avg_query_ms": self.query_seconds / self.queries * 1000 if self.queries else None,
+            "last_query_ms": self.last_query_seconds * 1000 if self.last_query_seconds is not None else None,
+        }
@@ -0,0 +1,224 @@
+"""
+Confronto tra due snapshot delle offerte.
+
+Per ogni coppia (gameID, storeID) classifica le offerte in:
+    new            presente solo nello snapshot corrente
+    ended          presente solo nello snapshot precedente
+    price_dropped  prezzo sceso
+    price_raised   prezzo salito
+    changed        stesso prezzo, ma prezzo pieno (e quindi sconto) diverso
+
+Le chiavi vengono codificate in un unico intero e ordinate; il confronto è
+una ricerca binaria (searchsorted) tra i due array ordinati, non un confronto
+riga per riga. Un hash per riga delle colonne confrontate scarta subito le
+offerte invariate, che di solito sono la grande maggioranza.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+SNAPSHOT_DIR = "history"
+SNAPSHOT_FILE = os.path.join(SNAPSHOT_DIR, "last_snapshot.pkl")
+
+CHANGE_TYPES = ["new", "ended", "price_dropped", "price_raised", "changed"]
+
+# Colonne riportate nel risultato (se presenti negli snapshot)
+CARRY_COLUMNS = ["title", "dealID", "normalPrice", "savings"]
+
+DIFF_COLUMNS = ["change", "gameID", "storeID", "oldPrice", "newPrice", "priceChange"]
+
+# Bit riservati allo storeID nella chiave combinata
+_STORE_BITS = 16
+
+
+def _store_ids(values):
+    """storeID come interi (le categorie vengono convertite una sola volta)"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        categories = pd.to_numeric(pd.Series(values.cat.categories.astype(str)), errors="coerce")
+        # Il codice -1 (valore mancante) punta all'ultimo elemento, cioè 0
+        lookup = np.append(categories.fillna(0).to_numpy(dtype="int64"), 0)
+        return lookup[values.cat.codes.to_numpy()]
+    return pd.to_numeric(values.astype(str), errors="coerce").fillna(0).to_numpy(dtype="int64")
+
+
+def _cents(df, column):
+    if column not in df.columns:
+        return np.zeros(len(df), dtype="int64")
+    values = df[column].to_numpy(dtype="float64", na_value=np.nan)
+    return np.nan_to_num(np.round(values * 100), nan=-1).astype("int64")
+
+
+def _prepare(df):
+    """
+    Ordina uno snapshot per chiave (gameID, storeID)
+
+    Returns:
+        (df, order, keys, hashes): order sono le posizioni delle righe in
+        ordine di chiave (senza duplicati: vale l'ultima riga), keys le chiavi
+        ordinate e hashes l'hash di ogni riga nello stesso ordine
+    """
+    df = df.reset_index(drop=True)
+    valid = df["gameID"].notna().to_numpy() & df["storeID"].notna().to_numpy()
+    games = df["gameID"].to_numpy(dtype="float64", na_value=0).astype("int64")
+    keys = (games << _STORE_BITS) | _store_ids(df["storeID"])
+
+    order = np.flatnonzero(valid)
+    order = order[np.argsort(keys[order], kind="stable")]
+    sorted_keys = keys[order]
+    # Chiavi ripetute: l'ordinamento è stabile, quindi l'ultima di ogni gruppo è l'ultima riga
+    if len(sorted_keys) > 1:
+        last = np.append(sorted_keys[1:] != sorted_keys[:-1], True)
+        order = order[last]
+        sorted_keys = sorted_keys[last]
+
+    # Hash della riga: prezzo scontato e prezzo pieno in centesimi in un unico intero
+    hashes = (_cents(df, "salePrice") << 32) ^ _cents(df, "normalPrice")
+    return df, order, sorted_keys, hashes[order]
+
+
+def _rows(df, positions, change, old_prices, new_prices):
+    if len(positions) == 0:
+        return None
+    rows = df.iloc[positions]
+    result = pd.DataFrame({
+        "change": change,
+        "gameID": rows["gameID"].to_numpy(),
+        "storeID": rows["storeID"].astype(str).to_numpy(),
+        "oldPrice": old_prices,
+        "newPrice": new_prices,
+    })
+    for column in CARRY_COLUMNS:
+        if column in rows.columns:
+            result[column] = rows[column].to_numpy()
+    return result
+
+
+def diff_snapshots(previous, current):
+    """
+    Confronta due snapshot di offerte
+
+    Args:
+        previous: DataFrame dello snapshot precedente (deals_to_dataframe o tabella offerte)
+        current: DataFrame dello snapshot corrente
+
+    Returns:
+        DataFrame con change, gameID, storeID, oldPrice, newPrice, priceChange
+        e, se presenti, title, dealID, normalPrice, savings (presi dallo
+        snapshot corrente, o dal precedente per le offerte terminate).
+        Le offerte invariate non compaiono.
+    """
+    if previous is None or previous.empty:
+        previous = pd.DataFrame(columns=["gameID", "storeID", "salePrice"])
+    if current is None or current.empty:
+        current = pd.DataFrame(columns=["gameID", "storeID", "salePrice"])
+
+    prev, prev_order, prev_keys, prev_hashes = _prepare(previous)
+    cur, cur_order, cur_keys, cur_hashes = _prepare(current)
+    prev_prices = prev["salePrice"].to_numpy(dtype="float64", na_value=np.nan).round(2)
+    cur_prices = cur["salePrice"].to_numpy(dtype="float64", na_value=np.nan).round(2)
+
+    # Entrambi gli snapshot sono ordinati per chiave: ogni chiave corrente si
+    # cerca con una ricerca binaria tra le precedenti
+    pos = np.searchsorted(prev_keys, cur_keys)
+    if len(prev_keys):
+        found = (pos < len(prev_keys)) & (prev_keys[np.minimum(pos, len(prev_keys) - 1)] == cur_keys)
+    else:
+        found = np.zeros(len(cur_keys), dtype=bool)
+
+    # Le righe con lo stesso hash sono invariate e non serve confrontarle
+    matched_prev = pos[found]
+    changed = cur_hashes[found] != prev_hashes[matched_prev]
+    matched_cur = cur_order[np.flatnonzero(found)[changed]]
+    matched_prev = prev_order[matched_prev[changed]]
+    old = prev_prices[matched_prev]
+    new = cur_prices[matched_cur]
+    dropped = new < old
+    raised = new > old
+    # Hash diverso a parità di prezzo: è cambiato il prezzo pieno
+    other = ~(dropped | raised)
+
+    seen = np.zeros(len(prev_keys), dtype=bool)
+    seen[pos[found]] = True
+    ended = prev_order[~seen]
+    new_rows = cur_order[~found]
+
+    parts = [
+        _rows(cur, new_rows, "new", np.full(len(new_rows), np.nan), cur_prices[new_rows]),
+        _rows(prev, ended, "ended", prev_prices[ended], np.full(len(ended), np.nan)),
+        _rows(cur, matched_cur[dropped], "price_dropped", old[dropped], new[dropped]),
+        _rows(cur, matched_cur[raised], "price_raised", old[raised], new[raised]),
+        _rows(cur, matched_cur[other], "changed", old[other], new[other]),
+    ]
+    parts = [part for part in parts if part is not None]
+    if not parts:
+        return pd.DataFrame(columns=DIFF_COLUMNS)
+
+    diff = pd.concat(parts, ignore_index=True)
+    diff["priceChange"] = (diff["newPrice"] - diff["oldPrice"]).round(2)
+    diff["change"] = pd.Categorical(diff["change"], categories=CHANGE_TYPES)
+    diff["gameID"] = diff["gameID"].astype("Int32")
+    diff["storeID"] = diff["storeID"].astype("category")
+    columns = DIFF_COLUMNS + [column for column in diff.columns if column not in DIFF_COLUMNS]
+    return diff[columns].sort_values(["change", "gameID", "storeID"], ignore_index=True)
+
+
+def summarize_diff(diff):
+    """Numero di offerte per tipo di cambiamento"""
+    counts = {change: 0 for change in CHANGE_TYPES}
+    if not diff.empty:
+        for change, count in diff["change"].value_counts().items():
+            counts[str(change)] = int(count)
+    return counts
+
+
+def load_previous_snapshot(path=None):
+    """Carica lo snapshot salvato dall'esecuzione precedente, o None se non c'è"""
+    path = path or SNAPSHOT_FILE
+    if not os.path.exists(path):
+        return None
+    try:
+        return pd.read_pickle(path)
+    except Exception:
+        return None
+
+
+def save_snapshot(df, path=None):
+    """Salva lo snapshot corrente come riferimento per il prossimo confronto"""
+    path = path or SNAPSHOT_FILE
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    df.to_pickle(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _with_titles(df, games):
+    """Aggiunge allo snapshot i titoli dalla tabella giochi (come categoria)"""
+    if games is None or games.empty or "title" not in games.columns or "title" in df.columns:
+        return df
+    return df.assign(title=df["gameID"].map(games["title"]).astype("category"))
+
+
+def diff_with_previous(current, save=True, path=None, games=None):
+    """
+    Confronta lo snapshot corrente con quello dell'esecuzione precedente
+
+    Args:
+        current: DataFrame delle offerte appena scaricato
+        save: Se True, lo snapshot corrente diventa il nuovo riferimento
+        path: File dello snapshot (default: history/last_snapshot.pkl)
+        games: Tabella giochi indicizzata per gameID (normalize_deals); se
+            indicata, i titoli vengono salvati nello snapshot, così le
+            offerte terminate mantengono il titolo anche se il gioco non è
+            più nella tabella corrente
+
+    Returns:
+        (diff, had_previous): il DataFrame di diff_snapshots e se esisteva
+        uno snapshot precedente (alla prima esecuzione tutto risulta "new")
+    """
+    current = _with_titles(current, games)
+    previous = load_previous_snapshot(path)
+    diff = diff_snapshots(previous, current)
+    if save:
+        save_snapshot(current, path)
+    return diff, previous is not None
@@ -1,37 +1,200 @@
-import requests
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from .client import get_json, request
+from .jsonstream import stream_response
 
-BASE_URL = "https://www.cheapshark.com/api/1.0"
+# Dimensione massima di pagina accettata da /deals
+DEALS_PAGE_SIZE = 60
+# Numero massimo di pagine richieste in parallelo
+MAX_CONCURRENT_PAGES = 4
+# Offerte per batch nella decodifica incrementale
+STREAM_CHUNK_SIZE = 1000
+# Numero massimo di ID accettati da /games?ids=
+GAMES_BULK_SIZE = 25
+# Numero massimo di lotti di ID richiesti in parallelo
+MAX_CONCURRENT_BULK = 4
+
+def _deals_params(store_id=None, upper_price=None, params=None):
+    # Parametri aggiuntivi di /deals (es. da query.Query.api_params)
+    params = dict(params or {})
 
-def get_deals(store_id=None, upper_price=None):
-    url = f"{BASE_URL}/deals"
-    params = {}
-    
     if store_id:
         params["storeID"] = store_id
-    
+
     if upper_price:
         params["upperPrice"] = upper_price
-    
-    response = requests.get(url, params=params)
-    response.raise_for_status()
-    return response.json()
+
+    return params
+
+def get_deals(store_id=None, upper_price=None, params=None):
+    """
+    Scarica una pagina di /deals
+
+    Il body viene decodificato a pezzi (iter_deals) invece che con
+    response.json(): il payload completo non resta in memoria insieme alle
+    offerte decodificate. La risposta non passa dalla cache su disco.
+    """
+    deals = []
+    for batch in iter_deals(store_id, upper_price, params=params):
+        deals.extend(batch)
+    return deals
+
+def iter_deals(store_id=None, upper_price=None, chunk_size=STREAM_CHUNK_SIZE, page_size=None, params=None):
+    """
+    Come get_deals, ma decodifica la risposta in modo incrementale
+
+    Il body viene letto a pezzi e le offerte restituite a gruppi di
+    `chunk_size`, senza mai tenere in memoria l'intero payload.
+
+    Yields:
+        Liste di al massimo `chunk_size` offerte
+    """
+    params = _deals_params(store_id, upper_price, params)
+    if page_size:
+        params["pageSize"] = page_size
+
+    with stream_response(request("deals", params, stream=True)) as stream:
+        yield from stream.batches(chunk_size)
+
+def _fetch_deals_page(params, page_number, page_size):
+    page_params = dict(params)
+    page_params["pageNumber"] = page_number
+    page_params["pageSize"] = page_size
+    return request("deals", page_params)
+
+def stream_deals(store_id=None, upper_price=None, page_size=DEALS_PAGE_SIZE,
+                 max_pages=None, max_workers=MAX_CONCURRENT_PAGES, params=None):
+    """
+    Scorre tutte le pagine di /deals e restituisce i batch man mano che arrivano
+
+    La prima pagina viene scaricata subito per leggere l'header
+    X-Total-Page-Count; le pagine successive vengono scaricate in parallelo
+    con al massimo `max_workers` richieste in volo. I batch sono restituiti
+    in ordine di arrivo, non in ordine di pagina.
+
+    Args:
+        store_id: ID dello store (opzionale)
+        upper_price: Prezzo massimo (opzionale)
+        page_size: Offerte per pagina (max 60)
+        max_pages: Numero massimo di pagine da scaricare (None = tutte)
+        max_workers: Numero massimo di pagine scaricate in parallelo
+        params: Altri parametri di /deals (es. lowerPrice, onSale, metacritic)
+
+    Yields:
+        Liste di offerte (una per pagina)
+    """
+    params = _deals_params(store_id, upper_price, params)
+
+    first = _fetch_deals_page(params, 0, page_size)
+    try:
+        total_pages = int(first.headers.get("X-Total-Page-Count", 1))
+    except ValueError:
+        total_pages = 1
+    if max_pages is not None:
+        total_pages = min(total_pages, max_pages)
+
+    first_batch = first.json()
+    if first_batch:
+        yield first_batch
+    if total_pages <= 1 or not first_batch:
+        return
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = set()
+        next_page = 1
+
+        while next_page < total_pages and len(pending) < max_workers:
+            pending.add(executor.submit(_fetch_deals_page, params, next_page, page_size))
+            next_page += 1
+
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    batch = future.result().json()
+                    if next_page < total_pages:
+                        pending.add(executor.submit(_fetch_deals_page, params, next_page, page_size))
+                        next_page += 1
+                    if batch:
+                        yield batch
+        finally:
+            # Se il consumatore si ferma prima, non avviare altre pagine
+            for future in pending:
+                future.cancel()
+
+def get_all_deals(store_id=None, upper_price=None, max_pages=None):
+    """Scarica tutte le pagine di /deals e le restituisce in un'unica lista"""
+    deals = []
+    for batch in stream_deals(store_id, upper_price, max_pages=max_pages):
+        deals.extend(batch)
+    return deals
 
 def search_games(title):
-    url = f"{BASE_URL}/games"
     params = {"title": title}
-    response = requests.get(url, params=params)
-    response.raise_for_status()
-    return response.json()
+    return get_json("games", params)
 
 def get_game_details(game_id):
-    url = f"{BASE_URL}/games"
-    params = {"id": game_id}
-    response = requests.get(url, params=params)
-    response.raise_for_status()
-    return response.json()
+    """
+    Dettagli di un gioco (/games?id=): info, cheapestPriceEver e offerte
+
+    Decodificato a pezzi come open_game_details_stream; per costruire
+    direttamente il DataFrame delle offerte usare quest'ultimo con
+    parser.game_deal_batches_to_dataframe.
+    """
+    with open_game_details_stream(game_id) as stream:
+        deals = list(stream)
+        if not stream.extra and not deals:
+            return []
+        return dict(stream.extra, deals=deals)
+
+def _fetch_games_chunk(chunk):
+    params = {"ids": ",".join(chunk)}
+    return get_json("games", params)
+
+def get_games_bulk(game_ids, max_workers=MAX_CONCURRENT_BULK, skip_errors=False):
+    """
+    Recupera i dettagli di molti giochi con /games?ids=
+
+    Gli ID vengono divisi in lotti da GAMES_BULK_SIZE, i lotti sono scaricati
+    in parallelo e i risultati uniti in un unico dizionario.
+
+    Args:
+        game_ids: Lista di ID gioco
+        max_workers: Numero massimo di lotti richiesti in parallelo
+        skip_errors: Se True i lotti falliti vengono ignorati invece di sollevare l'errore
+
+    Returns:
+        Dizionario {gameID (str): dettagli} con lo stesso formato di get_game_details
+    """
+    ids = sorted(set(str(game_id) for game_id in game_ids if game_id not in (None, "")))
+    if not ids:
+        return {}
+
+    chunks = [ids[i:i + GAMES_BULK_SIZE] for i in range(0, len(ids), GAMES_BULK_SIZE)]
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+        futures = [executor.submit(_fetch_games_chunk, chunk) for chunk in chunks]
+        for future in futures:
+            try:
+                data = future.result()
+            except Exception:
+                if not skip_errors:
+                    raise
+                continue
+            if data:
+                results.update(data)
+    return results
+
+def open_game_details_stream(game_id):
+    """
+    Apre /games?id= in modalità incrementale
+
+    Returns:
+        JsonArrayStream sulle offerte del gioco; dopo averlo consumato,
+        `stream.extra` contiene "info" e "cheapestPriceEver"
+    """
+    response = request("games", {"id": game_id}, stream=True)
+    return stream_response(response, key="deals")
 
 def get_stores():
-    url = f"{BASE_URL}/stores"
-    response = requests.get(url)
-    response.raise_for_status()
-    return response.json()
+    return get_json("stores")
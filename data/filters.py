@@ -1,5 +1,8 @@
+import numpy as np
 import pandas as pd
 
+from .query import as_column_type, compile_query, numeric_values
+
 def filter_deals(df, min_price=None, max_price=None, min_savings=None, 
                  store_id=None, min_rating=None):
     """
@@ -10,7 +13,7 @@ def filter_deals(df, min_price=None, max_price=None, min_savings=None,
         min_price: Prezzo minimo
         max_price: Prezzo massimo
         min_savings: Sconto minimo in percentuale
-        store_id: ID dello store (può essere lista)
+        store_id: ID dello store, intero o stringa (può essere lista)
         min_rating: Rating minimo (se disponibile)
     
     Returns:
@@ -19,56 +22,64 @@ def filter_deals(df, min_price=None, max_price=None, min_savings=None,
     if df.empty:
         return df
     
-    filtered_df = df.copy()
-    
-    # Filtro per prezzo minimo
-    if min_price is not None:
-        if "salePrice" in filtered_df.columns:
-            filtered_df = filtered_df[filtered_df["salePrice"] >= min_price]
+    # Un'unica maschera booleana e una sola selezione finale (nessuna copia intermedia)
+    mask = np.ones(len(df), dtype=bool)
     
-    # Filtro per prezzo massimo
-    if max_price is not None:
-        if "salePrice" in filtered_df.columns:
-            filtered_df = filtered_df[filtered_df["salePrice"] <= max_price]
+    if "salePrice" in df.columns and (min_price is not None or max_price is not None):
+        # Confronto nel tipo della colonna (float32): i limiti inclusivi restano esatti
+        prices = numeric_values(df["salePrice"])
+        with np.errstate(invalid="ignore"):
+            # Filtro per prezzo minimo
+            if min_price is not None:
+                mask &= prices >= as_column_type(prices, min_price)
+            # Filtro per prezzo massimo
+            if max_price is not None:
+                mask &= prices <= as_column_type(prices, max_price)
     
     # Filtro per sconto minimo
-    if min_savings is not None:
-        if "savings" in filtered_df.columns:
-            filtered_df = filtered_df[filtered_df["savings"] >= min_savings]
+    if min_savings is not None and "savings" in df.columns:
+        savings = numeric_values(df["savings"])
+        with np.errstate(invalid="ignore"):
+            mask &= savings >= as_column_type(savings, min_savings)
     
-    # Filtro per store
-    if store_id is not None:
-        if isinstance(store_id, list):
-            if "storeID" in filtered_df.columns:
-                filtered_df = filtered_df[filtered_df["storeID"].isin(store_id)]
+    # Filtro per store: gli ID nel DataFrame sono testo, quelli richiesti possono essere interi
+    if store_id is not None and "storeID" in df.columns:
+        store_ids = [str(s) for s in (store_id if isinstance(store_id, (list, tuple, set)) else [store_id])]
+        stores = df["storeID"]
+        if isinstance(stores.dtype, pd.CategoricalDtype):
+            # Confronto sui codici delle categorie, senza convertire ogni riga in stringa
+            codes = stores.cat.categories.astype(str).get_indexer(store_ids)
+            mask &= np.isin(stores.cat.codes.to_numpy(), codes[codes >= 0])
         else:
-            if "storeID" in filtered_df.columns:
-                filtered_df = filtered_df[filtered_df["storeID"] == store_id]
+            mask &= stores.astype(str).isin(store_ids).to_numpy(dtype=bool)
     
-    return filtered_df.reset_index(drop=True)
+    return df[mask].reset_index(drop=True)
 
-def apply_advanced_filters(df, filters_dict):
+def apply_advanced_filters(df, filters):
     """
-    Applica filtri avanzati da un dizionario
+    Applica filtri avanzati da un dizionario o da un'espressione
     
     Args:
         df: DataFrame con le offerte
-        filters_dict: Dizionario con i filtri da applicare
+        filters: Dizionario con i filtri da applicare
             Esempio: {
                 'min_price': 10,
                 'max_price': 50,
                 'min_savings': 50,
                 'store_ids': [1, 2, 3]
             }
+            oppure espressione di filtro (vedi data/query.py), es.
+            "salePrice <= 10 and savings >= 75 and store in (1, 7)"
     
     Returns:
         DataFrame filtrato
     """
+    if isinstance(filters, str):
+        return compile_query(filters).apply(df)
     return filter_deals(
         df,
-        min_price=filters_dict.get('min_price'),
-        max_price=filters_dict.get('max_price'),
-        min_savings=filters_dict.get('min_savings'),
-        store_id=filters_dict.get('store_ids')
+        min_price=filters.get('min_price'),
+        max_price=filters.get('max_price'),
+        min_savings=filters.get('min_savings'),
+        store_id=filters.get('store_ids')
     )
-
@@ -0,0 +1,376 @@
+"""
+Storico locale dei prezzi delle offerte.
+
+Ogni snapshot scaricato (es. da analyze_all_deals) viene aggiunto a un
+database SQLite con chiave (gameID, storeID, timestamp). Viene salvata una
+riga solo quando il prezzo di una coppia gioco/store cambia rispetto
+all'ultima osservazione: gli snapshot ripetuti non fanno crescere il database.
+
+La tabella `latest` tiene l'ultimo prezzo e il minimo storico di ogni coppia,
+così il confronto durante l'inserimento e le query sul minimo non devono
+scorrere lo storico completo. Una coppia assente da uno snapshot completo
+viene registrata come terminata (`latest.active` = 0): se torna, anche allo
+stesso prezzo, è di nuovo un'offerta nuova.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+HISTORY_DIR = "history"
+HISTORY_FILE = os.path.join(HISTORY_DIR, "deals_history.sqlite")
+
+# Tipo di variazione registrata in prices.change
+CHANGE_NEW = 0
+CHANGE_DROP = 1
+CHANGE_RAISE = 2
+CHANGE_ENDED = 3
+CHANGE_NAMES = {CHANGE_NEW: "new", CHANGE_DROP: "price_dropped", CHANGE_RAISE: "price_raised",
+                CHANGE_ENDED: "ended"}
+
+_conn = None
+_lock = threading.Lock()
+
+
+def _get_conn():
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(HISTORY_FILE) or ".", exist_ok=True)
+        conn = sqlite3.connect(HISTORY_FILE, check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        # La tabella temporanea degli snapshot resta in memoria; cache di pagine più ampia (64 MB)
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-65536")
+        # WITHOUT ROWID: le righe sono ordinate fisicamente per chiave, quindi
+        # lo storico di un gioco (o di una coppia gioco/store) è un'unica scansione contigua
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS prices (
+                game_id INTEGER NOT NULL,
+                store_id INTEGER NOT NULL,
+                ts INTEGER NOT NULL,
+                sale_price REAL NOT NULL,
+                normal_price REAL,
+                savings REAL,
+                deal_id TEXT,
+                change INTEGER NOT NULL,
+                PRIMARY KEY (game_id, store_id, ts)
+            ) WITHOUT ROWID
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_prices_ts ON prices(ts, change)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS latest (
+                game_id INTEGER NOT NULL,
+                store_id INTEGER NOT NULL,
+                ts INTEGER NOT NULL,
+                sale_price REAL NOT NULL,
+                low_price REAL NOT NULL,
+                low_ts INTEGER NOT NULL,
+                active INTEGER NOT NULL DEFAULT 1,
+                PRIMARY KEY (game_id, store_id)
+            ) WITHOUT ROWID
+        """)
+        # Database creati prima della colonna active: tutte le coppie sono attive
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(latest)")}
+        if "active" not in columns:
+            conn.execute("ALTER TABLE latest ADD COLUMN active INTEGER NOT NULL DEFAULT 1")
+        conn.commit()
+        _conn = conn
+    return _conn
+
+
+def close():
+    """Chiude la connessione al database dello storico"""
+    global _conn
+    with _lock:
+        if _conn is not None:
+            _conn.close()
+            _conn = None
+
+
+def _snapshot_rows(df):
+    """Estrae dal DataFrame delle offerte le righe (game, store, prezzo, normale, sconto, dealID)"""
+    # In caso di duplicati nello snapshot vale l'ultima riga
+    df = df.dropna(subset=["gameID", "storeID", "salePrice"]).drop_duplicates(["gameID", "storeID"], keep="last")
+    if df.empty:
+        return []
+
+    game_ids = df["gameID"].astype("int64").tolist()
+    store_ids = pd.to_numeric(df["storeID"].astype(str), errors="coerce").fillna(-1).astype("int64").tolist()
+    # I prezzi float32 vanno arrotondati ai centesimi, altrimenti 9.99 diventa 9.9899997...
+    sale = df["salePrice"].astype("float64").round(2).tolist()
+    normal = df["normalPrice"].astype("float64").round(2).tolist() if "normalPrice" in df.columns else [None] * len(df)
+    savings = df["savings"].astype("float64").round(2).tolist() if "savings" in df.columns else [None] * len(df)
+    deal_ids = df["dealID"].astype(str).tolist() if "dealID" in df.columns else [None] * len(df)
+    return list(zip(game_ids, store_ids, sale, normal, savings, deal_ids))
+
+
+# Prezzo della riga precedente (ts minore) della stessa coppia nello storico
+_PREVIOUS_PRICE = """
+    SELECT p.sale_price FROM prices p
+    WHERE p.game_id = prices.game_id AND p.store_id = prices.store_id AND p.ts < prices.ts
+    ORDER BY p.ts DESC LIMIT 1
+"""
+
+
+def record_snapshot(df, timestamp=None, complete=True):
+    """
+    Aggiunge allo storico uno snapshot di offerte
+
+    Le coppie (gameID, storeID) il cui prezzo non è cambiato dall'ultima
+    osservazione non vengono registrate di nuovo. Con complete=True le coppie
+    attive assenti dallo snapshot vengono registrate come terminate; una
+    coppia terminata che ricompare è registrata come nuova. Più snapshot con
+    lo stesso timestamp (in secondi) producono una sola riga per coppia, con
+    l'ultimo stato. Tutto lo snapshot è scritto in un'unica transazione.
+
+    Args:
+        df: DataFrame delle offerte (deals_to_dataframe o tabella offerte di normalize_deals)
+        timestamp: Istante dello snapshot in secondi (default: adesso)
+        complete: False se lo snapshot contiene solo una parte delle offerte
+            (es. un filtro): le coppie assenti non vengono considerate terminate
+
+    Returns:
+        Dizionario con rows (righe nello snapshot), inserted, unchanged, ended
+    """
+    rows = _snapshot_rows(df)
+    # Uno snapshot vuoto (es. una risposta API vuota) non termina tutte le offerte
+    if not rows:
+        return {"rows": 0, "inserted": 0, "unchanged": 0, "ended": 0}
+
+    ts = int(timestamp if timestamp is not None else time.time())
+    with _lock:
+        conn = _get_conn()
+        with conn:
+            conn.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS snapshot (
+                    game_id INTEGER, store_id INTEGER, sale_price REAL,
+                    normal_price REAL, savings REAL, deal_id TEXT
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS snapshot_pair ON snapshot (game_id, store_id)")
+            conn.execute("DELETE FROM snapshot")
+            conn.executemany("INSERT INTO snapshot VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+            # Solo le coppie nuove o con prezzo cambiato entrano nello storico. Un
+            # secondo snapshot nello stesso secondo aggiorna la riga già scritta con
+            # quel ts (la variazione resta riferita all'osservazione precedente),
+            # così storico e `latest` restano allineati
+            inserted = conn.execute("""
+                INSERT INTO prices
+                    (game_id, store_id, ts, sale_price, normal_price, savings, deal_id, change)
+                SELECT s.game_id, s.store_id, ?, s.sale_price, s.normal_price, s.savings, s.deal_id,
+                       CASE WHEN l.game_id IS NULL OR NOT l.active THEN ?
+                            WHEN s.sale_price < l.sale_price THEN ? ELSE ? END
+                FROM snapshot s
+                LEFT JOIN latest l ON l.game_id = s.game_id AND l.store_id = s.store_id
+                WHERE l.game_id IS NULL OR NOT l.active OR l.sale_price != s.sale_price
+                ON CONFLICT (game_id, store_id, ts) DO UPDATE SET
+                    sale_price = excluded.sale_price,
+                    normal_price = excluded.normal_price,
+                    savings = excluded.savings,
+                    deal_id = excluded.deal_id,
+                    change = CASE WHEN prices.change = ? THEN prices.change
+                                  WHEN (""" + _PREVIOUS_PRICE + """) IS NULL THEN ?
+                                  WHEN excluded.sale_price < (""" + _PREVIOUS_PRICE + """) THEN ? ELSE ? END
+            """, (ts, CHANGE_NEW, CHANGE_DROP, CHANGE_RAISE, CHANGE_NEW, CHANGE_NEW, CHANGE_DROP,
+                  CHANGE_RAISE)).rowcount
+
+            # Il prezzo è tornato quello dell'osservazione precedente: nessuna variazione
+            inserted -= conn.execute("""
+                DELETE FROM prices
+                WHERE ts = ? AND change != ? AND sale_price = (""" + _PREVIOUS_PRICE + """)
+            """, (ts, CHANGE_NEW)).rowcount
+
+            ended = 0
+            if complete:
+                # Coppie attive assenti dallo snapshot: terminate (nello stesso
+                # secondo la fine sostituisce la variazione appena registrata)
+                ended = conn.execute("""
+                    INSERT INTO prices (game_id, store_id, ts, sale_price, change)
+                    SELECT l.game_id, l.store_id, ?, l.sale_price, ? FROM latest l
+                    WHERE l.active AND NOT EXISTS (
+                        SELECT 1 FROM snapshot s WHERE s.game_id = l.game_id AND s.store_id = l.store_id
+                    )
+                    ON CONFLICT (game_id, store_id, ts) DO UPDATE SET change = excluded.change
+                """, (ts, CHANGE_ENDED)).rowcount
+                conn.execute("""
+                    UPDATE latest SET active = 0
+                    WHERE active AND NOT EXISTS (
+                        SELECT 1 FROM snapshot s WHERE s.game_id = latest.game_id AND s.store_id = latest.store_id
+                    )
+                """)
+
+            conn.execute("""
+                INSERT INTO latest (game_id, store_id, ts, sale_price, low_price, low_ts, active)
+                SELECT game_id, store_id, ?, sale_price, sale_price, ?, 1 FROM snapshot WHERE true
+                ON CONFLICT (game_id, store_id) DO UPDATE SET
+                    ts = excluded.ts,
+                    active = 1,
+                    sale_price = excluded.sale_price,
+                    low_ts = CASE WHEN excluded.sale_price < latest.low_price THEN excluded.ts ELSE latest.low_ts END,
+                    low_price = MIN(latest.low_price, excluded.sale_price)
+            """, (ts, ts))
+            conn.execute("DELETE FROM snapshot")
+
+    return {"rows": len(rows), "inserted": inserted, "unchanged": len(rows) - inserted, "ended": ended}
+
+
+def _query(sql, params, columns):
+    with _lock:
+        cursor = _get_conn().execute(sql, params)
+        data = cursor.fetchall()
+    df = pd.DataFrame(data, columns=columns)
+    if "timestamp" in df.columns:
+        df["date"] = pd.to_datetime(df["timestamp"], unit="s")
+    return df
+
+
+def price_history(game_id, store_id=None, since=None, until=None):
+    """
+    Andamento del prezzo di un gioco nel tempo
+
+    Args:
+        game_id: ID del gioco
+        store_id: Limita a uno store (default: tutti)
+        since, until: Intervallo di tempo in secondi (estremi inclusi)
+
+    Returns:
+        DataFrame con gameID, storeID, timestamp, salePrice, normalPrice,
+        savings, dealID, change, date (una riga per ogni variazione di prezzo)
+    """
+    sql = ("SELECT game_id, store_id, ts, sale_price, normal_price, savings, deal_id, change "
+           "FROM prices WHERE game_id = ?")
+    params = [int(game_id)]
+    if store_id is not None:
+        sql += " AND store_id = ?"
+        params.append(int(store_id))
+    if since is not None:
+        sql += " AND ts >= ?"
+        params.append(int(since))
+    if until is not None:
+        sql += " AND ts <= ?"
+        params.append(int(until))
+    sql += " ORDER BY ts, store_id"
+
+    df = _query(sql, params, ["gameID", "storeID", "timestamp", "salePrice", "normalPrice",
+                              "savings", "dealID", "change"])
+    df["change"] = df["change"].map(CHANGE_NAMES)
+    return df
+
+
+def all_time_low(game_id=None, store_id=None):
+    """
+    Prezzo minimo storico registrato localmente per ogni coppia gioco/store
+
+    Args:
+        game_id: Limita a un gioco (default: tutti)
+        store_id: Limita a uno store (default: tutti)
+
+    Returns:
+        DataFrame con gameID, storeID, lowPrice, timestamp (del minimo),
+        currentPrice, date, ordinato per gameID e lowPrice
+    """
+    sql = "SELECT game_id, store_id, low_price, low_ts, sale_price FROM latest"
+    conditions = []
+    params = []
+    if game_id is not None:
+        conditions.append("game_id = ?")
+        params.append(int(game_id))
+    if store_id is not None:
+        conditions.append("store_id = ?")
+        params.append(int(store_id))
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY game_id, low_price"
+    return _query(sql, params, ["gameID", "storeID", "lowPrice", "timestamp", "currentPrice"])
+
+
+def deals_started_since(since, store_id=None, limit=None):
+    """
+    Offerte iniziate dopo un certo istante (coppie nuove o prezzi scesi)
+
+    Args:
+        since: Istante in secondi
+        store_id: Limita a uno store (default: tutti)
+        limit: Numero massimo di righe (le più recenti)
+
+    Returns:
+        DataFrame come price_history, ordinato dal più recente
+    """
+    sql = ("SELECT game_id, store_id, ts, sale_price, normal_price, savings, deal_id, change "
+           "FROM prices WHERE ts >= ? AND change IN (?, ?)")
+    params = [int(since), CHANGE_NEW, CHANGE_DROP]
+    if store_id is not None:
+        sql += " AND store_id = ?"
+        params.append(int(store_id))
+    sql += " ORDER BY ts DESC"
+    if limit:
+        sql += " LIMIT ?"
+        params.append(int(limit))
+
+    df = _query(sql, params, ["gameID", "storeID", "timestamp", "salePrice", "normalPrice",
+                              "savings", "dealID", "change"])
+    df["change"] = df["change"].map(CHANGE_NAMES)
+    return df
+
+
+def price_volatility(game_ids, since=None):
+    """
+    Volatilità del prezzo di più giochi (coefficiente di variazione dei prezzi
+    registrati per ogni store, in media tra gli store)
+
+    Args:
+        game_ids: ID dei giochi
+        since: Considera solo le variazioni da questo istante (secondi)
+
+    Returns:
+        Dizionario {gameID (str): deviazione standard / media}; i giochi senza
+        almeno due prezzi registrati nello stesso store non compaiono
+    """
+    ids = sorted({int(game_id) for game_id in game_ids if str(game_id).isdigit()})
+    if not ids:
+        return {}
+
+    result = {}
+    # SQLite limita il numero di parametri per query: si procede a blocchi
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        # La variazione si misura nel tempo per ogni coppia gioco/store (non tra store diversi)
+        # Le righe di fine offerta ripetono l'ultimo prezzo: non sono variazioni
+        sql = ("SELECT game_id, store_id, COUNT(*), AVG(sale_price), AVG(sale_price * sale_price) FROM prices "
+               f"WHERE game_id IN ({', '.join('?' * len(chunk))}) AND change != ?")
+        params = list(chunk) + [CHANGE_ENDED]
+        if since is not None:
+            sql += " AND ts >= ?"
+            params.append(int(since))
+        sql += " GROUP BY game_id, store_id HAVING COUNT(*) >= 2"
+        with _lock:
+            rows = _get_conn().execute(sql, params).fetchall()
+        per_game = {}
+        for game_id, store_id, count, mean, mean_sq in rows:
+            if not mean:
+                continue
+            variance = max(mean_sq - mean * mean, 0.0)
+            per_game.setdefault(str(game_id), []).append(variance ** 0.5 / mean)
+        for game_id, values in per_game.items():
+            result[game_id] = sum(values) / len(values)
+    return result
+
+
+def get_history_stats():
+    """
+    Dimensioni dello storico
+
+    Returns:
+        Dizionario con rows (variazioni registrate), pairs (coppie gioco/store),
+        first_ts, last_ts, size_bytes
+    """
+    with _lock:
+        conn = _get_conn()
+        rows, first_ts, last_ts = conn.execute("SELECT COUNT(*), MIN(ts), MAX(ts) FROM prices").fetchone()
+        pairs = conn.execute("SELECT COUNT(*) FROM latest").fetchone()[0]
+    size = os.path.getsize(HISTORY_FILE) if os.path.exists(HISTORY_FILE) else 0
+    return {"rows": rows, "pairs": pairs, "first_ts": first_ts, "last_ts": last_ts, "size_bytes": size}
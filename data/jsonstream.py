@@ -0,0 +1,158 @@
+"""
+Decodifica JSON incrementale per payload grandi.
+
+Invece di materializzare l'intera risposta con response.json(), legge il
+body a pezzi e restituisce gli elementi di un array uno alla volta: la
+memoria resta proporzionale alla dimensione del pezzo letto e del singolo
+elemento, non all'intero payload.
+
+Supporta un array al livello principale (es. /deals) oppure un array
+dentro l'oggetto principale (es. "deals" in /games?id=); gli altri campi
+dell'oggetto vengono decodificati normalmente e resi disponibili in `extra`.
+"""
+import codecs
+import json
+
+# Dimensione dei pezzi letti dalla risposta HTTP
+READ_CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = " \t\n\r"
+_DELIMITERS = ",:]}" + _WHITESPACE
+
+
+class JsonArrayStream:
+    """
+    Itera sugli elementi di un array JSON letto a pezzi
+
+    Args:
+        chunks: Iteratore di bytes (es. response.iter_content())
+        key: None se l'array è al livello principale, altrimenti il nome del
+            campo dell'oggetto principale che contiene l'array
+    """
+
+    def __init__(self, chunks, key=None, response=None):
+        self._chunks = iter(chunks)
+        self._response = response
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self.key = key
+        self.extra = {}
+        self.count = 0
+
+    def _read_more(self):
+        if self._eof:
+            return False
+        # Scarta la parte già consumata per non far crescere il buffer
+        if self._pos:
+            self._buf = self._buf[self._pos:]
+            self._pos = 0
+        for chunk in self._chunks:
+            if chunk:
+                self._buf += self._decoder.decode(chunk)
+                return True
+        self._buf += self._decoder.decode(b"", final=True)
+        self._eof = True
+        return False
+
+    def _peek(self):
+        """Restituisce il prossimo carattere significativo (senza consumarlo), o "" a fine input"""
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._read_more():
+                return ""
+
+    def _expect(self, chars):
+        char = self._peek()
+        if char not in chars or char == "":
+            raise json.JSONDecodeError(f"Atteso uno tra {chars!r}", self._buf, self._pos)
+        self._pos += 1
+        return char
+
+    def _decode_value(self):
+        """Decodifica il prossimo valore completo, leggendo altri pezzi se necessario"""
+        self._peek()
+        while True:
+            try:
+                value, end = self._json.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if not self._read_more():
+                    raise
+                continue
+            # Un numero troncato dal pezzo (es. "12" di "123" o "1.5" di "1.5e3")
+            # sembra valido: lo si accetta solo se seguito da un delimitatore
+            if not self._eof and self._buf[self._pos] not in "{[\"":
+                if end >= len(self._buf) or self._buf[end] not in _DELIMITERS:
+                    self._read_more()
+                    continue
+            self._pos = end
+            return value
+
+    def _iter_array(self):
+        self._expect("[")
+        if self._peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            item = self._decode_value()
+            self.count += 1
+            yield item
+            if self._expect(",]") == "]":
+                return
+
+    def __iter__(self):
+        if self.key is None:
+            yield from self._iter_array()
+            return
+
+        if self._peek() == "[":
+            # CheapShark risponde [] invece di un oggetto per un ID inesistente
+            self._expect("[")
+            self._expect("]")
+            return
+        self._expect("{")
+        if self._peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            name = self._decode_value()
+            self._expect(":")
+            if name == self.key and self._peek() == "[":
+                yield from self._iter_array()
+            else:
+                self.extra[name] = self._decode_value()
+            if self._expect(",}") == "}":
+                return
+
+    def close(self):
+        """Chiude la risposta HTTP sottostante (se presente)"""
+        if self._response is not None:
+            self._response.close()
+            self._response = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def batches(self, size):
+        """Raggruppa gli elementi in liste di al massimo `size` elementi"""
+        batch = []
+        for item in self:
+            batch.append(item)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def stream_response(response, key=None, chunk_size=READ_CHUNK_SIZE):
+    """Crea un JsonArrayStream sul body di una risposta requests aperta con stream=True"""
+    return JsonArrayStream(response.iter_content(chunk_size=chunk_size), key, response)
@@ -0,0 +1,89 @@
+"""
+Modello normalizzato delle offerte: tabella giochi + tabella offerte.
+
+Nel DataFrame di deals_to_dataframe ogni riga ripete titolo, thumbnail e
+Steam ID del gioco, anche se lo stesso gioco compare una volta per store.
+Qui quei campi vengono spostati in una tabella dei giochi (una riga per
+gameID) e le offerte restano una tabella stretta di colonne numeriche e
+chiavi intere. I campi descrittivi si uniscono solo quando servono per la
+visualizzazione o l'export (join_games).
+"""
+import pandas as pd
+
+# Colonne che descrivono il gioco e non la singola offerta
+GAME_COLUMNS = ["title", "thumb", "steamAppID", "steamRating"]
+
+# Colonne della tabella offerte: solo valori numerici e chiavi
+DEAL_COLUMNS = ["gameID", "storeID", "salePrice", "normalPrice", "savings"]
+
+
+def normalize_deals(df, extra_columns=None):
+    """
+    Divide il DataFrame delle offerte in tabella giochi e tabella offerte
+
+    Args:
+        df: DataFrame prodotto da deals_to_dataframe
+        extra_columns: Altre colonne da tenere nella tabella offerte (es. ["dealID"])
+
+    Returns:
+        (games, deals): games indicizzato per gameID con le colonne descrittive,
+        deals con le sole colonne numeriche, storeID e gameID
+    """
+    if df.empty or "gameID" not in df.columns:
+        return pd.DataFrame(), df
+
+    game_columns = [column for column in GAME_COLUMNS if column in df.columns]
+    games = df[["gameID"] + game_columns].drop_duplicates("gameID").set_index("gameID")
+
+    deal_columns = DEAL_COLUMNS + list(extra_columns or [])
+    deals = df[[column for column in deal_columns if column in df.columns]]
+    return games, deals
+
+
+def merge_games(games, new_games):
+    """Aggiorna la tabella giochi con quella di un nuovo snapshot (i dati nuovi prevalgono)"""
+    if games is None or games.empty:
+        return new_games
+    if new_games is None or new_games.empty:
+        return games
+    combined = pd.concat([games[~games.index.isin(new_games.index)], new_games])
+    for column in combined.columns:
+        if column in games.columns and games[column].dtype == "category":
+            combined[column] = combined[column].astype("category")
+    return combined
+
+
+def join_games(deals, games, columns=None):
+    """
+    Aggiunge alle offerte le colonne descrittive dei giochi
+
+    Da usare sul sottoinsieme da mostrare o esportare (es. top 10), non
+    sull'intera tabella.
+
+    Args:
+        deals: Tabella offerte (deve contenere gameID)
+        games: Tabella giochi indicizzata per gameID
+        columns: Colonne dei giochi da aggiungere (default: tutte)
+    """
+    if deals.empty or games is None or games.empty or "gameID" not in deals.columns:
+        return deals
+
+    if columns is None:
+        columns = list(games.columns)
+    columns = [column for column in columns if column in games.columns and column not in deals.columns]
+    if not columns:
+        return deals
+
+    joined = deals.copy()
+    for column in columns:
+        joined[column] = deals["gameID"].map(games[column])
+    return joined
+
+
+def memory_usage(*frames):
+    """Memoria occupata (byte, inclusi gli oggetti Python) da uno o più DataFrame"""
+    total = 0
+    for frame in frames:
+        if frame is not None:
+            total += int(frame.memory_usage(deep=True).sum())
+    return total
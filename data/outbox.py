@@ -0,0 +1,174 @@
+"""
+Outbox durevole degli alert prezzi.
+
+Gli alert prodotti dai controlli della wishlist vengono salvati in SQLite
+prima di essere inviati ai sink (stdout, webhook, email). Ogni alert ha una
+chiave (gameID, dealID, prezzo): la stessa offerta allo stesso prezzo viene
+registrata una sola volta, anche se ricompare a ogni controllo.
+
+Per ogni sink si tiene traccia di consegne e tentativi falliti, così un sink
+non raggiungibile non blocca gli altri e gli alert vengono ritentati al
+giro successivo, anche dopo un riavvio.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+OUTBOX_DIR = "history"
+OUTBOX_FILE = os.path.join(OUTBOX_DIR, "alerts_outbox.sqlite")
+
+# Tentativi di consegna per sink prima di rinunciare
+MAX_ATTEMPTS = 5
+
+# Gli alert consegnati restano (e continuano a deduplicare) per questo tempo (secondi)
+RETENTION = 30 * 24 * 3600
+
+_conn = None
+_lock = threading.Lock()
+
+
+def _get_conn():
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(OUTBOX_FILE) or ".", exist_ok=True)
+        conn = sqlite3.connect(OUTBOX_FILE, check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS alerts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                dedup_key TEXT NOT NULL UNIQUE,
+                created_at REAL NOT NULL,
+                payload TEXT NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS deliveries (
+                alert_id INTEGER NOT NULL,
+                sink TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                delivered_at REAL,
+                last_error TEXT,
+                PRIMARY KEY (alert_id, sink)
+            ) WITHOUT ROWID
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_alerts_created ON alerts(created_at)")
+        conn.commit()
+        _conn = conn
+    return _conn
+
+
+def close():
+    global _conn
+    with _lock:
+        if _conn is not None:
+            _conn.close()
+            _conn = None
+
+
+def dedup_key(alert):
+    """Chiave di deduplicazione: gioco, offerta e prezzo al centesimo"""
+    return f"{alert.get('gameID')}|{alert.get('dealID') or ''}|{float(alert.get('currentPrice', 0)):.2f}"
+
+
+def enqueue(alerts):
+    """
+    Salva nuovi alert nell'outbox
+
+    Returns:
+        Numero di alert effettivamente nuovi (i duplicati vengono ignorati)
+    """
+    now = time.time()
+    rows = [(dedup_key(alert), now, json.dumps(alert, ensure_ascii=False)) for alert in alerts]
+    if not rows:
+        return 0
+    with _lock:
+        conn = _get_conn()
+        with conn:
+            before = conn.total_changes
+            conn.executemany("INSERT OR IGNORE INTO alerts (dedup_key, created_at, payload) VALUES (?, ?, ?)", rows)
+            return conn.total_changes - before
+
+
+def pending(sink, limit=100):
+    """
+    Alert non ancora consegnati a un sink (dal più vecchio)
+
+    Returns:
+        Lista di (alert_id, alert)
+    """
+    with _lock:
+        rows = _get_conn().execute("""
+            SELECT a.id, a.payload FROM alerts a
+            LEFT JOIN deliveries d ON d.alert_id = a.id AND d.sink = ?
+            WHERE d.delivered_at IS NULL AND COALESCE(d.attempts, 0) < ?
+            ORDER BY a.id
+            LIMIT ?
+        """, (sink, MAX_ATTEMPTS, limit)).fetchall()
+    return [(alert_id, json.loads(payload)) for alert_id, payload in rows]
+
+
+def mark_delivered(alert_id, sink):
+    with _lock:
+        conn = _get_conn()
+        with conn:
+            conn.execute("""
+                INSERT INTO deliveries (alert_id, sink, attempts, delivered_at) VALUES (?, ?, 1, ?)
+                ON CONFLICT (alert_id, sink) DO UPDATE SET
+                    attempts = attempts + 1, delivered_at = excluded.delivered_at, last_error = NULL
+            """, (alert_id, sink, time.time()))
+
+
+def mark_failed(alert_id, sink, error):
+    with _lock:
+        conn = _get_conn()
+        with conn:
+            conn.execute("""
+                INSERT INTO deliveries (alert_id, sink, attempts, last_error) VALUES (?, ?, 1, ?)
+                ON CONFLICT (alert_id, sink) DO UPDATE SET
+                    attempts = attempts + 1, last_error = excluded.last_error
+            """, (alert_id, sink, str(error)[:500]))
+
+
+def backlog(sinks):
+    """Alert in attesa di consegna per ogni sink: {sink: numero}"""
+    result = {}
+    with _lock:
+        conn = _get_conn()
+        for sink in sinks:
+            result[sink] = conn.execute("""
+                SELECT COUNT(*) FROM alerts a
+                LEFT JOIN deliveries d ON d.alert_id = a.id AND d.sink = ?
+                WHERE d.delivered_at IS NULL AND COALESCE(d.attempts, 0) < ?
+            """, (sink, MAX_ATTEMPTS)).fetchone()[0]
+    return result
+
+
+def prune(retention=RETENTION):
+    """Elimina gli alert più vecchi di `retention` secondi; restituisce quanti"""
+    cutoff = time.time() - retention
+    with _lock:
+        conn = _get_conn()
+        with conn:
+            conn.execute("DELETE FROM deliveries WHERE alert_id IN (SELECT id FROM alerts WHERE created_at < ?)",
+                         (cutoff,))
+            return conn.execute("DELETE FROM alerts WHERE created_at < ?", (cutoff,)).rowcount
+
+
+def get_outbox_stats():
+    """
+    Dimensioni dell'outbox
+
+    Returns:
+        Dizionario con alerts, delivered (consegne riuscite), failed (consegne
+        abbandonate dopo MAX_ATTEMPTS)
+    """
+    with _lock:
+        conn = _get_conn()
+        alerts = conn.execute("SELECT COUNT(*) FROM alerts").fetchone()[0]
+        delivered = conn.execute("SELECT COUNT(*) FROM deliveries WHERE delivered_at IS NOT NULL").fetchone()[0]
+        failed = conn.execute("SELECT COUNT(*) FROM deliveries WHERE delivered_at IS NULL AND attempts >= ?",
+                              (MAX_ATTEMPTS,)).fetchone()[0]
+    return {"alerts": alerts, "delivered": delivered, "failed": failed}
@@ -1,95 +1,125 @@
 import pandas as pd
 
+# Schema delle colonne per ogni endpoint:
+#   colonna DataFrame -> (chiave JSON, tipo, valore di default)
+# Tipi: "float32" (prezzi/percentuali), "int" (ID interi, nullable),
+#       "category" (valori ripetuti come storeID), "str" (testo libero)
+DEALS_SCHEMA = {
+    "title": ("title", "str", ""),
+    "salePrice": ("salePrice", "float32", None),
+    "normalPrice": ("normalPrice", "float32", None),
+    "savings": ("savings", "float32", None),
+    "steamRating": ("steamRatingText", "category", "N/A"),
+    "storeID": ("storeID", "category", ""),
+    "gameID": ("gameID", "int", None),
+    "dealID": ("dealID", "str", ""),
+    "steamAppID": ("steamAppID", "str", ""),
+    "thumb": ("thumb", "str", ""),
+}
+
+GAME_DEALS_SCHEMA = {
+    "storeID": ("storeID", "category", ""),
+    "price": ("price", "float32", None),
+    "retailPrice": ("retailPrice", "float32", None),
+    "savings": ("savings", "float32", None),
+    "dealID": ("dealID", "str", ""),
+}
+
+SEARCH_SCHEMA = {
+    "gameID": ("gameID", "int", None),
+    "title": ("external", "str", ""),
+    "cheapest": ("cheapest", "float32", None),
+    "steamAppID": ("steamAppID", "str", ""),
+}
+
+def _to_numeric(values, dtype):
+    """Conversione veloce da stringhe a numeri; i valori non validi diventano NaN"""
+    array = values.to_numpy(dtype=object)
+    try:
+        return array.astype(dtype)
+    except (TypeError, ValueError):
+        return pd.to_numeric(array, errors="coerce")
+
+def apply_schema_dtypes(df, schema):
+    """Converte le colonne di un DataFrame ai tipi compatti dello schema"""
+    for column, (key, kind, default) in schema.items():
+        if column not in df.columns:
+            continue
+        values = df[column]
+        if kind == "float32":
+            df[column] = pd.Series(_to_numeric(values, "float64"), index=df.index).astype("float32")
+        elif kind == "int":
+            df[column] = pd.Series(_to_numeric(values, "int64"), index=df.index).astype("Int32")
+        elif kind == "category":
+            if default is not None:
+                values = values.fillna(default)
+            df[column] = values.astype("category")
+        else:
+            if default is not None:
+                values = values.fillna(default)
+            df[column] = values.astype("str")
+    return df
+
+def records_to_dataframe(records, schema):
+    """
+    Costruisce un DataFrame dai record JSON secondo lo schema
+
+    Le colonne vengono estratte in un'unica passata dal costruttore di
+    pandas (senza inferenza dei tipi) e poi convertite ai tipi compatti.
+    """
+    if not records:
+        return pd.DataFrame()
+
+    keys = [key for key, kind, default in schema.values()]
+    df = pd.DataFrame(records, columns=keys, dtype=object)
+    df.columns = list(schema.keys())
+    return apply_schema_dtypes(df, schema)
+
 def deals_to_dataframe(deals):
-    if not deals:
+    return records_to_dataframe(deals, DEALS_SCHEMA)
+
+def record_batches_to_dataframe(batches, schema, on_batch=None):
+    """
+    Converte un flusso di batch di record in un unico DataFrame secondo lo schema
+
+    Args:
+        on_batch: Funzione chiamata con il DataFrame di ogni batch appena
+            convertito (es. DealStats.update per le statistiche incrementali)
+    """
+    frames = []
+    for batch in batches:
+        df = records_to_dataframe(batch, schema)
+        if not df.empty:
+            if on_batch is not None:
+                on_batch(df)
+            frames.append(df)
+
+    if not frames:
         return pd.DataFrame()
-    
-    rows = []
-    
-    for deal in deals:
-        titolo = deal.get("title", "")
-        prezzo_scontato = deal.get("salePrice", "0")
-        prezzo_normale = deal.get("normalPrice", "0")
-        risparmio = deal.get("savings", "0")
-        rating = deal.get("steamRatingText", "N/A")
-        store_id = deal.get("storeID", "")
-        game_id = deal.get("gameID", "")
-        thumb = deal.get("thumb", "")
-        
-        row = {
-            "title": titolo,
-            "salePrice": prezzo_scontato,
-            "normalPrice": prezzo_normale,
-            "savings": risparmio,
-            "steamRating": rating,
-            "storeID": store_id,
-            "gameID": game_id,
-            "thumb": thumb
-        }
-        rows.append(row)
-    
-    df = pd.DataFrame(rows)
-    
-    df["salePrice"] = pd.to_numeric(df["salePrice"], errors="coerce")
-    df["normalPrice"] = pd.to_numeric(df["normalPrice"], errors="coerce")
-    df["savings"] = pd.to_numeric(df["savings"], errors="coerce")
-    
+
+    df = pd.concat(frames, ignore_index=True)
+    # pd.concat perde il tipo category se i batch hanno categorie diverse
+    for column, (key, kind, default) in schema.items():
+        if kind == "category" and df[column].dtype != "category":
+            df[column] = df[column].astype("category")
     return df
 
+def deal_batches_to_dataframe(batches, on_batch=None):
+    """Converte un flusso di batch di offerte (es. da stream_deals o iter_deals) in un unico DataFrame"""
+    return record_batches_to_dataframe(batches, DEALS_SCHEMA, on_batch)
+
 def game_details_to_dataframe(game_data):
     if not game_data:
         return pd.DataFrame()
-    
+
     if "deals" not in game_data:
         return pd.DataFrame()
-    
-    rows = []
-    
-    for deal in game_data["deals"]:
-        store_id = deal.get("storeID", "")
-        prezzo = deal.get("price", "0")
-        prezzo_originale = deal.get("retailPrice", "0")
-        risparmio = deal.get("savings", "0")
-        deal_id = deal.get("dealID", "")
-        
-        row = {
-            "storeID": store_id,
-            "price": prezzo,
-            "retailPrice": prezzo_originale,
-            "savings": risparmio,
-            "dealID": deal_id
-        }
-        rows.append(row)
-    
-    df = pd.DataFrame(rows)
-    
-    df["price"] = pd.to_numeric(df["price"], errors="coerce")
-    df["retailPrice"] = pd.to_numeric(df["retailPrice"], errors="coerce")
-    df["savings"] = pd.to_numeric(df["savings"], errors="coerce")
-    
-    return df
+
+    return records_to_dataframe(game_data["deals"], GAME_DEALS_SCHEMA)
+
+def game_deal_batches_to_dataframe(batches):
+    """Converte i batch di offerte di un gioco (es. da open_game_details_stream) in un DataFrame"""
+    return record_batches_to_dataframe(batches, GAME_DEALS_SCHEMA)
 
 def search_results_to_dataframe(search_results):
-    if not search_results:
-        return pd.DataFrame()
-    
-    rows = []
-    
-    for game in search_results:
-        game_id = game.get("gameID", "")
-        titolo = game.get("external", "")
-        prezzo_migliore = game.get("cheapest", "0")
-        steam_id = game.get("steamAppID", "")
-        
-        row = {
-            "gameID": game_id,
-            "title": titolo,
-            "cheapest": prezzo_migliore,
-            "steamAppID": steam_id
-        }
-        rows.append(row)
-    
-    df = pd.DataFrame(rows)
-    df["cheapest"] = pd.to_numeric(df["cheapest"], errors="coerce")
-    
-    return df
+    return records_to_dataframe(search_results, SEARCH_SCHEMA)
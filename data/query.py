@@ -0,0 +1,567 @@
+"""
+Linguaggio di filtro per le offerte.
+
+Un'espressione come
+
+    salePrice <= 10 and savings >= 75 and store in (1, 7)
+
+viene compilata una sola volta in un albero di predicati:
+    - le condizioni che l'API /deals sa valutare (upperPrice, lowerPrice,
+      storeID, onSale, metacritic, steamRating) vengono spinte nei parametri
+      della richiesta, così le righe scartate non vengono neanche scaricate;
+    - il resto viene valutato localmente in un'unica maschera booleana
+      (numpy), con una sola selezione finale del DataFrame.
+
+Sintassi:
+    campo op valore        op: <, <=, >, >=, ==, =, !=
+    campo [not] in (v1, v2, ...)
+    campo contains "testo" (solo campi di testo, senza distinzione maiuscole)
+    and, or, not, parentesi
+
+I valori sono numeri, stringhe tra virgolette o parole semplici
+(es. steamRating == "Very Positive"). explain() mostra quali condizioni
+vanno all'API e quali restano locali.
+"""
+import math
+import re
+
+import numpy as np
+import pandas as pd
+
+# Campi del linguaggio:
+#   nome -> (colonna del DataFrame, tipo, parametro API)
+# Tipi: "number", "store" (ID salvati come testo/category), "text"
+FIELDS = {
+    "salePrice": ("salePrice", "number", None),
+    "normalPrice": ("normalPrice", "number", None),
+    "savings": ("savings", "number", None),
+    "storeID": ("storeID", "store", "storeID"),
+    "gameID": ("gameID", "number", None),
+    "title": ("title", "text", None),
+    "dealID": ("dealID", "text", None),
+    "steamRating": ("steamRating", "text", "steamRating"),
+    "metacritic": ("metacriticScore", "number", "metacritic"),
+    "onSale": ("isOnSale", "number", "onSale"),
+}
+
+ALIASES = {
+    "price": "salePrice",
+    "sale": "salePrice",
+    "normal": "normalPrice",
+    "retail": "normalPrice",
+    "discount": "savings",
+    "store": "storeID",
+    "game": "gameID",
+    "rating": "steamRating",
+    "metacriticScore": "metacritic",
+}
+
+# Campi che l'API sa filtrare ma che deals_to_dataframe non conserva: se non
+# possono essere spinti nei parametri e il DataFrame non ha la colonna, la
+# query non è valutabile
+API_ONLY_FIELDS = {"metacritic", "onSale"}
+
+# Con steamRating numerico si confronta la percentuale (parametro API), con
+# un testo la valutazione (colonna steamRating)
+STEAM_RATING_PERCENT_COLUMN = "steamRatingPercent"
+
+# upperPrice >= 50 equivale a nessun limite per l'API
+API_MAX_UPPER_PRICE = 50
+
+COMPARISONS = ("<", "<=", ">", ">=", "==", "!=")
+
+_TOKEN_RE = re.compile(r"""
+    \s*(?:
+        (?P<number>-?\d+(?:\.\d+)?)
+      | (?P<string>"[^"]*"|'[^']*')
+      | (?P<op><=|>=|==|!=|<|>|=|\(|\)|,)
+      | (?P<word>[A-Za-z_][A-Za-z0-9_]*)
+    )""", re.VERBOSE)
+
+KEYWORDS = {"and", "or", "not", "in", "contains", "true", "false"}
+
+
+class QueryError(ValueError):
+    """Espressione di filtro non valida o non valutabile"""
+
+
+def _tokenize(text):
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = _TOKEN_RE.match(text, position)
+        if match is None or match.end() == position:
+            raise QueryError(f"Carattere non valido in posizione {position}: {text[position:position + 10]!r}")
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "number":
+            value = float(value) if "." in value else int(value)
+        elif kind == "string":
+            value = value[1:-1]
+        elif kind == "word" and value.lower() in KEYWORDS:
+            kind, value = "keyword", value.lower()
+        tokens.append((kind, value))
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+    """Parser a discesa ricorsiva: or -> and -> not -> confronto"""
+
+    def __init__(self, text):
+        self.tokens = _tokenize(text)
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else (None, None)
+
+    def take(self, kind=None, value=None):
+        token = self.peek()
+        if token[0] is None or (kind and token[0] != kind) or (value is not None and token[1] != value):
+            expected = value or kind or "un valore"
+            found = token[1] if token[0] else "fine dell'espressione"
+            raise QueryError(f"Atteso {expected!r}, trovato {found!r}")
+        self.position += 1
+        return token
+
+    def accept(self, kind, value):
+        if self.peek() == (kind, value):
+            self.position += 1
+            return True
+        return False
+
+    def parse(self):
+        if not self.tokens:
+            raise QueryError("Espressione vuota")
+        node = self.parse_or()
+        if self.position < len(self.tokens):
+            raise QueryError(f"Testo inatteso: {self.peek()[1]!r}")
+        return node
+
+    def parse_or(self):
+        nodes = [self.parse_and()]
+        while self.accept("keyword", "or"):
+            nodes.append(self.parse_and())
+        return nodes[0] if len(nodes) == 1 else ("or", nodes)
+
+    def parse_and(self):
+        nodes = [self.parse_not()]
+        while self.accept("keyword", "and"):
+            nodes.append(self.parse_not())
+        return nodes[0] if len(nodes) == 1 else ("and", nodes)
+
+    def parse_not(self):
+        if self.accept("keyword", "not"):
+            return ("not", self.parse_not())
+        if self.accept("op", "("):
+            node = self.parse_or()
+            self.take("op", ")")
+            return node
+        return self.parse_comparison()
+
+    def parse_comparison(self):
+        field = _resolve_field(self.take("word")[1])
+        kind, value = self.peek()
+        if kind == "keyword" and value in ("in", "not"):
+            negate = self.accept("keyword", "not")
+            self.take("keyword", "in")
+            self.take("op", "(")
+            values = [self.parse_value()]
+            while self.accept("op", ","):
+                values.append(self.parse_value())
+            self.take("op", ")")
+            return ("cmp", field, "not in" if negate else "in", tuple(values))
+        if kind == "keyword" and value == "contains":
+            self.position += 1
+            return ("cmp", field, "contains", str(self.parse_value()))
+        op = self.take("op")[1]
+        if op == "=":
+            op = "=="
+        if op not in COMPARISONS:
+            raise QueryError(f"Operatore non valido: {op!r}")
+        return ("cmp", field, op, self.parse_value())
+
+    def parse_value(self):
+        kind, value = self.take()
+        if kind in ("number", "string"):
+            return value
+        if kind == "keyword" and value in ("true", "false"):
+            return 1 if value == "true" else 0
+        if kind == "word":
+            return value
+        raise QueryError(f"Valore non valido: {value!r}")
+
+
+def _resolve_field(name):
+    lookup = {field.lower(): field for field in FIELDS}
+    lookup.update({alias.lower(): field for alias, field in ALIASES.items()})
+    field = lookup.get(name.lower())
+    if field is None:
+        raise QueryError(f"Campo sconosciuto: {name} (disponibili: {', '.join(FIELDS)})")
+    return field
+
+
+def _format_value(value):
+    if isinstance(value, str):
+        return f'"{value}"' if not re.fullmatch(r"[A-Za-z0-9_.]+", value) else value
+    return str(value)
+
+
+def format_node(node):
+    """Riscrive un nodo dell'albero come espressione"""
+    kind = node[0]
+    if kind in ("and", "or"):
+        parts = []
+        for child in node[1]:
+            text = format_node(child)
+            # Le parentesi servono solo per un or dentro un and
+            parts.append(f"({text})" if kind == "and" and child[0] == "or" else text)
+        return f" {kind} ".join(parts)
+    if kind == "not":
+        inner = node[1]
+        text = format_node(inner)
+        return f"not ({text})" if inner[0] in ("and", "or") else f"not {text}"
+    _, field, op, value = node
+    if op in ("in", "not in"):
+        return f"{field} {op} ({', '.join(_format_value(v) for v in value)})"
+    return f"{field} {op} {_format_value(value)}"
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _pushdown(node):
+    """
+    Parametri API equivalenti (o più larghi) di un confronto
+
+    Returns:
+        (parametri, esatto) oppure None se l'API non sa valutarlo. Se non è
+        esatto, il confronto va comunque valutato anche localmente.
+    """
+    if node[0] != "cmp":
+        return None
+    _, field, op, value = node
+
+    if field == "salePrice" and _is_number(value):
+        if op in ("<=", "<"):
+            bound = math.ceil(value)
+            if 0 < bound < API_MAX_UPPER_PRICE:
+                return {"upperPrice": bound}, op == "<=" and bound == value
+        if op in (">=", ">"):
+            bound = math.floor(value)
+            if bound > 0:
+                return {"lowerPrice": bound}, op == ">=" and bound == value
+        return None
+
+    if field == "storeID":
+        if op == "==":
+            return {"storeID": (str(value),)}, True
+        if op == "in":
+            return {"storeID": tuple(str(v) for v in value)}, True
+        return None
+
+    if field == "onSale" and op == "==" and value in (1, 0):
+        # L'API sa chiedere solo le offerte in saldo
+        return ({"onSale": 1}, True) if value == 1 else None
+
+    if field in ("metacritic", "steamRating") and _is_number(value) and op in (">=", ">"):
+        # Punteggi interi: >= 80.5 equivale a >= 81, > 80 a >= 81
+        bound = math.ceil(value) if op == ">=" else math.floor(value) + 1
+        return {FIELDS[field][2]: bound}, True
+
+    return None
+
+
+def _merge_params(params, new):
+    """Unisce i parametri di due condizioni in and; restituisce False se non rappresentabile"""
+    for key, value in new.items():
+        if key not in params:
+            params[key] = value
+        elif key == "upperPrice":
+            params[key] = min(params[key], value)
+        elif key == "storeID":
+            stores = tuple(store for store in params[key] if store in value)
+            if not stores:
+                # Nessuno store in comune: lo lascia valutare localmente (risultato vuoto)
+                return False
+            params[key] = stores
+        else:
+            params[key] = max(params[key], value)
+    return True
+
+
+class Query:
+    """
+    Espressione di filtro compilata
+
+    Attributes:
+        text: Espressione originale
+        tree: Albero dei predicati
+        api_params: Parametri per /deals (vedi fetcher.stream_deals)
+        pushed: Condizioni spinte nell'API, come (espressione, parametri)
+        local: Albero valutato localmente dopo il download (None se tutto è nell'API)
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.tree = _Parser(text).parse()
+        self.pushed = []
+        self.api_params = {}
+        local = []
+
+        conjuncts = self.tree[1] if self.tree[0] == "and" else [self.tree]
+        for node in conjuncts:
+            result = _pushdown(node)
+            if result is not None:
+                params, exact = result
+                if _merge_params(self.api_params, params):
+                    self.pushed.append((format_node(node), params))
+                    if exact:
+                        continue
+            local.append(node)
+
+        if not local:
+            self.local = None
+        elif len(local) == 1:
+            self.local = local[0]
+        else:
+            self.local = ("and", local)
+
+        if "storeID" in self.api_params:
+            self.api_params["storeID"] = ",".join(self.api_params["storeID"])
+
+    def __repr__(self):
+        return f"Query({self.text!r})"
+
+    def mask(self, df, pushed=False):
+        """
+        Maschera booleana delle righe che soddisfano la query
+
+        Args:
+            df: DataFrame delle offerte
+            pushed: True se df è stato scaricato con api_params (valuta solo
+                la parte locale)
+        """
+        node = self.local if pushed else self.tree
+        if node is None:
+            return np.ones(len(df), dtype=bool)
+        return _evaluate(node, df, {})
+
+    def apply(self, df, pushed=False):
+        """Righe di df che soddisfano la query (una sola selezione)"""
+        if df.empty:
+            return df
+        if pushed and self.local is None:
+            return df.reset_index(drop=True)
+        return df[self.mask(df, pushed)].reset_index(drop=True)
+
+    def fetch(self, max_pages=None):
+        """
+        Scarica le offerte con i parametri API e applica la parte locale
+
+        Ogni pagina viene filtrata appena arriva: in memoria restano solo le
+        righe che soddisfano la query.
+
+        Returns:
+            DataFrame delle offerte (come deals_to_dataframe)
+        """
+        from .fetcher import stream_deals
+        from .parser import deals_to_dataframe, DEALS_SCHEMA
+
+        # Controlla prima di scaricare che la parte locale sia valutabile
+        empty = pd.DataFrame(columns=list(DEALS_SCHEMA))
+        for field, op, value in _comparisons(self.local):
+            _column(empty, field, value, {})
+
+        frames = []
+        for batch in stream_deals(max_pages=max_pages, params=self.api_params):
+            df = self.apply(deals_to_dataframe(batch), pushed=True)
+            if not df.empty:
+                frames.append(df)
+        if not frames:
+            return pd.DataFrame()
+        df = pd.concat(frames, ignore_index=True)
+        for column, (key, kind, default) in DEALS_SCHEMA.items():
+            if kind == "category" and df[column].dtype != "category":
+                df[column] = df[column].astype("category")
+        return df
+
+    def explain(self):
+        """Descrizione testuale del piano: condizioni spinte nell'API e valutate localmente"""
+        lines = [f"Query: {format_node(self.tree)}", "API (/deals):"]
+        if self.pushed:
+            for expression, params in self.pushed:
+                rendered = ", ".join(
+                    f"{key}={','.join(value) if isinstance(value, tuple) else value}" for key, value in params.items()
+                )
+                lines.append(f"  {rendered:<24} <- {expression}")
+            final = "&".join(f"{key}={value}" for key, value in self.api_params.items())
+            lines.append(f"  parametri: {final}")
+        else:
+            lines.append("  (nessuna condizione)")
+        lines.append("Locale:")
+        lines.append(f"  {format_node(self.local)}" if self.local is not None else "  (nessuna condizione)")
+        return "\n".join(lines)
+
+
+def compile_query(text):
+    """
+    Compila un'espressione di filtro
+
+    Raises:
+        QueryError: Se l'espressione non è valida
+    """
+    return Query(text)
+
+
+def filter_query(df, text):
+    """Filtra un DataFrame di offerte già scaricato con un'espressione"""
+    return compile_query(text).apply(df)
+
+
+def query_from_filters(filters_dict):
+    """
+    Espressione equivalente al dizionario di apply_advanced_filters
+
+    Returns:
+        Espressione (stringa), None se il dizionario non contiene filtri
+    """
+    parts = []
+    if filters_dict.get("min_price") is not None:
+        parts.append(f"salePrice >= {filters_dict['min_price']}")
+    if filters_dict.get("max_price") is not None:
+        parts.append(f"salePrice <= {filters_dict['max_price']}")
+    if filters_dict.get("min_savings") is not None:
+        parts.append(f"savings >= {filters_dict['min_savings']}")
+    store_ids = filters_dict.get("store_ids")
+    if store_ids is not None:
+        if not isinstance(store_ids, (list, tuple, set)):
+            store_ids = [store_ids]
+        if store_ids:
+            parts.append(f"storeID in ({', '.join(_format_value(str(s)) for s in store_ids)})")
+    return " and ".join(parts) or None
+
+
+def evaluate_node(node, df):
+    """Maschera booleana di un nodo dell'albero (es. una parte di Query.tree) su df"""
+    return _evaluate(node, df, {})
+
+
+def _comparisons(node):
+    """Confronti (campo, operatore, valore) contenuti in un albero"""
+    if node is None:
+        return []
+    if node[0] in ("and", "or"):
+        return [item for child in node[1] for item in _comparisons(child)]
+    if node[0] == "not":
+        return _comparisons(node[1])
+    _, field, op, value = node
+    return [(field, op, value[0] if op in ("in", "not in") else value)]
+
+
+def numeric_values(series):
+    """
+    Valori di una colonna numerica come array numpy, senza cambiarne la precisione
+
+    Le colonne float32 (prezzi, sconti) restano float32: convertirle in float64
+    sposterebbe 9.99 su 9.98999977..., e i confronti inclusivi o di uguaglianza
+    con il valore digitato dall'utente non corrisponderebbero più.
+
+    Args:
+        series: Serie pandas numerica
+
+    Returns:
+        Array numpy float (NaN per i valori mancanti)
+    """
+    dtype = getattr(series.dtype, "numpy_dtype", series.dtype)
+    if not (isinstance(dtype, np.dtype) and dtype.kind == "f"):
+        dtype = np.float64
+    return series.to_numpy(dtype=dtype, na_value=np.nan)
+
+
+def as_column_type(values, number):
+    """Valore letterale convertito nel tipo dell'array con cui va confrontato"""
+    return values.dtype.type(number)
+
+
+def _column(df, field, value, cache):
+    """Colonna del DataFrame per un campo (con conversione numerica in cache)"""
+    column, kind, _ = FIELDS[field]
+    if field == "steamRating" and _is_number(value):
+        column, kind = STEAM_RATING_PERCENT_COLUMN, "number"
+    if column not in df.columns:
+        if field in API_ONLY_FIELDS or column == STEAM_RATING_PERCENT_COLUMN:
+            raise QueryError(f"{field} è disponibile solo come filtro API (condizione in and con le altre, "
+                             f"con >= o >): non può essere valutato sulle offerte scaricate")
+        raise QueryError(f"Colonna {column} assente nelle offerte")
+    key = (column, kind)
+    if key not in cache:
+        series = df[column]
+        if kind == "number":
+            cache[key] = numeric_values(series)
+        else:
+            cache[key] = series
+    return cache[key], kind
+
+
+def _evaluate(node, df, cache):
+    kind = node[0]
+    if kind == "and":
+        # Copia: la maschera del primo figlio può essere una vista in sola lettura di pandas
+        mask = _evaluate(node[1][0], df, cache).copy()
+        for child in node[1][1:]:
+            mask &= _evaluate(child, df, cache)
+        return mask
+    if kind == "or":
+        mask = _evaluate(node[1][0], df, cache).copy()
+        for child in node[1][1:]:
+            mask |= _evaluate(child, df, cache)
+        return mask
+    if kind == "not":
+        return ~_evaluate(node[1], df, cache)
+
+    _, field, op, value = node
+    values, column_kind = _column(df, field, value if op not in ("in", "not in") else value[0], cache)
+
+    if column_kind == "number":
+        if op in ("in", "not in"):
+            try:
+                wanted = np.array([float(v) for v in value], dtype=values.dtype)
+            except ValueError:
+                raise QueryError(f"{field} richiede valori numerici")
+            mask = np.isin(values, wanted)
+            return ~mask if op == "not in" else mask
+        if op == "contains":
+            raise QueryError(f"contains non si applica al campo numerico {field}")
+        try:
+            number = as_column_type(values, float(value))
+        except (TypeError, ValueError):
+            raise QueryError(f"{field} richiede un valore numerico, non {value!r}")
+        with np.errstate(invalid="ignore"):
+            if op == "<":
+                return values < number
+            if op == "<=":
+                return values <= number
+            if op == ">":
+                return values > number
+            if op == ">=":
+                return values >= number
+            if op == "==":
+                return values == number
+            return values != number
+
+    # Campi di testo e store (gli ID store sono confrontati come testo)
+    if op in ("<", "<=", ">", ">="):
+        raise QueryError(f"Il campo {field} ammette solo ==, !=, in, contains")
+    if op == "contains":
+        return values.astype(str).str.contains(value, case=False, regex=False).to_numpy(dtype=bool)
+    wanted = [str(v) for v in (value if op in ("in", "not in") else (value,))]
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Confronto sui codici interi delle categorie, senza materializzare le stringhe
+        codes = values.cat.categories.astype(str).get_indexer(wanted)
+        mask = np.isin(values.cat.codes.to_numpy(), codes[codes >= 0])
+    else:
+        mask = np.isin(values.astype(str).to_numpy(), wanted)
+    return ~mask if op in ("!=", "not in") else mask
@@ -0,0 +1,91 @@
+"""
+Rate limiter a token bucket condiviso tra chiamate sincrone e asyncio.
+
+Il bucket si ricarica a `rate` token al secondo fino a `capacity`. Una
+risposta 429 può sospendere l'intero bucket con pause(), così tutte le
+richieste successive rispettano il Retry-After del server.
+"""
+import asyncio
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+
+class TokenBucket:
+    """Token bucket thread-safe con attesa sincrona e asincrona"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.waits = 0
+        self.pauses = 0
+
+    def _reserve(self):
+        """Prende un token se disponibile, altrimenti restituisce i secondi da attendere"""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+
+            elapsed = now - self._updated
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        """Attende (bloccando il thread) finché non c'è un token disponibile"""
+        while True:
+            delay = self._reserve()
+            if delay <= 0:
+                return
+            self.waits += 1
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        """Attende senza bloccare l'event loop finché non c'è un token disponibile"""
+        while True:
+            delay = self._reserve()
+            if delay <= 0:
+                return
+            self.waits += 1
+            await asyncio.sleep(delay)
+
+    def pause(self, seconds):
+        """Sospende il bucket per `seconds` secondi (es. dopo un 429) e lo svuota"""
+        with self._lock:
+            until = time.monotonic() + seconds
+            if until > self._paused_until:
+                self._paused_until = until
+            self._tokens = 0.0
+            self._updated = time.monotonic()
+            self.pauses += 1
+
+    def get_stats(self):
+        return {"rate": self.rate, "capacity": self.capacity, "waits": self.waits, "pauses": self.pauses}
+
+
+def parse_retry_after(value, default=None):
+    """
+    Converte l'header Retry-After in secondi
+
+    Accetta sia il formato in secondi ("120") sia una data HTTP.
+    """
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return default
+    return max(0.0, when.timestamp() - time.time())
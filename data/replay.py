@@ -0,0 +1,180 @@
+"""
+Registrazione e replay delle risposte dell'API CheapShark.
+
+In modalità registrazione ogni risposta ricevuta dal client condiviso viene
+salvata in un archivio di fixture (JSON Lines compresso con gzip). In
+modalità replay le stesse risposte vengono servite dall'archivio senza
+accedere alla rete, così i test e i benchmark sono deterministici.
+
+Esempio:
+    from data import replay
+    replay.start_recording("fixtures/cheapshark.jsonl.gz")
+    ...  # chiamate normali a data.fetcher
+    replay.stop()
+
+    replay.start_replay("fixtures/cheapshark.jsonl.gz")
+"""
+import gzip
+import io
+import json
+import os
+import threading
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from . import cache, client
+
+# Header salvati nell'archivio insieme al body
+RECORDED_HEADERS = ("Content-Type", "ETag", "Last-Modified", "X-Total-Page-Count", "Retry-After")
+
+_active = None
+_cache_was_enabled = None
+
+
+def fixture_key(url):
+    """
+    Chiave di una richiesta nell'archivio: endpoint + query ordinata
+
+    L'host e il percorso base vengono ignorati, così un archivio registrato
+    contro l'API reale può essere servito da un server locale.
+    """
+    parts = urlsplit(url)
+    endpoint = parts.path.rstrip("/").rsplit("/", 1)[-1]
+    query = sorted(parse_qsl(parts.query, keep_blank_values=True))
+    if not query:
+        return endpoint
+    return endpoint + "?" + urlencode(query)
+
+
+def load_archive(path):
+    """Carica un archivio di fixture: {chiave: {status, headers, body}}"""
+    entries = {}
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            entries[entry["key"]] = entry
+    return entries
+
+
+def save_archive(entries, path):
+    """Salva un archivio di fixture (una risposta per riga)"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        for key in sorted(entries):
+            f.write(json.dumps(entries[key], ensure_ascii=False, separators=(",", ":")))
+            f.write("\n")
+    os.replace(tmp_path, path)
+
+
+class RecordingAdapter(HTTPAdapter):
+    """Adapter che inoltra le richieste alla rete e registra le risposte"""
+
+    def __init__(self, path, **kwargs):
+        kwargs.setdefault("pool_connections", client.POOL_SIZE)
+        kwargs.setdefault("pool_maxsize", client.POOL_SIZE)
+        super().__init__(**kwargs)
+        self.path = path
+        self.entries = load_archive(path) if os.path.exists(path) else {}
+        self._lock = threading.Lock()
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        if request.method != "GET" or response.status_code >= 500:
+            return response
+
+        headers = {}
+        for name in RECORDED_HEADERS:
+            if name in response.headers:
+                headers[name] = response.headers[name]
+
+        entry = {
+            "key": fixture_key(request.url),
+            "status": response.status_code,
+            "headers": headers,
+            "body": response.content.decode("utf-8"),
+        }
+        with self._lock:
+            self.entries[entry["key"]] = entry
+        return response
+
+    def close(self):
+        with self._lock:
+            save_archive(self.entries, self.path)
+        super().close()
+
+
+class ReplayAdapter(BaseAdapter):
+    """Adapter che serve le risposte da un archivio di fixture, senza rete"""
+
+    def __init__(self, path):
+        super().__init__()
+        self.entries = load_archive(path)
+        self.misses = []
+
+    def send(self, request, **kwargs):
+        key = fixture_key(request.url)
+        entry = self.entries.get(key)
+
+        response = requests.Response()
+        response.url = request.url
+        response.request = request
+        response.encoding = "utf-8"
+        if entry is None:
+            self.misses.append(key)
+            response.status_code = 404
+            response.reason = "Not in fixture archive"
+            response.headers = CaseInsensitiveDict({"Content-Type": "text/plain"})
+            body = f"Nessuna fixture per {key}".encode("utf-8")
+        else:
+            response.status_code = entry["status"]
+            response.reason = "OK" if entry["status"] < 400 else "Error"
+            response.headers = CaseInsensitiveDict(entry["headers"])
+            body = entry["body"].encode("utf-8")
+        # Body letto da `raw` come per una risposta di rete: funzionano sia
+        # response.content sia iter_content (richieste con stream=True)
+        response.raw = io.BytesIO(body)
+        return response
+
+    def close(self):
+        pass
+
+
+def _activate(adapter):
+    global _active, _cache_was_enabled
+    stop()
+    # La cache su disco renderebbe la registrazione/replay non deterministica
+    _cache_was_enabled = cache.CACHE_ENABLED
+    cache.CACHE_ENABLED = False
+    client.set_transport(adapter)
+    _active = adapter
+    return adapter
+
+
+def start_recording(path):
+    """Registra tutte le risposte del client condiviso nell'archivio `path`"""
+    return _activate(RecordingAdapter(path))
+
+
+def start_replay(path):
+    """Serve tutte le richieste del client condiviso dall'archivio `path`"""
+    return _activate(ReplayAdapter(path))
+
+
+def stop():
+    """Termina registrazione/replay (l'archivio registrato viene salvato) e torna alla rete"""
+    global _active, _cache_was_enabled
+    if _active is None:
+        return
+    client.set_transport(None)
+    _active.close()
+    _active = None
+    if _cache_was_enabled is not None:
+        cache.CACHE_ENABLED = _cache_was_enabled
+        _cache_was_enabled = None
@@ -1,25 +1,46 @@
 import pandas as pd
 import json
 import os
+import tempfile
+from contextlib import contextmanager
+from datetime import date
 
 # Cartelle per i vari formati
 EXPORTS_BASE = "exports"
 CSV_DIR = os.path.join(EXPORTS_BASE, "csv")
 JSON_DIR = os.path.join(EXPORTS_BASE, "json")
 XLSX_DIR = os.path.join(EXPORTS_BASE, "xlsx")
+PARQUET_DIR = os.path.join(EXPORTS_BASE, "parquet")
+FEATHER_DIR = os.path.join(EXPORTS_BASE, "feather")
+
+# Compressione di default per i formati colonnari
+PARQUET_COMPRESSION = "zstd"
+FEATHER_COMPRESSION = "lz4"
+
+# Colonna aggiunta per il partizionamento per data dello snapshot
+SNAPSHOT_DATE_COLUMN = "snapshotDate"
+
+# Righe per batch quando un DataFrame già in memoria viene esportato a pezzi
+EXPORT_BATCH_SIZE = 50000
+
+# Righe massime per foglio Excel (limite del formato, intestazione inclusa)
+EXCEL_MAX_ROWS = 1048576
 
 def ensure_export_dirs():
     """Crea le cartelle per i vari formati se non esistono"""
     os.makedirs(CSV_DIR, exist_ok=True)
     os.makedirs(JSON_DIR, exist_ok=True)
     os.makedirs(XLSX_DIR, exist_ok=True)
+    os.makedirs(PARQUET_DIR, exist_ok=True)
+    os.makedirs(FEATHER_DIR, exist_ok=True)
 
 def save_csv(df, path):
     """Salva DataFrame in formato CSV"""
     if df.empty:
         return False
     ensure_export_dirs()
-    df.to_csv(path, index=False)
+    with atomic_write(path, newline="") as f:
+        df.to_csv(f, index=False)
     return True
 
 def save_json(df, path):
@@ -27,9 +48,17 @@ def save_json(df, path):
     if df.empty:
         return False
     ensure_export_dirs()
-    df.to_json(path, orient='records', indent=2, force_ascii=False)
+    with atomic_write(path) as f:
+        df.to_json(f, orient='records', indent=2, force_ascii=False)
     return True
 
+def save_jsonl(df, path):
+    """Salva DataFrame in formato JSON Lines (più compatto del JSON indentato)"""
+    if df.empty:
+        return False
+    ensure_export_dirs()
+    return stream_jsonl([df], path) > 0
+
 def save_excel(df, path):
     """Salva DataFrame in formato Excel"""
     if df.empty:
@@ -43,19 +72,320 @@ def save_excel(df, path):
         return False
     
     try:
-        df.to_excel(path, index=False, engine='openpyxl')
+        with atomic_write(path, mode="path") as tmp_path:
+            df.to_excel(tmp_path, index=False, engine='openpyxl')
+        return True
+    except Exception:
+        return False
+
+@contextmanager
+def atomic_write(path, mode="w", encoding="utf-8", newline=None):
+    """
+    Apre un file temporaneo nella stessa cartella di `path` e lo rinomina
+    al posto del file finale solo se la scrittura termina senza errori
+    (un export interrotto non lascia mai un file a metà)
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=os.path.splitext(path)[1], dir=directory)
+    # mkstemp crea il file leggibile solo dal proprietario
+    os.chmod(tmp_path, 0o644)
+    try:
+        if mode == "path":
+            os.close(fd)
+            yield tmp_path
+        elif "b" in mode:
+            with os.fdopen(fd, mode) as f:
+                yield f
+        else:
+            with os.fdopen(fd, mode, encoding=encoding, newline=newline) as f:
+                yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+class _EmptyExport(Exception):
+    """Flusso senza righe: il file temporaneo viene scartato"""
+
+def _aligned_batches(batches):
+    """Salta i batch vuoti e riporta tutti i batch alle colonne del primo"""
+    columns = None
+    for batch in batches:
+        if batch is None or batch.empty:
+            continue
+        if columns is None:
+            columns = list(batch.columns)
+        elif list(batch.columns) != columns:
+            batch = batch.reindex(columns=columns)
+        yield batch
+
+def stream_csv(batches, path):
+    """
+    Scrive in CSV un flusso di DataFrame un batch alla volta
+
+    Args:
+        batches: Iteratore di DataFrame (es. deals_to_dataframe su ogni pagina di stream_deals)
+        path: File di destinazione
+
+    Returns:
+        Numero di righe scritte (0: nessun file creato)
+    """
+    rows = 0
+    try:
+        with atomic_write(path, newline="") as f:
+            for batch in _aligned_batches(batches):
+                batch.to_csv(f, index=False, header=rows == 0)
+                rows += len(batch)
+            if rows == 0:
+                raise _EmptyExport()
+    except _EmptyExport:
+        return 0
+    return rows
+
+def stream_jsonl(batches, path):
+    """Scrive in JSON Lines (un oggetto per riga) un flusso di DataFrame; restituisce le righe scritte"""
+    rows = 0
+    try:
+        with atomic_write(path) as f:
+            for batch in _aligned_batches(batches):
+                f.write(batch.to_json(orient='records', lines=True, force_ascii=False))
+                f.write("\n")
+                rows += len(batch)
+            if rows == 0:
+                raise _EmptyExport()
+    except _EmptyExport:
+        return 0
+    return rows
+
+def stream_excel(batches, path, sheet_name="Deals"):
+    """
+    Scrive in Excel un flusso di DataFrame con un workbook openpyxl in modalità
+    write-only: le righe vengono scritte su disco man mano e la memoria resta
+    costante. Oltre il limite di righe di Excel si continua su un nuovo foglio.
+
+    Returns:
+        Numero di righe scritte (0 se nessun dato o openpyxl non installato)
+    """
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        return 0
+
+    workbook = Workbook(write_only=True)
+    sheet = None
+    sheet_rows = 0
+    rows = 0
+    for batch in _aligned_batches(batches):
+        header = list(batch.columns)
+        # NaN/NA non sono valori Excel validi: diventano celle vuote
+        values = batch.astype(object).where(batch.notna(), None)
+        for row in values.itertuples(index=False, name=None):
+            if sheet is None or sheet_rows >= EXCEL_MAX_ROWS:
+                title = sheet_name if sheet is None else f"{sheet_name} {len(workbook.worksheets) + 1}"
+                sheet = workbook.create_sheet(title)
+                sheet.append(header)
+                sheet_rows = 1
+            sheet.append(row)
+            sheet_rows += 1
+            rows += 1
+
+    if rows == 0:
+        return 0
+    with atomic_write(path, mode="path") as tmp_path:
+        workbook.save(tmp_path)
+    return rows
+
+def frame_batches(df, batch_size=EXPORT_BATCH_SIZE):
+    """Divide un DataFrame in batch di righe (viste, senza copie) per gli export a flusso"""
+    for start in range(0, len(df), batch_size):
+        yield df.iloc[start:start + batch_size]
+
+def save_batches(batches, filename, format='csv'):
+    """
+    Esporta un flusso di DataFrame senza tenerlo tutto in memoria
+
+    Args:
+        batches: Iteratore di DataFrame con le stesse colonne
+        filename: Nome del file (senza estensione e senza percorso)
+        format: Formato ('csv', 'jsonl', 'excel')
+
+    Returns:
+        Percorso completo del file salvato, o None se nessuna riga o errore
+    """
+    ensure_export_dirs()
+    filename = os.path.basename(filename)
+    if filename.endswith(('.csv', '.jsonl', '.xlsx')):
+        filename = os.path.splitext(filename)[0]
+
+    format = format.lower()
+    if format == 'csv':
+        full_path = os.path.join(CSV_DIR, f"{filename}.csv")
+        rows = stream_csv(batches, full_path)
+    elif format in ['jsonl', 'json']:
+        full_path = os.path.join(JSON_DIR, f"{filename}.jsonl")
+        rows = stream_jsonl(batches, full_path)
+    elif format in ['excel', 'xlsx']:
+        full_path = os.path.join(XLSX_DIR, f"{filename}.xlsx")
+        rows = stream_excel(batches, full_path)
+    else:
+        return None
+    return full_path if rows else None
+
+def _partition_frame(df, partition_by, snapshot_date=None):
+    """Prepara il DataFrame per il partizionamento Hive (aggiunge la data se richiesta)"""
+    partition_cols = []
+    for name in partition_by or []:
+        if name in ("date", SNAPSHOT_DATE_COLUMN):
+            if SNAPSHOT_DATE_COLUMN not in df.columns:
+                df = df.assign(**{SNAPSHOT_DATE_COLUMN: (snapshot_date or date.today()).isoformat()})
+            partition_cols.append(SNAPSHOT_DATE_COLUMN)
+        elif name in df.columns:
+            partition_cols.append(name)
+    return df, partition_cols
+
+def save_columnar(df, path, format='parquet', compression=None, partition_by=None, snapshot_date=None):
+    """
+    Salva DataFrame in formato colonnare (Parquet o Feather/Arrow IPC)
+    
+    Args:
+        df: DataFrame da salvare
+        path: File di destinazione, oppure cartella se si partiziona
+        format: 'parquet' o 'feather'
+        compression: Codec ('zstd', 'snappy', 'gzip', 'lz4', 'uncompressed'...)
+        partition_by: Colonne per il partizionamento Hive, es. ['date', 'storeID']
+            ('date' aggiunge la colonna snapshotDate)
+        snapshot_date: Data dello snapshot (default: oggi)
+    
+    Returns:
+        True se salvato, False se DataFrame vuoto o pyarrow non installato
+    """
+    if df.empty:
+        return False
+    
+    # Verifica se pyarrow è installato
+    try:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+    except ImportError:
+        return False
+    
+    ensure_export_dirs()
+    if format == 'parquet':
+        compression = compression or PARQUET_COMPRESSION
+    else:
+        compression = compression or FEATHER_COMPRESSION
+    if compression == 'none':
+        compression = 'uncompressed'
+    
+    df, partition_cols = _partition_frame(df, partition_by, snapshot_date)
+    try:
+        _write_columnar(pa, ds, df, path, format, compression, partition_cols)
         return True
     except Exception:
         return False
 
-def save_data(df, filename, format='csv'):
+def _write_columnar(pa, ds, df, path, format, compression, partition_cols):
+    if not partition_cols:
+        # File singolo: scritto in un temporaneo e rinominato, come gli altri export
+        with atomic_write(path, mode="path") as tmp_path:
+            if format == 'parquet':
+                df.to_parquet(tmp_path, index=False, compression=compression)
+            else:
+                df.reset_index(drop=True).to_feather(tmp_path, compression=compression)
+        return
+    
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # Le colonne di partizione diventano nomi di cartella: vanno scritte come stringhe
+    for name in partition_cols:
+        index = table.schema.get_field_index(name)
+        table = table.set_column(index, name, table.column(name).cast(pa.string()))
+    
+    file_format = ds.ParquetFileFormat() if format == 'parquet' else ds.IpcFileFormat()
+    if format == 'parquet':
+        file_options = file_format.make_write_options(compression=compression)
+    else:
+        codec = None if compression == 'uncompressed' else compression
+        file_options = file_format.make_write_options(compression=codec)
+    
+    ds.write_dataset(
+        table, path, format=file_format, file_options=file_options,
+        partitioning=partition_cols, partitioning_flavor="hive",
+        existing_data_behavior="delete_matching",
+        basename_template="part-{i}." + ("parquet" if format == 'parquet' else "feather"),
+    )
+
+def load_data(filename, format='parquet', columns=None, filters=None):
+    """
+    Carica un export Parquet/Feather, eventualmente partizionato
+    
+    La proiezione delle colonne e i filtri sulle righe vengono applicati
+    durante la lettura (le partizioni e i row group esclusi non vengono letti).
+    
+    Args:
+        filename: Nome dell'export (come in save_data) oppure percorso
+        format: 'parquet' o 'feather'
+        columns: Lista di colonne da leggere (default: tutte)
+        filters: Filtri in forma [(colonna, operatore, valore), ...] in AND,
+            es. [('storeID', '=', '1'), ('salePrice', '<', 10)]
+            Operatori: =, ==, !=, <, <=, >, >=, in, not in
+    
+    Returns:
+        DataFrame, o None se il file non esiste o pyarrow non è installato
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        import pyarrow.parquet as pq
+    except ImportError:
+        return None
+    
+    format = 'feather' if format.lower() in ('feather', 'arrow', 'ipc') else 'parquet'
+    path = filename
+    if not os.path.exists(path):
+        base_dir = PARQUET_DIR if format == 'parquet' else FEATHER_DIR
+        name = os.path.splitext(os.path.basename(filename))[0]
+        path = os.path.join(base_dir, name)
+        if not os.path.exists(path):
+            path = os.path.join(base_dir, f"{name}.{format}")
+    if not os.path.exists(path):
+        return None
+    
+    file_format = 'parquet' if format == 'parquet' else 'ipc'
+    dataset = ds.dataset(path, format=file_format, partitioning="hive")
+    # Le chiavi di partizione si rileggono come stringhe (come sono state scritte),
+    # altrimenti storeID=1 verrebbe interpretato come intero
+    partition_names = []
+    if os.path.isdir(path) and dataset.files:
+        relative = os.path.relpath(dataset.files[0], path)
+        partition_names = [part.split("=", 1)[0] for part in relative.split(os.sep)[:-1] if "=" in part]
+    if partition_names:
+        partition_schema = pa.schema([(name, pa.string()) for name in partition_names])
+        schema = dataset.schema
+        for name in partition_names:
+            schema = schema.set(schema.get_field_index(name), pa.field(name, pa.string()))
+        dataset = ds.dataset(path, schema=schema, format=file_format,
+                             partitioning=ds.partitioning(partition_schema, flavor="hive"))
+    expression = pq.filters_to_expression(filters) if filters else None
+    table = dataset.to_table(columns=columns, filter=expression)
+    df = table.to_pandas()
+    for name in partition_names:
+        if name in df.columns and name != SNAPSHOT_DATE_COLUMN:
+            df[name] = df[name].astype("category")
+    return df
+
+def save_data(df, filename, format='csv', compression=None, partition_by=None):
     """
     Salva DataFrame nel formato specificato nella cartella appropriata
     
     Args:
         df: DataFrame da salvare
         filename: Nome del file (senza estensione e senza percorso)
-        format: Formato ('csv', 'json', 'excel')
+        format: Formato ('csv', 'json', 'jsonl', 'excel', 'parquet', 'feather')
+        compression: Codec per parquet/feather (default: zstd / lz4)
+        partition_by: Partizionamento Hive per parquet/feather, es. ['date', 'storeID'];
+            in questo caso il risultato è una cartella
     
     Returns:
         Percorso completo del file salvato, o None se errore
@@ -64,7 +394,7 @@ def save_data(df, filename, format='csv'):
     
     # Rimuovi estensione se presente e path se presente
     filename = os.path.basename(filename)
-    if filename.endswith(('.csv', '.json', '.xlsx')):
+    if filename.endswith(('.csv', '.json', '.jsonl', '.xlsx', '.parquet', '.feather')):
         filename = os.path.splitext(filename)[0]
     
     if format.lower() == 'csv':
@@ -75,9 +405,22 @@ def save_data(df, filename, format='csv'):
         full_path = os.path.join(JSON_DIR, f"{filename}.json")
         if save_json(df, full_path):
             return full_path
+    elif format.lower() == 'jsonl':
+        full_path = os.path.join(JSON_DIR, f"{filename}.jsonl")
+        if save_jsonl(df, full_path):
+            return full_path
     elif format.lower() in ['excel', 'xlsx']:
         full_path = os.path.join(XLSX_DIR, f"{filename}.xlsx")
         if save_excel(df, full_path):
             return full_path
+    elif format.lower() in ['parquet', 'feather']:
+        fmt = format.lower()
+        base_dir = PARQUET_DIR if fmt == 'parquet' else FEATHER_DIR
+        if partition_by:
+            full_path = os.path.join(base_dir, filename)
+        else:
+            full_path = os.path.join(base_dir, f"{filename}.{fmt}")
+        if save_columnar(df, full_path, fmt, compression, partition_by):
+            return full_path
     
     return None
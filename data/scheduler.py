@@ -0,0 +1,232 @@
+"""
+Scheduler dei controlli prezzi della wishlist.
+
+Invece di ricontrollare a ogni esecuzione tutti i giochi con un prezzo
+target, ogni gioco ha un intervallo di aggiornamento calcolato dai campi
+della wishlist:
+    - più l'ultimo prezzo visto è vicino al target, più spesso si controlla
+      (sotto il target si resta all'intervallo minimo);
+    - i giochi con prezzo storicamente volatile (data/history.py) si
+      controllano più spesso;
+    - i giochi mai controllati sono subito da aggiornare.
+
+Le scadenze stanno in un heap: ogni esecuzione prende solo i giochi scaduti,
+i più in ritardo per primi, entro un budget di richieste API.
+"""
+import heapq
+import itertools
+import time
+from datetime import datetime
+
+from . import history
+from .fetcher import GAMES_BULK_SIZE
+from .wishlist import load_wishlist, check_wishlist_report
+
+# Intervalli di aggiornamento (secondi)
+MIN_INTERVAL = 15 * 60
+MAX_INTERVAL = 24 * 3600
+
+# Rapporto prezzo/target oltre il quale si usa l'intervallo massimo (2.0 = prezzo doppio del target)
+FAR_RATIO = 2.0
+
+# Quanto la volatilità accorcia l'intervallo: intervallo / (1 + peso * volatilità)
+VOLATILITY_WEIGHT = 4.0
+
+# Richieste API per esecuzione (ogni richiesta copre fino a GAMES_BULK_SIZE giochi)
+REQUEST_BUDGET = 4
+
+
+def _timestamp(value):
+    """lastChecked (ISO) in secondi, None se assente o non valido"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def refresh_interval(item, volatility=0.0):
+    """
+    Intervallo di aggiornamento di un item in secondi
+
+    Args:
+        item: Item della wishlist (targetPrice, lastPrice; lowestPriceSeen se
+            l'ultimo prezzo non è ancora stato registrato)
+        volatility: Volatilità del prezzo del gioco (vedi history.price_volatility)
+    """
+    # Il minimo storico non basta: un gioco sceso una volta vicino al target
+    # resterebbe per sempre all'intervallo minimo
+    price = item.get("lastPrice")
+    if price is None:
+        price = item.get("lowestPriceSeen")
+    try:
+        target = float(item.get("targetPrice"))
+        price = float(price)
+    except (TypeError, ValueError):
+        return MIN_INTERVAL
+    if target <= 0:
+        return MAX_INTERVAL
+
+    # 0 = prezzo al target (o sotto), 1 = prezzo a FAR_RATIO volte il target
+    distance = min(max(price / target - 1.0, 0.0) / (FAR_RATIO - 1.0), 1.0)
+    interval = MIN_INTERVAL + (MAX_INTERVAL - MIN_INTERVAL) * distance
+    interval /= 1.0 + VOLATILITY_WEIGHT * max(volatility, 0.0)
+    return max(MIN_INTERVAL, interval)
+
+
+def next_due(item, volatility=0.0):
+    """Istante (secondi) del prossimo controllo; 0 se l'item non è mai stato controllato"""
+    last_checked = _timestamp(item.get("lastChecked"))
+    if last_checked is None:
+        return 0.0
+    return last_checked + refresh_interval(item, volatility)
+
+
+class RefreshScheduler:
+    """
+    Heap delle scadenze dei controlli della wishlist
+
+    Args:
+        request_budget: Richieste API massime per esecuzione
+        batch_size: Giochi per richiesta (/games?ids=)
+    """
+
+    def __init__(self, request_budget=REQUEST_BUDGET, batch_size=GAMES_BULK_SIZE):
+        self.request_budget = request_budget
+        self.batch_size = batch_size
+        self._heap = []
+        self._items = {}
+        self._volatility = {}
+        self._retry_at = {}
+        self._seq = itertools.count()
+
+    def __len__(self):
+        return len(self._items)
+
+    def load(self, items, volatility=None):
+        """
+        Ricostruisce l'heap dagli item della wishlist con targetPrice
+
+        Args:
+            items: Item della wishlist
+            volatility: Dizionario {gameID (str): volatilità}; default: calcolata dallo storico
+        """
+        items = [item for item in items if item.get("targetPrice")]
+        if volatility is None:
+            volatility = history.price_volatility([item.get("gameID") for item in items])
+        self._volatility = dict(volatility)
+        self._items = {str(item.get("gameID")): item for item in items}
+        # I giochi rimossi dalla wishlist non restano in memoria tra un caricamento e l'altro
+        self._retry_at = {game_id: at for game_id, at in self._retry_at.items() if game_id in self._items}
+        self._heap = [(self._due(game_id), next(self._seq), game_id) for game_id in self._items]
+        heapq.heapify(self._heap)
+
+    def _due(self, game_id):
+        due = next_due(self._items[game_id], self._volatility.get(game_id, 0.0))
+        return max(due, self._retry_at.get(game_id, 0.0))
+
+    def schedule(self, item, retry_at=None):
+        """
+        Inserisce o aggiorna un item (la vecchia voce nell'heap viene ignorata)
+
+        Args:
+            item: Item della wishlist
+            retry_at: Non prima di questo istante (per i controlli falliti)
+        """
+        game_id = str(item.get("gameID"))
+        self._items[game_id] = item
+        if retry_at is None:
+            self._retry_at.pop(game_id, None)
+        else:
+            self._retry_at[game_id] = retry_at
+        heapq.heappush(self._heap, (self._due(game_id), next(self._seq), game_id))
+
+    def _valid(self, entry):
+        due, seq, game_id = entry
+        return game_id in self._items and due == self._due(game_id)
+
+    def peek_due(self):
+        """Prossima scadenza (secondi), o None se l'heap è vuoto"""
+        while self._heap and not self._valid(self._heap[0]):
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def count_due(self, now=None):
+        """Numero di item scaduti (senza toglierli dall'heap)"""
+        now = time.time() if now is None else now
+        return sum(1 for game_id in self._items if self._due(game_id) <= now)
+
+    def pop_due(self, now=None, limit=None):
+        """
+        Toglie dall'heap gli item scaduti, dal più in ritardo
+
+        Args:
+            now: Istante di riferimento (default: adesso)
+            limit: Numero massimo di item (default: budget di richieste * batch_size)
+        """
+        now = time.time() if now is None else now
+        if limit is None:
+            limit = self.request_budget * self.batch_size
+        due = []
+        while self._heap and len(due) < limit:
+            entry = self._heap[0]
+            if not self._valid(entry):
+                heapq.heappop(self._heap)
+                continue
+            if entry[0] > now:
+                break
+            heapq.heappop(self._heap)
+            due.append(self._items[entry[2]])
+        return due
+
+    def run_once(self, now=None, **check_options):
+        """
+        Controlla i prezzi dei soli item scaduti, entro il budget di richieste
+
+        Gli item controllati vengono riprogrammati con i dati aggiornati; quelli
+        falliti vengono riprovati dopo MIN_INTERVAL, così un gioco che fallisce
+        sempre non occupa il budget a ogni esecuzione.
+
+        Args:
+            now: Istante di riferimento (default: adesso)
+            check_options: Opzioni per check_wishlist_report (deadline, concurrency, ...)
+
+        Returns:
+            Report di check_wishlist_report con in più due (item scaduti prima
+            dell'esecuzione), processed, deferred (scaduti rimasti fuori dal
+            budget) e next_due (prossima scadenza, secondi)
+        """
+        now = time.time() if now is None else now
+        due_before = self.count_due(now)
+        batch = self.pop_due(now)
+        if batch:
+            report = check_wishlist_report(items=batch, batch_size=self.batch_size, **check_options)
+        else:
+            report = {"alerts": [], "checked": 0, "failed": [], "complete": True, "from_snapshot": 0,
+                      "elapsed": 0.0}
+
+        failed = {str(failure["gameID"]) for failure in report["failed"]}
+        for item in batch:
+            if str(item.get("gameID")) in failed:
+                self.schedule(item, retry_at=now + MIN_INTERVAL)
+            else:
+                self.schedule(item)
+
+        report["due"] = due_before
+        report["processed"] = len(batch)
+        report["deferred"] = max(due_before - len(batch), 0)
+        report["next_due"] = self.peek_due()
+        return report
+
+
+def run_due_checks(request_budget=REQUEST_BUDGET, now=None, **check_options):
+    """
+    Esegue un giro dello scheduler sulla wishlist salvata
+
+    Returns:
+        Report come RefreshScheduler.run_once
+    """
+    scheduler = RefreshScheduler(request_budget=request_budget)
+    scheduler.load(load_wishlist())
+    return scheduler.run_once(now=now, **check_options)
@@ -0,0 +1,92 @@
+"""
+Coalescing delle richieste duplicate in volo (single-flight).
+
+Se più chiamanti chiedono la stessa chiave nello stesso momento, solo il
+primo esegue davvero la funzione; gli altri aspettano e ricevono lo stesso
+risultato (o la stessa eccezione). Funziona sia con i thread sia con asyncio.
+"""
+import asyncio
+import threading
+import weakref
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Gruppo di chiamate deduplicate per chiave"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._async_calls = weakref.WeakKeyDictionary()
+        self._stats = {"calls": 0, "executed": 0, "deduplicated": 0}
+
+    def do(self, key, fn, *args, **kwargs):
+        """Esegue fn(*args, **kwargs) una sola volta per le chiamate concorrenti con la stessa chiave"""
+        with self._lock:
+            self._stats["calls"] += 1
+            call = self._calls.get(key)
+            if call is not None:
+                self._stats["deduplicated"] += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self._stats["executed"] += 1
+                leader = True
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result
+
+    async def do_async(self, key, coro_fn, *args, **kwargs):
+        """Come do(), ma per coroutine: i chiamanti concorrenti attendono lo stesso task"""
+        loop = asyncio.get_running_loop()
+        calls = self._async_calls.get(loop)
+        if calls is None:
+            calls = {}
+            self._async_calls[loop] = calls
+
+        with self._lock:
+            self._stats["calls"] += 1
+            task = calls.get(key)
+            if task is not None:
+                self._stats["deduplicated"] += 1
+            else:
+                self._stats["executed"] += 1
+
+        if task is None:
+            task = loop.create_task(coro_fn(*args, **kwargs))
+            calls[key] = task
+            task.add_done_callback(lambda done: calls.pop(key, None))
+
+        # shield: se un chiamante viene cancellato gli altri ricevono comunque il risultato
+        return await asyncio.shield(task)
+
+    def get_stats(self):
+        """Restituisce i contatori: calls, executed, deduplicated"""
+        with self._lock:
+            return dict(self._stats)
+
+    def reset_stats(self):
+        with self._lock:
+            for name in self._stats:
+                self._stats[name] = 0
@@ -0,0 +1,111 @@
+"""
+Destinazioni degli alert prezzi (sink) per la modalità daemon.
+
+Ogni sink ha un nome (usato dall'outbox per tracciare le consegne) e un
+metodo send(alert) che solleva un'eccezione se l'invio fallisce. I sink si
+creano da una specifica testuale:
+
+    stdout                          stampa gli alert sulla console
+    webhook=https://host/percorso   POST JSON dell'alert
+    smtp=localhost:1025             email via SMTP (es. tools/smtp_server.py)
+
+Un nuovo tipo di sink si aggiunge registrandone la classe in SINK_TYPES.
+"""
+import smtplib
+from email.message import EmailMessage
+
+from . import client
+
+# Timeout (secondi) per webhook e SMTP
+SINK_TIMEOUT = 10.0
+
+SMTP_SENDER = "price-tracker@localhost"
+SMTP_RECIPIENT = "alerts@localhost"
+
+
+def format_alert(alert):
+    """Riga di testo leggibile per un alert"""
+    return (f"{alert.get('title')}: ${float(alert.get('currentPrice', 0)):.2f} "
+            f"(target ${float(alert.get('targetPrice', 0)):.2f}) - "
+            f"https://www.cheapshark.com/redirect?dealID={alert.get('dealID', '')}")
+
+
+class StdoutSink:
+    """Stampa gli alert sulla console"""
+
+    def __init__(self, name="stdout"):
+        self.name = name
+
+    def send(self, alert):
+        print(f"🔔 {format_alert(alert)}", flush=True)
+
+
+class WebhookSink:
+    """
+    Invia ogni alert come JSON con una POST
+
+    Args:
+        url: Indirizzo del webhook
+    """
+
+    def __init__(self, url, timeout=SINK_TIMEOUT):
+        self.name = f"webhook={url}"
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, alert):
+        # Usa la sessione condivisa (connessioni keep-alive riutilizzate tra i cicli)
+        response = client.get_session().post(self.url, json=alert, timeout=self.timeout)
+        response.raise_for_status()
+
+
+class SmtpSink:
+    """
+    Invia ogni alert come email
+
+    Args:
+        address: host:porta del server SMTP (default porta 25)
+    """
+
+    def __init__(self, address, sender=SMTP_SENDER, recipient=SMTP_RECIPIENT, timeout=SINK_TIMEOUT):
+        self.name = f"smtp={address}"
+        host, _, port = address.partition(":")
+        self.host = host or "localhost"
+        self.port = int(port) if port else 25
+        self.sender = sender
+        self.recipient = recipient
+        self.timeout = timeout
+
+    def send(self, alert):
+        message = EmailMessage()
+        message["From"] = self.sender
+        message["To"] = self.recipient
+        message["Subject"] = f"Alert prezzo: {alert.get('title')}"
+        message.set_content(format_alert(alert))
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            smtp.send_message(message)
+
+
+SINK_TYPES = {
+    "stdout": StdoutSink,
+    "webhook": WebhookSink,
+    "smtp": SmtpSink,
+}
+
+
+def make_sink(spec):
+    """
+    Crea un sink da una specifica "tipo" o "tipo=argomento"
+
+    Raises:
+        ValueError: Se il tipo non esiste o manca l'argomento richiesto
+    """
+    kind, _, argument = spec.partition("=")
+    kind = kind.strip().lower()
+    if kind not in SINK_TYPES:
+        raise ValueError(f"Sink sconosciuto: {kind} (disponibili: {', '.join(SINK_TYPES)})")
+    if kind == "stdout":
+        return StdoutSink()
+    if not argument:
+        raise ValueError(f"Il sink {kind} richiede un argomento ({kind}=...)")
+    return SINK_TYPES[kind](argument.strip())
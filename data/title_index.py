@@ -0,0 +1,435 @@
+"""
+Ricerca offline dei giochi per titolo, con tolleranza agli errori di battitura.
+
+I titoli visti nelle offerte scaricate e nei risultati di ricerca vengono
+normalizzati (minuscole, senza accenti e punteggiatura, numeri romani in
+cifre: "Final Fantasy VII" -> "final fantasy 7") e scomposti in trigrammi
+(sequenze di 3 caratteri di ogni parola). Un indice invertito associa a ogni
+trigramma i giochi che lo contengono.
+
+Una ricerca conta i trigrammi in comune tra la query e ogni gioco candidato
+(similarità di Jaccard), premia i titoli che contengono la query per intero
+e restituisce i migliori risultati, nello stesso formato di /games?title=.
+
+L'indice si aggiorna in modo incrementale a ogni nuovo snapshot e viene
+salvato su disco in un file .npz (liste di ID compatte), caricato all'avvio
+senza ricalcolare i trigrammi.
+"""
+import math
+import os
+import re
+import threading
+import unicodedata
+
+import numpy as np
+
+INDEX_FILE = os.path.join("cache", "title_index.npz")
+
+# Similarità minima (0-1) perché un gioco compaia tra i risultati
+MIN_SCORE = 0.3
+
+# Bonus al punteggio per i titoli che contengono la query / iniziano con la query
+CONTAINS_BONUS = 0.5
+PREFIX_BONUS = 0.25
+
+SEARCH_LIMIT = 20
+
+# Versione del formato del file (un file di versione diversa viene ignorato)
+FORMAT_VERSION = 1
+
+
+def _roman_numerals(limit=20):
+    values = [(10, "x"), (9, "ix"), (5, "v"), (4, "iv"), (1, "i")]
+    numerals = {}
+    for number in range(2, limit + 1):
+        rest, text = number, ""
+        for value, symbol in values:
+            while rest >= value:
+                text += symbol
+                rest -= value
+        numerals[text] = str(number)
+    return numerals
+
+
+# "i" non viene convertito: è troppo spesso una parola ("I Am Bread")
+ROMAN_NUMERALS = _roman_numerals()
+
+_APOSTROPHES_RE = re.compile(r"['’`]")
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_title(title):
+    """
+    Forma normalizzata di un titolo per confronto e indicizzazione
+
+    Minuscole, accenti rimossi, "&" -> "and", apostrofi eliminati, altra
+    punteggiatura -> spazio, numeri romani (da II a XX, non come prima parola)
+    in cifre.
+    """
+    if not title:
+        return ""
+    text = str(title)
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(char for char in text if not unicodedata.combining(char))
+    text = text.lower()
+    text = _APOSTROPHES_RE.sub("", text.replace("&", " and "))
+    words = _NON_ALNUM_RE.sub(" ", text).split()
+    # La prima parola resta com'è: "X-Com", "V Rising"
+    return " ".join(
+        [words[0]] + [ROMAN_NUMERALS.get(word, word) for word in words[1:]] if words else []
+    )
+
+
+def trigrams(normalized):
+    """Insieme dei trigrammi di un titolo normalizzato (ogni parola con due spazi prima e uno dopo)"""
+    grams = set()
+    for word in normalized.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TitleIndex:
+    """
+    Indice invertito di trigrammi sui titoli dei giochi
+
+    Ogni gioco ha un ID interno progressivo. Le liste di ID per trigramma
+    caricate dal disco sono array numpy; i giochi aggiunti dopo finiscono in
+    liste separate, unite agli array al prossimo salvataggio. Se il titolo di
+    un gioco cambia, la vecchia voce viene marcata come eliminata.
+    """
+
+    def __init__(self):
+        self.game_ids = []
+        self.titles = []
+        self.normalized = []
+        self.cheapest = []
+        self.steam_app_ids = []
+        self._by_game = {}
+        self._sizes = np.zeros(0, dtype=np.int32)
+        self._alive = np.zeros(0, dtype=bool)
+        self._postings = {}
+        self._delta = {}
+        self._dead = 0
+        # True se ci sono modifiche (anche solo di prezzo) non ancora salvate
+        self.dirty = False
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._by_game)
+
+    def _grow(self, size):
+        if size <= len(self._sizes):
+            return
+        capacity = max(size, 2 * len(self._sizes), 1024)
+        sizes = np.zeros(capacity, dtype=np.int32)
+        alive = np.zeros(capacity, dtype=bool)
+        sizes[:len(self._sizes)] = self._sizes
+        alive[:len(self._alive)] = self._alive
+        self._sizes, self._alive = sizes, alive
+
+    def add(self, game_id, title, cheapest=None, steam_app_id=""):
+        """
+        Aggiunge o aggiorna un gioco
+
+        Un prezzo o uno steamAppID diverso per un gioco già presente non cambia
+        i trigrammi, ma segna comunque l'indice come da salvare (dirty).
+
+        Returns:
+            True se i trigrammi sono cambiati (gioco nuovo o titolo diverso)
+        """
+        with self._lock:
+            return self._add(game_id, title, cheapest, steam_app_id)
+
+    def _add(self, game_id, title, cheapest, steam_app_id):
+        if game_id is None or not title:
+            return False
+        game_id = int(game_id)
+        normalized = normalize_title(title)
+        doc = self._by_game.get(game_id)
+        if doc is not None:
+            if cheapest is not None and self.cheapest[doc] != float(cheapest):
+                self.cheapest[doc] = float(cheapest)
+                self.dirty = True
+            if steam_app_id and self.steam_app_ids[doc] != str(steam_app_id):
+                self.steam_app_ids[doc] = str(steam_app_id)
+                self.dirty = True
+            if self.normalized[doc] == normalized:
+                if self.titles[doc] != str(title):
+                    self.titles[doc] = str(title)
+                    self.dirty = True
+                return False
+            # Titolo cambiato: la vecchia voce resta nelle liste ma viene ignorata
+            self._alive[doc] = False
+            self._dead += 1
+            cheapest = self.cheapest[doc] if cheapest is None else cheapest
+            steam_app_id = steam_app_id or self.steam_app_ids[doc]
+
+        doc = len(self.game_ids)
+        grams = trigrams(normalized)
+        self.game_ids.append(game_id)
+        self.titles.append(str(title))
+        self.normalized.append(normalized)
+        self.cheapest.append(float(cheapest) if cheapest is not None else float("nan"))
+        self.steam_app_ids.append(str(steam_app_id or ""))
+        self._grow(doc + 1)
+        self._sizes[doc] = len(grams)
+        self._alive[doc] = True
+        self._by_game[game_id] = doc
+        for gram in grams:
+            self._delta.setdefault(gram, []).append(doc)
+        self.dirty = True
+        return True
+
+    def update_from_frame(self, df):
+        """
+        Aggiorna l'indice da un DataFrame di giochi o offerte
+
+        Accetta la tabella giochi di normalize_deals (indicizzata per gameID),
+        il risultato di deals_to_dataframe o search_results_to_dataframe. Il
+        prezzo più basso viene preso da cheapest o, per le offerte, dal
+        minimo di salePrice per gioco.
+
+        Returns:
+            Numero di giochi nuovi o con titolo cambiato
+        """
+        if df is None or df.empty or "title" not in df.columns:
+            return 0
+        if "gameID" not in df.columns:
+            df = df.reset_index()
+        if "gameID" not in df.columns:
+            return 0
+
+        columns = ["gameID", "title"] + [c for c in ("steamAppID", "cheapest", "salePrice") if c in df.columns]
+        rows = df[columns].dropna(subset=["gameID"])
+        if "salePrice" in rows.columns and "cheapest" not in rows.columns:
+            # Una riga per gioco, con l'offerta più economica
+            rows = rows.sort_values("salePrice", kind="stable").drop_duplicates("gameID")
+            rows = rows.rename(columns={"salePrice": "cheapest"})
+        else:
+            rows = rows.drop_duplicates("gameID", keep="last")
+
+        count = len(rows)
+        cheapest = rows["cheapest"].to_numpy(dtype="float64", na_value=np.nan) if "cheapest" in rows else None
+        cheapest = np.round(cheapest, 2).tolist() if cheapest is not None else [None] * count
+        steam = rows["steamAppID"].tolist() if "steamAppID" in rows else [""] * count
+        changed = 0
+        # Un solo lock per tutto il DataFrame: le ricerche aspettano la fine dell'aggiornamento
+        with self._lock:
+            for game_id, title, price, steam_app_id in zip(rows["gameID"].tolist(), rows["title"].tolist(),
+                                                           cheapest, steam):
+                changed += self._add(game_id, title, None if price != price else price,
+                                     steam_app_id if isinstance(steam_app_id, str) else "")
+        return changed
+
+    def search(self, query, limit=SEARCH_LIMIT, min_score=MIN_SCORE):
+        """
+        Cerca i giochi con titolo simile alla query
+
+        Returns:
+            Lista di dizionari nel formato di /games?title= (gameID, external,
+            cheapest, steamAppID) con in più score, dal più rilevante
+        """
+        normalized = normalize_title(query)
+        grams = trigrams(normalized)
+        if not grams:
+            return []
+
+        with self._lock:
+            arrays = []
+            for gram in grams:
+                base = self._postings.get(gram)
+                if base is not None:
+                    arrays.append(base)
+                delta = self._delta.get(gram)
+                if delta:
+                    arrays.append(np.array(delta, dtype=np.int32))
+            if not arrays:
+                return []
+            # Trigrammi in comune per ogni gioco: un contatore per ID interno
+            counts = np.bincount(np.concatenate(arrays), minlength=len(self.game_ids))
+            # Jaccard >= min_score richiede almeno min_score * len(grams) trigrammi
+            # in comune: i giochi con meno non vengono nemmeno valutati
+            needed = max(1, math.ceil(min_score * len(grams)))
+            candidates = np.flatnonzero((counts >= needed) & self._alive[:len(counts)])
+            if not len(candidates):
+                return []
+            shared = counts[candidates]
+            # Jaccard: trigrammi in comune / trigrammi totali dei due titoli
+            scores = shared / (len(grams) + self._sizes[candidates] - shared)
+
+            # I bonus per la sottostringa si calcolano solo sui migliori candidati
+            keep = min(len(candidates), max(limit * 5, 50))
+            top = np.argpartition(-scores, keep - 1)[:keep] if keep < len(candidates) else np.arange(len(candidates))
+            results = []
+            for position in top:
+                doc = int(candidates[position])
+                score = float(scores[position])
+                title = self.normalized[doc]
+                if normalized in title:
+                    score += PREFIX_BONUS if title.startswith(normalized) else 0.0
+                    score += CONTAINS_BONUS
+                if score >= min_score:
+                    results.append((score, -len(title), doc))
+
+            results.sort(reverse=True)
+            return [self._result(doc, score) for score, _, doc in results[:limit]]
+
+    def _result(self, doc, score):
+        cheapest = self.cheapest[doc]
+        return {
+            "gameID": str(self.game_ids[doc]),
+            "external": self.titles[doc],
+            "cheapest": f"{cheapest:.2f}" if cheapest == cheapest else None,
+            "steamAppID": self.steam_app_ids[doc] or None,
+            "score": round(score, 3),
+        }
+
+    def _merged_postings(self):
+        """Liste di ID per trigramma (array + aggiunte), senza le voci eliminate"""
+        merged = {}
+        for gram in set(self._postings) | set(self._delta):
+            parts = []
+            if gram in self._postings:
+                parts.append(self._postings[gram])
+            if gram in self._delta:
+                parts.append(np.array(self._delta[gram], dtype=np.int32))
+            ids = np.concatenate(parts) if len(parts) > 1 else parts[0]
+            if self._dead:
+                ids = ids[self._alive[ids]]
+            if len(ids):
+                merged[gram] = ids
+        return merged
+
+    def compact(self):
+        """Unisce le aggiunte negli array ed elimina le voci dei titoli cambiati (rinumerando gli ID)"""
+        with self._lock:
+            postings = self._merged_postings()
+            if self._dead:
+                alive = np.flatnonzero(self._alive[:len(self.game_ids)])
+                remap = np.full(len(self.game_ids), -1, dtype=np.int32)
+                remap[alive] = np.arange(len(alive), dtype=np.int32)
+                postings = {gram: remap[ids] for gram, ids in postings.items()}
+                for name in ("game_ids", "titles", "normalized", "cheapest", "steam_app_ids"):
+                    values = getattr(self, name)
+                    setattr(self, name, [values[i] for i in alive])
+                self._sizes = self._sizes[alive].copy()
+                self._alive = np.ones(len(alive), dtype=bool)
+                self._by_game = {game_id: doc for doc, game_id in enumerate(self.game_ids)}
+                self._dead = 0
+            self._postings = postings
+            self._delta = {}
+
+    def save(self, path=None):
+        """Salva l'indice su disco (dopo compact)"""
+        from .saver import atomic_write
+
+        path = path or INDEX_FILE
+        self.compact()
+        with self._lock:
+            grams = sorted(self._postings)
+            lengths = np.array([len(self._postings[gram]) for gram in grams], dtype=np.int64)
+            offsets = np.zeros(len(grams) + 1, dtype=np.int64)
+            np.cumsum(lengths, out=offsets[1:])
+            ids = np.concatenate([self._postings[gram] for gram in grams]) if grams else np.zeros(0, np.int32)
+            arrays = {
+                "version": np.array([FORMAT_VERSION]),
+                "game_ids": np.array(self.game_ids, dtype=np.int64),
+                "cheapest": np.array(self.cheapest, dtype=np.float64),
+                "sizes": self._sizes[:len(self.game_ids)],
+                "titles": _pack_strings(self.titles),
+                "normalized": _pack_strings(self.normalized),
+                "steam_app_ids": _pack_strings(self.steam_app_ids),
+                "grams": _pack_strings(grams),
+                "offsets": offsets,
+                "ids": ids.astype(np.int32),
+            }
+            self.dirty = False
+        with atomic_write(path, mode="path") as tmp_path:
+            with open(tmp_path, "wb") as f:
+                np.savez(f, **arrays)
+        return path
+
+    @classmethod
+    def load(cls, path=None):
+        """
+        Carica un indice salvato
+
+        Returns:
+            TitleIndex, vuoto se il file non esiste o non è leggibile
+        """
+        index = cls()
+        path = path or INDEX_FILE
+        if not os.path.exists(path):
+            return index
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if int(data["version"][0]) != FORMAT_VERSION:
+                    return index
+                game_ids = data["game_ids"]
+                index.game_ids = game_ids.tolist()
+                index.cheapest = data["cheapest"].tolist()
+                index.titles = _unpack_strings(data["titles"], len(game_ids))
+                index.normalized = _unpack_strings(data["normalized"], len(game_ids))
+                index.steam_app_ids = _unpack_strings(data["steam_app_ids"], len(game_ids))
+                index._sizes = data["sizes"].astype(np.int32)
+                index._alive = np.ones(len(game_ids), dtype=bool)
+                offsets = data["offsets"]
+                ids = data["ids"]
+                grams = _unpack_strings(data["grams"], len(offsets) - 1)
+        except (OSError, KeyError, ValueError):
+            return cls()
+        # Viste sull'array unico: nessuna copia per trigramma
+        index._postings = {gram: ids[offsets[i]:offsets[i + 1]] for i, gram in enumerate(grams)}
+        index._by_game = {game_id: doc for doc, game_id in enumerate(index.game_ids)}
+        return index
+
+
+def _pack_strings(values):
+    """Lista di stringhe -> array di byte UTF-8 separati da \\n"""
+    text = "\n".join(str(value).replace("\n", " ") for value in values)
+    return np.frombuffer(text.encode("utf-8"), dtype=np.uint8)
+
+
+def _unpack_strings(array, count):
+    if count == 0:
+        return []
+    values = array.tobytes().decode("utf-8").split("\n")
+    if len(values) != count:
+        raise ValueError("Indice dei titoli danneggiato")
+    return values
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """Indice condiviso, caricato dal disco al primo utilizzo"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = TitleIndex.load()
+        return _index
+
+
+def update_index(df, save=True):
+    """
+    Aggiunge all'indice condiviso i giochi di un DataFrame (vedi TitleIndex.update_from_frame)
+
+    L'indice viene salvato se è cambiato qualcosa, anche solo un prezzo.
+
+    Returns:
+        Numero di giochi nuovi o con titolo cambiato
+    """
+    index = get_index()
+    changed = index.update_from_frame(df)
+    if save and index.dirty:
+        index.save()
+    return changed
+
+
+def search_titles(query, limit=SEARCH_LIMIT):
+    """Ricerca offline nell'indice condiviso (stesso formato di fetcher.search_games)"""
+    return get_index().search(query, limit)
@@ -1,99 +1,114 @@
-import json
-import os
+import asyncio
+import time
 from datetime import datetime
-from .fetcher import get_game_details
+import pandas as pd
+from .fetcher import GAMES_BULK_SIZE
+from . import async_fetcher
+from . import wishlist_store
 
-WISHLIST_FILE = "wishlist.json"
+# File JSON usato dalle versioni precedenti (importato una sola volta nel database)
+WISHLIST_FILE = wishlist_store.LEGACY_FILE
+
+# Controllo prezzi: richieste in parallelo, tempo massimo complessivo e per richiesta
+# (un lotto di GAMES_BULK_SIZE giochi), in secondi
+CHECK_CONCURRENCY = 4
+CHECK_DEADLINE = 30.0
+CHECK_BATCH_TIMEOUT = 10.0
 
 def load_wishlist():
-    """Carica la wishlist dal file JSON"""
-    if not os.path.exists(WISHLIST_FILE):
-        return []
-    
-    try:
-        with open(WISHLIST_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except:
-        return []
+    """Carica la wishlist dal database"""
+    return wishlist_store.all_items()
 
 def save_wishlist(wishlist):
-    """Salva la wishlist su file JSON"""
-    with open(WISHLIST_FILE, 'w', encoding='utf-8') as f:
-        json.dump(wishlist, f, ensure_ascii=False, indent=2)
+    """Sostituisce l'intera wishlist (per le modifiche singole usare add/remove/update)"""
+    wishlist_store.replace_all(wishlist)
 
 def add_to_wishlist(game_id, game_title, target_price=None):
     """Aggiunge un gioco alla wishlist"""
-    wishlist = load_wishlist()
-    
-    # Controlla se il gioco è già presente
-    for item in wishlist:
-        if item.get("gameID") == game_id:
-            return False, "Gioco già presente nella wishlist"
-    
     new_item = {
         "gameID": game_id,
         "title": game_title,
         "targetPrice": target_price,
         "addedDate": datetime.now().isoformat(),
         "lastChecked": None,
-        "lowestPriceSeen": None
+        "lowestPriceSeen": None,
+        "lastPrice": None
     }
     
-    wishlist.append(new_item)
-    save_wishlist(wishlist)
+    # Il controllo dei duplicati è la chiave primaria del database
+    if not wishlist_store.insert(new_item):
+        return False, "Gioco già presente nella wishlist"
     return True, "Gioco aggiunto alla wishlist"
 
 def remove_from_wishlist(game_id):
     """Rimuove un gioco dalla wishlist"""
-    wishlist = load_wishlist()
-    wishlist = [item for item in wishlist if item.get("gameID") != game_id]
-    save_wishlist(wishlist)
+    wishlist_store.delete(game_id)
     return True
 
+def set_target_price(game_id, target_price):
+    """Imposta il prezzo target di un gioco già nella wishlist"""
+    return wishlist_store.update_fields(game_id, targetPrice=target_price)
+
 def get_wishlist():
     """Restituisce la wishlist completa"""
     return load_wishlist()
 
-def check_wishlist_prices():
-    """Verifica i prezzi dei giochi nella wishlist e restituisce gli alert"""
-    wishlist = load_wishlist()
-    if not wishlist:
-        return []
+def find_best_deal(game_data):
+    """
+    Trova l'offerta più economica nei dettagli di un gioco
+
+    Returns:
+        Tupla (prezzo, storeID, dealID) oppure None se non ci sono offerte
+    """
+    if not game_data or "deals" not in game_data:
+        return None
+    
+    deals = game_data.get("deals", [])
+    if not deals:
+        return None
+    
+    current_price = float(deals[0].get("price", 999999))
+    best_store_id = deals[0].get("storeID")
+    best_deal_id = deals[0].get("dealID", "")
+    for deal in deals:
+        price = float(deal.get("price", 999999))
+        if price < current_price:
+            current_price = price
+            best_store_id = deal.get("storeID")
+            best_deal_id = deal.get("dealID", "")
     
+    return current_price, best_store_id, best_deal_id
+
+def evaluate_wishlist_prices(items, games_data, failures=None):
+    """
+    Aggiorna gli item con i prezzi correnti e restituisce gli alert
+
+    Args:
+        items: Item della wishlist con targetPrice
+        games_data: Dizionario {gameID (str): dettagli} come da get_games_bulk
+        failures: Lista opzionale in cui aggiungere gli item non valutabili
+            (stesso formato del report di check_wishlist_report)
+    """
     alerts = []
     
-    for item in wishlist:
+    for item in items:
         game_id = item.get("gameID")
         game_title = item.get("title")
         target_price = item.get("targetPrice")
         
-        if not target_price:
-            continue
-        
         try:
-            game_data = get_game_details(game_id)
-            if not game_data or "deals" not in game_data:
-                continue
-            
-            # Trova il prezzo più basso tra tutte le offerte
-            deals = game_data.get("deals", [])
-            if not deals:
+            best = find_best_deal(games_data.get(str(game_id)))
+            if best is None:
+                if failures is not None:
+                    failures.append(_failure(item, "no_deals"))
                 continue
-            
-            current_price = float(deals[0].get("price", 999999))
-            best_store_id = deals[0].get("storeID")
-            best_deal_id = deals[0].get("dealID", "")
-            for deal in deals:
-                price = float(deal.get("price", 999999))
-                if price < current_price:
-                    current_price = price
-                    best_store_id = deal.get("storeID")
-                    best_deal_id = deal.get("dealID", "")
+            current_price, best_store_id, best_deal_id = best
             
             # Aggiorna il prezzo più basso visto
             lowest_seen = item.get("lowestPriceSeen")
             if not lowest_seen or current_price < float(lowest_seen):
                 item["lowestPriceSeen"] = current_price
+            item["lastPrice"] = current_price
             
             item["lastChecked"] = datetime.now().isoformat()
             
@@ -109,9 +124,226 @@ def check_wishlist_prices():
                 })
         
         except Exception as e:
+            if failures is not None:
+                failures.append(_failure(item, "invalid", e))
             continue
     
-    # Salva le modifiche alla wishlist
-    save_wishlist(wishlist)
     return alerts
 
+def best_deals_from_snapshot(snapshot_df, game_ids):
+    """
+    Offerta più economica di ogni gioco in uno snapshot delle offerte
+
+    Un'unica join vettoriale tra gli ID richiesti e il DataFrame, senza
+    chiamate API: per ogni gioco si tiene la riga con salePrice minimo.
+
+    Args:
+        snapshot_df: DataFrame delle offerte (deals_to_dataframe o tabella
+            offerte di normalize_deals) con gameID, salePrice, storeID e dealID
+        game_ids: ID dei giochi da cercare
+
+    Returns:
+        Dizionario {gameID (str): dettagli} nello stesso formato di
+        get_games_bulk (solo la migliore offerta), per i giochi presenti
+    """
+    if snapshot_df is None or snapshot_df.empty or not game_ids:
+        return {}
+    wanted = pd.to_numeric(pd.Series(list(game_ids), dtype=object), errors="coerce").dropna().unique()
+    mask = snapshot_df["gameID"].isin(wanted) & snapshot_df["salePrice"].notna()
+    if not mask.any():
+        return {}
+    
+    columns = [column for column in ("gameID", "salePrice", "storeID", "dealID") if column in snapshot_df.columns]
+    best = snapshot_df.loc[mask, columns].sort_values("salePrice", kind="stable").drop_duplicates("gameID")
+    deal_ids = best["dealID"].to_numpy() if "dealID" in best.columns else [""] * len(best)
+    
+    games_data = {}
+    for game_id, price, store_id, deal_id in zip(best["gameID"].to_numpy(), best["salePrice"].to_numpy(),
+                                                 best["storeID"].to_numpy(), deal_ids):
+        # I prezzi sono float32: si arrotondano ai centesimi come nelle risposte API
+        games_data[str(int(game_id))] = {
+            "deals": [{"price": round(float(price), 2), "storeID": str(store_id), "dealID": deal_id or ""}]
+        }
+    return games_data
+
+def alerts_from_diff(diff, wishlist=None):
+    """
+    Alert della wishlist a partire dal confronto tra due snapshot (data/diff.py)
+
+    Considera solo le offerte nuove o con prezzo sceso, senza chiamate API.
+
+    Args:
+        diff: DataFrame di diff_snapshots
+        wishlist: Item della wishlist (default: quella salvata)
+
+    Returns:
+        Lista di alert nello stesso formato di check_wishlist_prices
+    """
+    if diff is None or diff.empty:
+        return []
+    if wishlist is None:
+        wishlist = load_wishlist()
+    targets = {str(item.get("gameID")): item for item in wishlist if item.get("targetPrice")}
+    if not targets:
+        return []
+    
+    candidates = diff[diff["change"].isin(["new", "price_dropped"])]
+    candidates = candidates[candidates["gameID"].astype(str).isin(targets.keys())]
+    
+    alerts = []
+    # Per ogni gioco basta l'offerta più economica
+    for row in candidates.sort_values("newPrice").drop_duplicates("gameID").itertuples(index=False):
+        item = targets[str(row.gameID)]
+        if row.newPrice <= float(item["targetPrice"]):
+            alerts.append({
+                "gameID": item.get("gameID"),
+                "title": item.get("title"),
+                "targetPrice": item.get("targetPrice"),
+                "currentPrice": float(row.newPrice),
+                "storeID": str(row.storeID),
+                "dealID": getattr(row, "dealID", "")
+            })
+    return alerts
+
+def _failure(item, reason, error=None):
+    return {
+        "gameID": item.get("gameID"),
+        "title": item.get("title"),
+        "reason": reason,
+        "error": str(error) if error is not None else None
+    }
+
+async def _fetch_chunk(chunk, semaphore, batch_timeout):
+    # Senza cache: la risposta di /games resta valida un'ora, più dell'intervallo
+    # minimo tra due controlli dello scheduler (un calo di prezzo verrebbe perso)
+    async with semaphore:
+        request = async_fetcher.get_json("games", {"ids": ",".join(chunk)}, use_cache=False)
+        return await asyncio.wait_for(request, batch_timeout)
+
+async def check_wishlist_report_async(items=None, concurrency=CHECK_CONCURRENCY, deadline=CHECK_DEADLINE,
+                                      batch_timeout=CHECK_BATCH_TIMEOUT, batch_size=GAMES_BULK_SIZE,
+                                      snapshot_df=None):
+    """
+    Verifica i prezzi della wishlist in parallelo entro un tempo massimo
+
+    I giochi vengono richiesti a lotti di batch_size ID (/games?ids=); al più
+    `concurrency` lotti sono in volo insieme. Un lotto che supera batch_timeout
+    fallisce da solo (tutti i suoi giochi con reason "timeout"); allo scadere di `deadline` i lotti non ancora completati
+    vengono abbandonati. I risultati ottenuti fino a quel momento vengono
+    comunque valutati e salvati in un'unica transazione.
+    
+    Con snapshot_df (le offerte appena scaricate) i prezzi si ricavano prima
+    dallo snapshot (vedi best_deals_from_snapshot); solo i giochi assenti
+    vengono richiesti all'API.
+
+    Args:
+        items: Item da verificare (default: quelli della wishlist con targetPrice)
+        concurrency: Lotti richiesti in parallelo
+        deadline: Tempo massimo complessivo in secondi (None: nessun limite)
+        batch_timeout: Tempo massimo per ogni lotto in secondi (None: nessun
+            limite); con batch_size=1 diventa un timeout per singolo gioco
+        batch_size: ID per richiesta (1 per un timeout per singolo gioco)
+        snapshot_df: DataFrame delle offerte da usare al posto dell'API (opzionale)
+
+    Returns:
+        Dizionario con:
+            alerts: alert come da check_wishlist_prices
+            checked: numero di giochi con prezzo aggiornato
+            failed: lista di {gameID, title, reason, error}, con reason tra
+                "timeout", "error", "deadline", "not_found", "no_deals", "invalid",
+                "missing_id" (item senza gameID, non richiesto all'API)
+            complete: False se la scadenza ha interrotto il controllo
+            from_snapshot: numero di giochi risolti dallo snapshot
+            elapsed: durata in secondi
+    """
+    start = time.monotonic()
+    if items is None:
+        items = [item for item in load_wishlist() if item.get("targetPrice")]
+    report = {"alerts": [], "checked": 0, "failed": [], "complete": True, "from_snapshot": 0, "elapsed": 0.0}
+    if not items:
+        return report
+    
+    by_id = {}
+    for item in items:
+        by_id.setdefault(str(item.get("gameID")), []).append(item)
+    ids = sorted(game_id for game_id in by_id if game_id not in ("None", ""))
+    for game_id in ("None", ""):
+        for item in by_id.get(game_id, []):
+            report["failed"].append(_failure(item, "missing_id"))
+    
+    # Giochi presenti nello snapshot: nessuna richiesta
+    games_data = best_deals_from_snapshot(snapshot_df, ids)
+    report["from_snapshot"] = len(games_data)
+    fetch_ids = [game_id for game_id in ids if game_id not in games_data]
+    chunks = [fetch_ids[i:i + batch_size] for i in range(0, len(fetch_ids), batch_size)]
+    
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    tasks = {asyncio.ensure_future(_fetch_chunk(chunk, semaphore, batch_timeout)): chunk for chunk in chunks}
+    pending = set()
+    if tasks:
+        done, pending = await asyncio.wait(tasks, timeout=deadline)
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+        report["complete"] = False
+    
+    failed_ids = set()
+    for task, chunk in tasks.items():
+        if task in pending:
+            reason, error = "deadline", None
+        elif task.exception() is not None:
+            error = task.exception()
+            reason = "timeout" if isinstance(error, asyncio.TimeoutError) else "error"
+        else:
+            games_data.update(task.result() or {})
+            continue
+        for game_id in chunk:
+            failed_ids.add(game_id)
+            for item in by_id[game_id]:
+                report["failed"].append(_failure(item, reason, error))
+    
+    found = []
+    for game_id in ids:
+        if game_id in failed_ids:
+            continue
+        if game_id not in games_data:
+            for item in by_id[game_id]:
+                report["failed"].append(_failure(item, "not_found"))
+            continue
+        found.extend(by_id[game_id])
+    
+    invalid = []
+    report["alerts"] = evaluate_wishlist_prices(found, games_data, invalid)
+    report["failed"].extend(invalid)
+    checked = [item for item in found if item.get("lastChecked")]
+    report["checked"] = len(checked)
+    
+    # Salva prezzi minimi e data del controllo in un'unica transazione
+    wishlist_store.record_checks(checked)
+    report["elapsed"] = time.monotonic() - start
+    return report
+
+def check_wishlist_report(items=None, concurrency=CHECK_CONCURRENCY, deadline=CHECK_DEADLINE,
+                          batch_timeout=CHECK_BATCH_TIMEOUT, batch_size=GAMES_BULK_SIZE, snapshot_df=None):
+    """Versione sincrona di check_wishlist_report_async (restituisce lo stesso report)"""
+    # Le richieste abbandonate per la scadenza non devono ritardare il ritorno
+    return async_fetcher.run(
+        check_wishlist_report_async(items, concurrency, deadline, batch_timeout, batch_size, snapshot_df),
+        detach=True
+    )
+
+def check_wishlist_prices(snapshot_df=None):
+    """
+    Verifica i prezzi dei giochi nella wishlist e restituisce gli alert
+
+    Args:
+        snapshot_df: Offerte appena scaricate (es. deals_to_dataframe): i giochi
+            presenti non richiedono chiamate API
+    """
+    return check_wishlist_report(snapshot_df=snapshot_df)["alerts"]
+
+async def check_wishlist_prices_async(snapshot_df=None):
+    """Versione asincrona di check_wishlist_prices, da usare dentro un event loop"""
+    report = await check_wishlist_report_async(snapshot_df=snapshot_df)
+    return report["alerts"]
@@ -0,0 +1,262 @@
+"""
+Archivio della wishlist su SQLite.
+
+Ogni gioco è una riga con chiave gameID: aggiunte, modifiche e rimozioni
+toccano una sola riga in una transazione, invece di riscrivere l'intero
+file JSON. Il database usa WAL e un timeout di attesa sui lock, quindi più
+processi (es. l'app interattiva e lo scheduler) possono leggere e scrivere
+insieme.
+
+Alla prima apertura, se esiste il vecchio wishlist.json, il suo contenuto
+viene importato e il file rinominato in wishlist.json.migrated. I database
+creati con una versione precedente dello schema vengono aggiornati
+(PRAGMA user_version).
+"""
+import json
+import os
+import sqlite3
+import threading
+
+WISHLIST_DB = "wishlist.sqlite"
+LEGACY_FILE = "wishlist.json"
+
+# Versione dello schema (PRAGMA user_version)
+# 1: import di wishlist.json; 2: colonna last_price
+SCHEMA_VERSION = 2
+
+# Colonne del database -> chiavi degli item della wishlist
+COLUMNS = {
+    "game_id": "gameID",
+    "title": "title",
+    "target_price": "targetPrice",
+    "added_date": "addedDate",
+    "last_checked": "lastChecked",
+    "lowest_price_seen": "lowestPriceSeen",
+    "last_price": "lastPrice",
+}
+
+_PLACEHOLDERS = ", ".join("?" * len(COLUMNS))
+
+_conn = None
+_conn_path = None
+_lock = threading.RLock()
+
+
+def _get_conn():
+    global _conn, _conn_path
+    if _conn is not None and _conn_path != WISHLIST_DB:
+        # Il percorso è cambiato (es. nei benchmark): riapre il database
+        _conn.close()
+        _conn = None
+    if _conn is None:
+        directory = os.path.dirname(WISHLIST_DB)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(WISHLIST_DB, check_same_thread=False, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS wishlist (
+                game_id TEXT PRIMARY KEY,
+                title TEXT,
+                target_price REAL,
+                added_date TEXT,
+                last_checked TEXT,
+                lowest_price_seen REAL,
+                last_price REAL
+            )
+        """)
+        _conn = conn
+        _conn_path = WISHLIST_DB
+        _migrate(conn)
+    return _conn
+
+
+def _migrate(conn):
+    """
+    Porta il database alla versione SCHEMA_VERSION
+
+    wishlist.json viene importato una sola volta (versione 1); la colonna
+    last_price viene aggiunta ai database creati prima della versione 2.
+    """
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        return
+
+    imported = False
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Un altro processo potrebbe aver completato la migrazione nel frattempo
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < 1:
+            items = []
+            if os.path.exists(LEGACY_FILE):
+                try:
+                    with open(LEGACY_FILE, "r", encoding="utf-8") as f:
+                        items = json.load(f)
+                except (OSError, ValueError):
+                    items = []
+            conn.executemany(
+                f"INSERT OR IGNORE INTO wishlist VALUES ({_PLACEHOLDERS})",
+                [_to_row(item) for item in items if item.get("gameID") is not None],
+            )
+            imported = True
+        if version < 2:
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(wishlist)")}
+            if "last_price" not in columns:
+                conn.execute("ALTER TABLE wishlist ADD COLUMN last_price REAL")
+        if version < SCHEMA_VERSION:
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+    if imported and os.path.exists(LEGACY_FILE):
+        os.replace(LEGACY_FILE, LEGACY_FILE + ".migrated")
+
+
+def _to_row(item):
+    return (
+        str(item.get("gameID")),
+        item.get("title"),
+        item.get("targetPrice"),
+        item.get("addedDate"),
+        item.get("lastChecked"),
+        item.get("lowestPriceSeen"),
+        item.get("lastPrice"),
+    )
+
+
+def _to_item(row):
+    return dict(zip(COLUMNS.values(), row))
+
+
+def _write(sql, params=(), many=False):
+    """Esegue una scrittura in una transazione e restituisce le righe modificate"""
+    with _lock:
+        conn = _get_conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if many:
+                cursor = conn.executemany(sql, params)
+            else:
+                cursor = conn.execute(sql, params)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return cursor.rowcount
+
+
+def all_items():
+    """Tutti gli item nell'ordine di inserimento"""
+    with _lock:
+        rows = _get_conn().execute(f"SELECT {', '.join(COLUMNS)} FROM wishlist ORDER BY rowid").fetchall()
+    return [_to_item(row) for row in rows]
+
+
+def get_item(game_id):
+    """Item di un gioco, o None se non è nella wishlist"""
+    with _lock:
+        row = _get_conn().execute(
+            f"SELECT {', '.join(COLUMNS)} FROM wishlist WHERE game_id = ?", (str(game_id),)
+        ).fetchone()
+    return _to_item(row) if row else None
+
+
+def count():
+    with _lock:
+        return _get_conn().execute("SELECT COUNT(*) FROM wishlist").fetchone()[0]
+
+
+def insert(item):
+    """Aggiunge un item; restituisce False se il gioco è già presente"""
+    return _write(f"INSERT OR IGNORE INTO wishlist VALUES ({_PLACEHOLDERS})", _to_row(item)) > 0
+
+
+def upsert(item):
+    """Aggiunge un item o ne sostituisce i campi se il gioco è già presente"""
+    _write(f"""
+        INSERT INTO wishlist VALUES ({_PLACEHOLDERS})
+        ON CONFLICT (game_id) DO UPDATE SET
+            title = excluded.title,
+            target_price = excluded.target_price,
+            added_date = excluded.added_date,
+            last_checked = excluded.last_checked,
+            lowest_price_seen = excluded.lowest_price_seen,
+            last_price = excluded.last_price
+    """, _to_row(item))
+
+
+def update_fields(game_id, **fields):
+    """
+    Modifica alcuni campi di un item
+
+    Args:
+        game_id: ID del gioco
+        fields: Campi con i nomi degli item (es. targetPrice=9.99)
+
+    Returns:
+        True se il gioco era presente
+    """
+    columns = {key: column for column, key in COLUMNS.items()}
+    assignments = ", ".join(f"{columns[name]} = ?" for name in fields)
+    if not assignments:
+        return False
+    return _write(f"UPDATE wishlist SET {assignments} WHERE game_id = ?",
+                  list(fields.values()) + [str(game_id)]) > 0
+
+
+def delete(game_id):
+    """Rimuove un gioco; restituisce True se era presente"""
+    return _write("DELETE FROM wishlist WHERE game_id = ?", (str(game_id),)) > 0
+
+
+def record_checks(items):
+    """
+    Salva in un'unica transazione l'esito di un controllo prezzi
+
+    Il prezzo più basso visto resta il minimo tra quello salvato e quello
+    dell'item, così due controlli concorrenti non si sovrascrivono; l'ultimo
+    prezzo (lastPrice) è quello dell'ultimo controllo.
+    """
+    rows = [
+        (item.get("lastChecked"), item.get("lowestPriceSeen"), item.get("lowestPriceSeen"),
+         item.get("lastPrice"), str(item.get("gameID")))
+        for item in items
+    ]
+    if not rows:
+        return 0
+    return _write("""
+        UPDATE wishlist SET
+            last_checked = COALESCE(?, last_checked),
+            lowest_price_seen = MIN(COALESCE(lowest_price_seen, ?), COALESCE(?, lowest_price_seen)),
+            last_price = COALESCE(?, last_price)
+        WHERE game_id = ?
+    """, rows, many=True)
+
+
+def replace_all(items):
+    """Sostituisce l'intera wishlist con gli item dati (in una transazione)"""
+    with _lock:
+        conn = _get_conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM wishlist")
+            conn.executemany(f"INSERT OR REPLACE INTO wishlist VALUES ({_PLACEHOLDERS})",
+                             [_to_row(item) for item in items if item.get("gameID") is not None])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+
+def close():
+    """Chiude la connessione al database"""
+    global _conn
+    with _lock:
+        if _conn is not None:
+            _conn.close()
+            _conn = None
@@ -0,0 +1,199 @@
+"""
+Coda di attività in background per export e grafici.
+
+Le scritture dei file e il rendering dei grafici (a 300 dpi) vengono eseguiti
+da un pool di thread, così il menu interattivo torna subito disponibile dopo
+il download dei dati. Lo stato di ogni attività (in attesa, in corso,
+completata, fallita) e gli eventuali errori restano consultabili; all'uscita
+del programma si attende il completamento di tutte le attività in sospeso.
+
+I grafici usano l'interfaccia globale di matplotlib.pyplot, che non è
+thread-safe: i job dei grafici vengono quindi eseguiti uno alla volta.
+"""
+import atexit
+import itertools
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# Thread dedicati alle attività in background
+JOB_WORKERS = 2
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+_executor = None
+_jobs = []
+_ids = itertools.count(1)
+_lock = threading.Lock()
+_chart_lock = threading.Lock()
+
+
+class Job:
+    """Attività in background: stato, risultato ed errore"""
+
+    def __init__(self, name):
+        self.id = next(_ids)
+        self.name = name
+        self.status = PENDING
+        self.result = None
+        self.error = None
+        self.traceback = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.reported = False
+        self.future = None
+
+    @property
+    def elapsed(self):
+        """Durata dell'esecuzione in secondi (None se non ancora terminata)"""
+        if self.started is None or self.finished is None:
+            return None
+        return self.finished - self.started
+
+    def wait(self, timeout=None):
+        """Attende la fine dell'attività e ne restituisce il risultato (None se fallita)"""
+        if self.future is not None:
+            wait([self.future], timeout=timeout)
+        return self.result
+
+    def __repr__(self):
+        return f"Job({self.id}, {self.name!r}, {self.status})"
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+        return _executor
+
+
+def _run(job, fn, args, kwargs, serialize):
+    job.started = time.time()
+    job.status = RUNNING
+    try:
+        if serialize:
+            with _chart_lock:
+                job.result = fn(*args, **kwargs)
+        else:
+            job.result = fn(*args, **kwargs)
+        job.status = DONE
+    except Exception as e:
+        job.error = e
+        job.traceback = traceback.format_exc()
+        job.status = FAILED
+    finally:
+        job.finished = time.time()
+    return job.result
+
+
+def submit(name, fn, *args, **kwargs):
+    """
+    Esegue fn(*args, **kwargs) in background
+
+    Args:
+        name: Descrizione mostrata nello stato delle attività
+        fn: Funzione da eseguire (es. save_data)
+
+    Returns:
+        Job con stato, risultato ed errore
+    """
+    return _submit(name, fn, args, kwargs, serialize=False)
+
+
+def submit_chart(name, fn, *args, **kwargs):
+    """Come submit, ma per le funzioni di analytics/chart.py (eseguite una alla volta)"""
+    _use_headless_backend()
+    return _submit(name, fn, args, kwargs, serialize=True)
+
+
+def _submit(name, fn, args, kwargs, serialize):
+    job = Job(name)
+    with _lock:
+        _jobs.append(job)
+    job.future = _get_executor().submit(_run, job, fn, args, kwargs, serialize)
+    return job
+
+
+def _use_headless_backend():
+    # I backend con finestra (es. TkAgg) non possono essere usati fuori dal
+    # thread principale; i grafici vengono solo salvati su file
+    import matplotlib
+    import matplotlib.pyplot as plt
+
+    if matplotlib.get_backend().lower() != "agg":
+        plt.switch_backend("Agg")
+
+
+def get_jobs():
+    """Tutte le attività inviate, dalla più vecchia"""
+    with _lock:
+        return list(_jobs)
+
+
+def pending_jobs():
+    """Attività non ancora terminate"""
+    return [job for job in get_jobs() if job.status in (PENDING, RUNNING)]
+
+
+def collect_finished():
+    """
+    Attività terminate non ancora notificate
+
+    Ogni attività viene restituita una sola volta, così l'interfaccia può
+    mostrare i risultati appena disponibili senza ripeterli.
+    """
+    finished = []
+    for job in get_jobs():
+        if job.status in (DONE, FAILED) and not job.reported:
+            job.reported = True
+            finished.append(job)
+    return finished
+
+
+def get_job_stats():
+    """
+    Riepilogo delle attività
+
+    Returns:
+        Dizionario con submitted, pending, running, done, failed
+    """
+    stats = {"submitted": 0, PENDING: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+    for job in get_jobs():
+        stats["submitted"] += 1
+        stats[job.status] += 1
+    return stats
+
+
+def flush(timeout=None):
+    """
+    Attende la fine di tutte le attività in sospeso
+
+    Args:
+        timeout: Attesa massima in secondi (default: senza limite)
+
+    Returns:
+        Lista delle attività ancora in corso allo scadere del timeout
+    """
+    futures = [job.future for job in pending_jobs() if job.future is not None]
+    if futures:
+        wait(futures, timeout=timeout)
+    return pending_jobs()
+
+
+def shutdown():
+    """Completa le attività in sospeso e chiude il pool (chiamata anche all'uscita)"""
+    global _executor
+    flush()
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+atexit.register(shutdown)
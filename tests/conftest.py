@@ -0,0 +1,72 @@
+"""
+Fixture comuni dei test: server CheapShark locale (tools/cheapshark_server.py)
+con il client puntato su di esso e la cache su disco disattivata.
+"""
+import pytest
+
+from data import cache, client
+from tools.cheapshark_server import serve_in_background
+
+BACKOFF_BASE = 0.01
+
+
+@pytest.fixture(autouse=True)
+def working_dir(tmp_path, monkeypatch):
+    """Ogni test lavora in una cartella temporanea (cache/, history/, exports/ ...)"""
+    from data import history
+
+    monkeypatch.chdir(tmp_path)
+    yield tmp_path
+    history.close()
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """Avvia un server locale e vi punta il client; restituisce una funzione che lo crea"""
+    servers = []
+    saved = (client.BASE_URL, client.MAX_RETRIES, client.BACKOFF_BASE, client.POOL_SIZE,
+             client.RATE_LIMIT, client.RATE_BURST)
+    # Cache disattivata (come con CHEAPSHARK_CACHE=0): ogni richiesta arriva al server
+    monkeypatch.setattr(cache, "CACHE_ENABLED", False)
+
+    delays = []
+    retry_delay = client.retry_delay
+
+    def recorded_delay(response, attempt):
+        delay = retry_delay(response, attempt)
+        delays.append((response.status_code if response is not None else None, attempt, delay))
+        return delay
+
+    monkeypatch.setattr(client, "retry_delay", recorded_delay)
+
+    def start(max_retries=3, games=20, **kwargs):
+        server, url = serve_in_background(games=games, **kwargs)
+        servers.append(server)
+        client.close_session()
+        client.reset_stats()
+        client.configure(base_url=url, max_retries=max_retries, backoff_base=BACKOFF_BASE,
+                         rate_limit=1000, rate_burst=1000)
+        return server, delays
+
+    yield start
+
+    client.close_session()
+    client.reset_stats()
+    base_url, max_retries, backoff_base, pool_size, rate_limit, rate_burst = saved
+    client.configure(base_url=base_url, max_retries=max_retries, backoff_base=backoff_base,
+                     pool_size=pool_size, rate_limit=rate_limit, rate_burst=rate_burst)
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def wishlist_db(tmp_path, monkeypatch):
+    """Wishlist su un database (e un vecchio wishlist.json) in una cartella temporanea"""
+    from data import wishlist_store
+
+    monkeypatch.setattr(wishlist_store, "WISHLIST_DB", str(tmp_path / "wishlist.sqlite"))
+    monkeypatch.setattr(wishlist_store, "LEGACY_FILE", str(tmp_path / "wishlist.json"))
+    wishlist_store.close()
+    yield tmp_path
+    wishlist_store.close()
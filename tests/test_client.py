@@ -0,0 +1,87 @@
+"""
+Test del client HTTP (data/client.py) contro il server CheapShark locale
+(tools/cheapshark_server.py): retry con backoff su 5xx e 429 e riuso delle
+connessioni della sessione condivisa.
+
+Uso:
+    python -m pytest -q tests
+"""
+import pytest
+import requests
+
+from data import client
+
+
+def test_retries_server_errors_with_backoff(api):
+    server, delays = api(error_rate=0.4, max_retries=10)
+
+    for page in range(10):
+        assert client.get_json("deals", {"pageNumber": page, "pageSize": 5})
+
+    stats = client.get_stats()["deals"]
+    assert server.errors > 0
+    assert stats["requests"] == 10
+    assert stats["errors"] == 0
+    assert stats["retries"] == server.errors
+    assert server.requests == 10 + server.errors
+    # Un'attesa per ogni 5xx, entro il limite esponenziale del tentativo
+    assert len(delays) == server.errors
+    for status, attempt, delay in delays:
+        assert status in (500, 502, 503)
+        assert 0 <= delay <= client.BACKOFF_BASE * 2 ** attempt
+
+
+def test_retries_throttled_requests_with_retry_after(api):
+    server, delays = api(throttle_rate=0.4, retry_after=0, max_retries=10)
+
+    for page in range(10):
+        assert client.get_json("deals", {"pageNumber": page, "pageSize": 5})
+
+    assert server.throttled > 0
+    assert server.errors == 0
+    assert client.get_stats()["deals"]["retries"] == server.throttled
+    # Per un 429 vale Retry-After (0 secondi) invece del backoff
+    assert [status for status, _, _ in delays] == [429] * server.throttled
+    assert all(delay == 0 for _, _, delay in delays)
+
+
+def test_gives_up_after_max_retries(api):
+    server, delays = api(error_rate=1.0, max_retries=2)
+
+    with pytest.raises(requests.HTTPError):
+        client.get_json("stores")
+
+    assert server.requests == 3
+    assert [attempt for _, attempt, _ in delays] == [0, 1]
+    stats = client.get_stats()["stores"]
+    assert stats["errors"] == 1
+    assert stats["retries"] == 2
+
+
+def test_shared_session_reuses_connections(api):
+    server, _ = api(error_rate=0.3)
+
+    session = client.get_session()
+    for page in range(10):
+        client.get_json("deals", {"pageNumber": page, "pageSize": 5})
+
+    assert client.get_session() is session
+    assert server.requests >= 10
+    # Richieste in sequenza, anche dopo un 5xx: una sola connessione keep-alive aperta
+    pools = session.get_adapter(client.BASE_URL).poolmanager.pools
+    assert len(pools) == 1
+    (key,) = pools.keys()
+    pool = pools[key]
+    assert pool.num_connections == 1
+    assert pool.num_requests == server.requests
+
+
+def test_configure_pool_size_replaces_session(api):
+    api()
+
+    session = client.get_session()
+    client.configure(pool_size=4)
+    replaced = client.get_session()
+
+    assert replaced is not session
+    assert replaced.get_adapter(client.BASE_URL)._pool_maxsize == 4
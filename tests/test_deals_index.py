@@ -0,0 +1,75 @@
+"""
+Test dell'indice sugli snapshot (data/deals_index.py): ogni query deve
+restituire le stesse righe di una scansione completa, anche dopo aver
+aggiunto righe con merge.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from data.deals_index import DealsIndex
+from data.filters import filter_deals
+from data.query import Query
+
+QUERIES = [
+    "salePrice <= 9.99",
+    "salePrice < 9.99",
+    "salePrice >= 4.99 and salePrice <= 14.99",
+    "salePrice == 14.99",
+    "salePrice > 5 and savings >= 50 and storeID in (1, 3)",
+    "storeID == 2",
+    "normalPrice >= 29.99 and not storeID == 1",
+    "savings > 90 or salePrice < 1",
+    "title contains 'portal' and salePrice <= 20",
+]
+
+
+def snapshot(rows, seed, stores=4):
+    """Snapshot sintetico con prezzi ripetuti e qualche valore mancante"""
+    rng = np.random.default_rng(seed)
+    normal = rng.choice([4.99, 9.99, 14.99, 29.99, 59.99], rows)
+    savings = rng.choice([0, 10, 25, 50, 75, 90, 95], rows)
+    sale = np.round(normal * (1 - savings / 100), 2)
+    sale[rng.random(rows) < 0.05] = np.nan
+    return pd.DataFrame({
+        "gameID": pd.array(rng.integers(1, 50, rows), dtype="Int32"),
+        "title": rng.choice(["Portal", "Portal 2", "Half-Life 2", "Witcher 3"], rows),
+        "storeID": pd.Categorical(rng.integers(1, stores + 1, rows).astype(str)),
+        "salePrice": sale.astype("float32"),
+        "normalPrice": normal.astype("float32"),
+        "savings": savings.astype("float32"),
+    })
+
+
+def assert_matches_scan(index):
+    for text in QUERIES:
+        expected = np.flatnonzero(Query(text).mask(index.df))
+        assert np.array_equal(index.search_rows(text), expected), text
+    assert index.filter(min_price=4.99, max_price=14.99, min_savings=25, store_id=[1, "2"]).equals(
+        filter_deals(index.df, min_price=4.99, max_price=14.99, min_savings=25, store_id=[1, "2"]))
+
+
+@pytest.mark.parametrize("rows", [37, 500])
+def test_index_matches_full_scan(rows):
+    index = DealsIndex(snapshot(rows, seed=rows))
+
+    assert_matches_scan(index)
+    # I limiti sono prezzi presenti nello snapshot (float32)
+    assert len(index.search_rows("salePrice == 14.99")) > 0
+
+
+def test_index_matches_full_scan_after_merges():
+    index = DealsIndex(snapshot(101, seed=1))
+    # Pagine di dimensioni non multiple di 8 (bitmap), con uno store nuovo e una senza prezzi
+    pages = [snapshot(13, seed=2), snapshot(50, seed=3, stores=6), snapshot(1, seed=4)]
+    pages[2]["salePrice"] = np.float32(np.nan)
+    for page in pages:
+        index.merge(page)
+        assert_matches_scan(index)
+
+    full = pd.concat([snapshot(101, seed=1)] + pages, ignore_index=True)
+    assert len(index) == len(full)
+    assert index.df.astype({"storeID": str}).equals(full.astype({"storeID": str}))
+    assert sorted(index.store_ids()) == ["1", "2", "3", "4", "5", "6"]
+    assert np.array_equal(index.search_rows("storeID == 6"), np.flatnonzero(Query("storeID == 6").mask(full)))
+    assert np.array_equal(DealsIndex(full).search_rows(QUERIES[4]), index.search_rows(QUERIES[4]))
@@ -0,0 +1,69 @@
+"""
+Test del confronto tra snapshot (data/diff.py): classificazione delle
+offerte e titoli delle offerte terminate.
+"""
+import pandas as pd
+
+from data.diff import diff_snapshots, diff_with_previous, summarize_diff
+
+
+def snapshot(rows):
+    """rows: lista di (gameID, storeID, salePrice, normalPrice)"""
+    game_ids, store_ids, sale, normal = zip(*rows)
+    return pd.DataFrame({
+        "gameID": pd.array(game_ids, dtype="Int32"),
+        "storeID": pd.Categorical([str(store_id) for store_id in store_ids]),
+        "salePrice": pd.array(sale, dtype="float32"),
+        "normalPrice": pd.array(normal, dtype="float32"),
+    })
+
+
+def changes(diff):
+    return {(int(row.gameID), str(row.storeID)): str(row.change) for row in diff.itertuples(index=False)}
+
+
+def test_classifies_every_changed_row():
+    previous = snapshot([(1, 1, 9.99, 19.99), (2, 1, 4.99, 9.99), (3, 2, 14.99, 29.99),
+                         (4, 1, 7.49, 14.99), (5, 1, 2.99, 5.99), (6, 3, 1.99, 3.99)])
+    current = snapshot([(1, 1, 7.99, 19.99), (2, 1, 5.99, 9.99), (3, 2, 14.99, 39.99),
+                        (4, 1, 7.49, 14.99), (6, 3, 1.99, 3.99), (7, 1, 0.99, 9.99)])
+
+    diff = diff_snapshots(previous, current)
+
+    assert changes(diff) == {
+        (1, "1"): "price_dropped",
+        (2, "1"): "price_raised",
+        (3, "2"): "changed",
+        (5, "1"): "ended",
+        (7, "1"): "new",
+    }
+    counts = summarize_diff(diff)
+    assert counts == {"new": 1, "ended": 1, "price_dropped": 1, "price_raised": 1, "changed": 1}
+
+    changed = diff[diff["change"] == "changed"].iloc[0]
+    assert changed["oldPrice"] == changed["newPrice"] == 14.99
+    assert changed["priceChange"] == 0
+    assert changed["normalPrice"] == pd.Series([39.99], dtype="float32")[0]
+
+
+def test_identical_snapshots_have_no_changes():
+    rows = [(1, 1, 9.99, 19.99), (2, 1, 4.99, 9.99)]
+    assert diff_snapshots(snapshot(rows), snapshot(rows)).empty
+
+
+def test_ended_rows_keep_title_from_previous_snapshot(tmp_path):
+    path = str(tmp_path / "last_snapshot.pkl")
+    games = pd.DataFrame({"title": ["Portal", "Half-Life 2"]}, index=pd.Index([1, 2], dtype="Int32"))
+    diff, had_previous = diff_with_previous(snapshot([(1, 1, 9.99, 19.99), (2, 1, 4.99, 9.99)]),
+                                            path=path, games=games)
+    assert not had_previous
+    assert set(diff["change"]) == {"new"}
+
+    # Il gioco 2 non è più nella tabella giochi corrente
+    games = pd.DataFrame({"title": ["Portal", "Portal 2"]}, index=pd.Index([1, 3], dtype="Int32"))
+    diff, had_previous = diff_with_previous(snapshot([(1, 1, 7.99, 19.99), (3, 1, 8.99, 9.99)]),
+                                            path=path, games=games)
+    assert had_previous
+
+    titles = {str(row.change): row.title for row in diff.itertuples(index=False)}
+    assert titles == {"ended": "Half-Life 2", "price_dropped": "Portal", "new": "Portal 2"}
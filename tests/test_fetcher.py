@@ -0,0 +1,86 @@
+"""
+Test delle funzioni API (data/fetcher.py) contro il server CheapShark locale.
+"""
+from data import client, fetcher
+from data.parser import game_deal_batches_to_dataframe, game_details_to_dataframe
+
+
+def test_get_deals_decodes_incrementally(api):
+    api(games=200, max_page_size=1000)
+
+    deals = fetcher.get_deals(params={"pageSize": 500})
+
+    assert deals == client.get_json("deals", {"pageSize": 500}, use_cache=False)
+    assert len(deals) == 500
+
+
+def test_game_details_stream_matches_json(api):
+    api()
+    expected = client.get_json("games", {"id": 7}, use_cache=False)
+
+    assert fetcher.get_game_details(7) == expected
+    with fetcher.open_game_details_stream(7) as stream:
+        deals_df = game_deal_batches_to_dataframe(stream.batches(2))
+        assert stream.extra == {k: v for k, v in expected.items() if k != "deals"}
+    assert deals_df.equals(game_details_to_dataframe(expected))
+
+
+def test_unknown_game_has_no_details(api):
+    api()
+
+    assert fetcher.get_game_details(999999) == []
+    with fetcher.open_game_details_stream(999999) as stream:
+        assert game_deal_batches_to_dataframe(stream.batches(10)).empty
+        assert stream.extra == {}
+
+
+def test_stream_deals_fetches_every_page_once(api, monkeypatch):
+    server, _ = api(games=50, latency=0.02, max_page_size=1000)
+    expected = [deal["dealID"] for deal in client.get_json("deals", {"pageSize": 1000}, use_cache=False)]
+    requests_before = server.requests
+
+    in_flight = []
+    peak = []
+    fetch_page = fetcher._fetch_deals_page
+
+    def tracked(params, page_number, page_size):
+        in_flight.append(page_number)
+        peak.append(len(in_flight))
+        try:
+            return fetch_page(params, page_number, page_size)
+        finally:
+            in_flight.remove(page_number)
+
+    monkeypatch.setattr(fetcher, "_fetch_deals_page", tracked)
+    batches = list(fetcher.stream_deals(page_size=10, max_workers=3))
+
+    ids = [deal["dealID"] for batch in batches for deal in batch]
+    assert len(expected) == 150
+    assert sorted(ids) == sorted(expected)
+    assert len(batches) == 15
+    # Una richiesta per pagina (X-Total-Page-Count = 15), al più 3 in volo
+    assert server.requests - requests_before == 15
+    assert 1 < max(peak) <= 3
+
+
+def test_stream_deals_yields_batches_as_they_arrive(api):
+    server, _ = api(games=50, latency=0.02)
+
+    stream = fetcher.stream_deals(page_size=10, max_workers=2)
+    first = next(stream)
+    # La prima pagina arriva prima che le altre siano richieste
+    assert len(first) == 10
+    assert server.requests == 1
+
+    next(stream)
+    assert server.requests < 15
+    stream.close()
+
+
+def test_stream_deals_respects_max_pages(api):
+    server, _ = api(games=50)
+
+    batches = list(fetcher.stream_deals(page_size=10, max_pages=4))
+
+    assert [len(batch) for batch in batches] == [10] * 4
+    assert server.requests == 4
@@ -0,0 +1,127 @@
+"""
+Test dello storico prezzi (data/history.py): deduplicazione rispetto a
+`latest`, offerte terminate e riprese, snapshot nello stesso secondo.
+"""
+import sqlite3
+
+import pandas as pd
+
+from data import history
+
+
+def snapshot(prices, store="1"):
+    """Snapshot con un'offerta per gioco: {gameID: prezzo}"""
+    return pd.DataFrame({
+        "gameID": list(prices),
+        "storeID": pd.Categorical([store] * len(prices)),
+        "salePrice": pd.array(list(prices.values()), dtype="float32"),
+        "normalPrice": pd.array([59.99] * len(prices), dtype="float32"),
+        "savings": pd.array([50.0] * len(prices), dtype="float32"),
+        "dealID": [f"deal-{game_id}" for game_id in prices],
+    })
+
+
+def changes(game_id):
+    """[(timestamp, prezzo, variazione)] di un gioco"""
+    df = history.price_history(game_id)
+    return list(zip(df["timestamp"], df["salePrice"], df["change"]))
+
+
+def latest(game_id):
+    return history._get_conn().execute(
+        "SELECT sale_price, low_price, active FROM latest WHERE game_id = ?", (game_id,)).fetchone()
+
+
+def test_start_change_and_dedup():
+    assert history.record_snapshot(snapshot({1: 9.99, 2: 4.99}), 100)["inserted"] == 2
+    result = history.record_snapshot(snapshot({1: 9.99, 2: 3.99}), 200)
+    history.record_snapshot(snapshot({1: 12.99, 2: 3.99}), 300)
+
+    assert result == {"rows": 2, "inserted": 1, "unchanged": 1, "ended": 0}
+    assert changes(1) == [(100, 9.99, "new"), (300, 12.99, "price_raised")]
+    assert changes(2) == [(100, 4.99, "new"), (200, 3.99, "price_dropped")]
+    assert latest(2) == (3.99, 3.99, 1)
+
+
+def test_ended_deal_restarting_at_same_price_is_new():
+    history.record_snapshot(snapshot({1: 9.99, 2: 4.99}), 100)
+    result = history.record_snapshot(snapshot({1: 9.99}), 200)
+    assert result["ended"] == 1
+    assert latest(2) == (4.99, 4.99, 0)
+
+    # Ancora assente: non viene terminata di nuovo
+    assert history.record_snapshot(snapshot({1: 9.99}), 300)["ended"] == 0
+
+    result = history.record_snapshot(snapshot({1: 9.99, 2: 4.99}), 400)
+    assert result["inserted"] == 1
+    assert changes(2) == [(100, 4.99, "new"), (200, 4.99, "ended"), (400, 4.99, "new")]
+    assert latest(2) == (4.99, 4.99, 1)
+    started = history.deals_started_since(400)
+    assert started["gameID"].tolist() == [2]
+
+
+def test_partial_and_empty_snapshots_do_not_end_deals():
+    history.record_snapshot(snapshot({1: 9.99, 2: 4.99}), 100)
+
+    assert history.record_snapshot(snapshot({1: 8.99}), 200, complete=False)["ended"] == 0
+    assert history.record_snapshot(snapshot({}), 300)["rows"] == 0
+    assert latest(2)[2] == 1
+    assert changes(1)[-1] == (200, 8.99, "price_dropped")
+
+
+def test_same_second_snapshots_keep_latest_in_sync():
+    history.record_snapshot(snapshot({1: 10.0, 2: 10.0, 3: 10.0}), 100)
+
+    history.record_snapshot(snapshot({1: 8.0, 2: 12.0, 3: 10.0}), 200)
+    # Stesso secondo: 1 scende ancora (resta una riga), 2 torna al prezzo precedente
+    result = history.record_snapshot(snapshot({1: 9.0, 2: 10.0, 3: 10.0}), 200)
+
+    assert result["inserted"] == 1
+    assert changes(1) == [(100, 10.0, "new"), (200, 9.0, "price_dropped")]
+    assert changes(2) == [(100, 10.0, "new")]
+    assert latest(1) == (9.0, 8.0, 1)
+    assert latest(2) == (10.0, 10.0, 1)
+
+
+def test_same_second_end_and_restart():
+    history.record_snapshot(snapshot({1: 10.0, 2: 10.0}), 100)
+
+    history.record_snapshot(snapshot({1: 10.0}), 200)
+    assert changes(2)[-1] == (200, 10.0, "ended")
+    # Ricompare nello stesso secondo allo stesso prezzo: fine e ripresa si annullano
+    history.record_snapshot(snapshot({1: 10.0, 2: 10.0}), 200)
+    assert changes(2) == [(100, 10.0, "new")]
+    assert latest(2) == (10.0, 10.0, 1)
+
+    # Nuova nello stesso secondo in cui termina: una sola riga, terminata
+    history.record_snapshot(snapshot({1: 10.0, 2: 10.0, 3: 5.0}), 300)
+    history.record_snapshot(snapshot({1: 10.0, 2: 10.0}), 300)
+    assert changes(3) == [(300, 5.0, "ended")]
+    assert latest(3) == (5.0, 5.0, 0)
+
+
+def test_ended_rows_do_not_count_as_volatility():
+    history.record_snapshot(snapshot({1: 10.0, 2: 10.0}), 100)
+    history.record_snapshot(snapshot({1: 10.0}), 200)
+    history.record_snapshot(snapshot({1: 20.0}), 300)
+
+    volatility = history.price_volatility([1, 2])
+    assert set(volatility) == {"1"}
+
+
+def test_old_database_gets_active_column(working_dir):
+    path = working_dir / history.HISTORY_FILE
+    path.parent.mkdir()
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE latest (game_id INTEGER NOT NULL, store_id INTEGER NOT NULL, ts INTEGER NOT NULL,
+                             sale_price REAL NOT NULL, low_price REAL NOT NULL, low_ts INTEGER NOT NULL,
+                             PRIMARY KEY (game_id, store_id)) WITHOUT ROWID
+    """)
+    conn.execute("INSERT INTO latest VALUES (1, 1, 100, 9.99, 9.99, 100)")
+    conn.commit()
+    conn.close()
+
+    assert latest(1) == (9.99, 9.99, 1)
+    assert history.record_snapshot(snapshot({2: 4.99}), 200)["ended"] == 1
+    assert latest(1)[2] == 0
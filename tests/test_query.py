@@ -0,0 +1,83 @@
+"""
+Test del linguaggio di filtro (data/query.py): le condizioni spinte
+nell'API e il filtro in memoria devono dare le stesse offerte, su un
+catalogo piccolo del server locale scaricato in più pagine.
+"""
+import pandas as pd
+import pytest
+
+from data import fetcher
+from data.parser import deals_to_dataframe
+from data.query import Query
+
+
+@pytest.fixture
+def catalog(api):
+    """Tutte le offerte del server locale (60 giochi, pagine da 25)"""
+    api(games=60, max_page_size=25)
+    return pd.concat([deals_to_dataframe(batch) for batch in fetcher.stream_deals(page_size=25)],
+                     ignore_index=True)
+
+
+def deal_ids(df):
+    return sorted(df["dealID"].astype(str)) if not df.empty else []
+
+
+def assert_same_result(text, catalog):
+    query = Query(text)
+    local = query.apply(catalog)
+    assert deal_ids(query.fetch()) == deal_ids(local), query.explain()
+    return query, local
+
+
+@pytest.mark.parametrize("text", [
+    "salePrice <= 10",
+    "salePrice < 10 and savings >= 50",
+    "salePrice > 4.5 and salePrice <= 20",
+    "storeID in (1, 7) and salePrice <= 15",
+    "storeID == 2 or salePrice < 3",
+    "not storeID == 1 and salePrice >= 5",
+])
+def test_pushdown_matches_in_memory_filter(text, catalog):
+    query, local = assert_same_result(text, catalog)
+    assert 0 < len(local) < len(catalog)
+
+
+def test_float32_price_bounds_are_inclusive(catalog):
+    # Un prezzo con i centesimi presente nel catalogo (float32, es. 9.99)
+    prices = sorted({float(f"{price:.2f}") for price in catalog["salePrice"]})
+    price = next(price for price in prices[len(prices) // 2:] if price != int(price))
+    at_price = (catalog["salePrice"] == catalog["salePrice"].dtype.type(price)).sum()
+    assert at_price > 0
+
+    for text in (f"salePrice <= {price}", f"salePrice >= {price}", f"salePrice >= {price} and salePrice <= {price}"):
+        query, local = assert_same_result(text, catalog)
+        # Il limite non coincide con un intero: l'API riceve un limite più largo e il
+        # confronto esatto resta locale
+        assert query.local is not None
+        assert len(local) >= at_price
+
+    _, local = assert_same_result(f"salePrice < {price}", catalog)
+    assert price not in {float(f"{value:.2f}") for value in local["salePrice"]}
+
+
+def test_explain_lists_pushed_and_local_conditions():
+    query = Query("salePrice <= 9.99 and storeID in (1, 7) and savings >= 75")
+
+    assert query.api_params == {"upperPrice": 10, "storeID": "1,7"}
+    plan = query.explain()
+    assert "upperPrice=10" in plan
+    assert "storeID=1,7" in plan
+    assert "parametri: upperPrice=10&storeID=1,7" in plan
+    local = plan.split("Locale:")[1]
+    assert "salePrice <= 9.99" in local
+    assert "savings >= 75" in local
+    assert "storeID" not in local
+
+
+def test_exact_integer_bound_is_answered_by_api():
+    query = Query("salePrice <= 10 and storeID == 1")
+
+    assert query.api_params == {"upperPrice": 10, "storeID": "1"}
+    assert query.local is None
+    assert "(nessuna condizione)" in query.explain().split("Locale:")[1]
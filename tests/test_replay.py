@@ -0,0 +1,52 @@
+"""
+Test di registrazione e replay delle risposte (data/replay.py), anche per le
+richieste decodificate a pezzi (stream=True).
+"""
+import pytest
+import requests
+
+from data import fetcher, replay
+from data.parser import deal_batches_to_dataframe
+
+
+@pytest.fixture
+def archive(tmp_path):
+    yield str(tmp_path / "cheapshark.jsonl.gz")
+    replay.stop()
+
+
+def test_replays_streamed_responses(api, archive):
+    server, _ = api(games=50, max_page_size=1000)
+
+    replay.start_recording(archive)
+    deals = list(fetcher.iter_deals(chunk_size=7, page_size=100))
+    details = fetcher.get_game_details(3)
+    stores = fetcher.get_stores()
+    replay.stop()
+    recorded = server.requests
+
+    adapter = replay.start_replay(archive)
+    replayed = list(fetcher.iter_deals(chunk_size=7, page_size=100))
+
+    assert [len(batch) for batch in replayed] == [len(batch) for batch in deals]
+    assert replayed == deals
+    assert deal_batches_to_dataframe(iter(replayed)).equals(deal_batches_to_dataframe(iter(deals)))
+    assert fetcher.get_game_details(3) == details
+    assert fetcher.get_stores() == stores
+    assert adapter.misses == []
+    # Nessuna richiesta al server durante il replay
+    assert server.requests == recorded
+
+
+def test_missing_fixture_is_a_404(api, archive):
+    api()
+
+    replay.start_recording(archive)
+    fetcher.get_stores()
+    replay.stop()
+
+    adapter = replay.start_replay(archive)
+    with pytest.raises(requests.HTTPError) as error:
+        list(fetcher.iter_deals())
+    assert "404" in str(error.value)
+    assert adapter.misses == ["deals"]
@@ -0,0 +1,70 @@
+"""
+Test dello scheduler dei controlli della wishlist (data/scheduler.py).
+"""
+from datetime import datetime
+
+from data import scheduler, wishlist, wishlist_store
+from data.scheduler import MAX_INTERVAL, MIN_INTERVAL, RefreshScheduler, refresh_interval
+
+
+def item(game_id=1, target=10.0, last=None, lowest=None, checked="2026-01-01T12:00:00"):
+    return {"gameID": str(game_id), "title": f"Game {game_id}", "targetPrice": target,
+            "lastChecked": checked, "lowestPriceSeen": lowest, "lastPrice": last}
+
+
+def test_interval_grows_with_distance_from_target():
+    intervals = [refresh_interval(item(last=price)) for price in (8.0, 10.0, 12.0, 15.0, 18.0, 20.0, 40.0)]
+
+    assert intervals[0] == intervals[1] == MIN_INTERVAL
+    assert intervals == sorted(intervals)
+    assert len(set(intervals[1:6])) == 5
+    assert intervals[-2] == intervals[-1] == MAX_INTERVAL
+
+
+def test_interval_uses_last_price_not_all_time_low():
+    # Sceso una volta al target, ora lontano: non resta all'intervallo minimo
+    dipped = item(last=30.0, lowest=10.0)
+    assert refresh_interval(dipped) == MAX_INTERVAL
+    assert refresh_interval(item(last=10.5, lowest=30.0)) < refresh_interval(item(last=15.0, lowest=10.0))
+
+
+def test_interval_falls_back_to_lowest_price_seen():
+    assert refresh_interval(item(lowest=15.0)) == refresh_interval(item(last=15.0))
+    # Nessun prezzo noto: si controlla il prima possibile
+    assert refresh_interval(item()) == MIN_INTERVAL
+
+
+def test_volatility_shortens_interval():
+    steady = refresh_interval(item(last=15.0), volatility=0.0)
+    volatile = refresh_interval(item(last=15.0), volatility=0.5)
+    assert MIN_INTERVAL <= volatile < steady
+
+
+def test_scheduler_pops_closest_to_target_first():
+    checked = "2026-01-01T12:00:00"
+    base = datetime.fromisoformat(checked).timestamp()
+    items = [item(1, last=30.0, lowest=9.0), item(2, last=11.0), item(3, last=16.0), item(4, checked=None)]
+    queue = RefreshScheduler()
+    queue.load(items, volatility={})
+
+    due = queue.pop_due(now=base + MAX_INTERVAL, limit=10)
+
+    # Mai controllato, poi per distanza dal target (l'ultimo prezzo, non il minimo)
+    assert [entry["gameID"] for entry in due] == ["4", "2", "3", "1"]
+    assert queue.pop_due(now=base + MAX_INTERVAL) == []
+
+
+def test_check_records_last_price(api, wishlist_db):
+    api()
+    wishlist.add_to_wishlist("5", "Game 5", target_price=0.01)
+    wishlist_store.record_checks([{"gameID": "5", "lastChecked": "2026-01-01T12:00:00",
+                                   "lowestPriceSeen": 0.5, "lastPrice": 0.5}])
+
+    report = scheduler.run_due_checks(deadline=10)
+
+    assert report["checked"] == 1
+    saved = wishlist_store.get_item("5")
+    # Il minimo storico resta, l'ultimo prezzo è quello del controllo
+    assert saved["lowestPriceSeen"] == 0.5
+    assert saved["lastPrice"] > 0.5
+    assert refresh_interval(saved) == MAX_INTERVAL
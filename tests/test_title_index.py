@@ -0,0 +1,66 @@
+"""
+Test dell'indice dei titoli (data/title_index.py): aggiornamenti incrementali
+e salvataggio su disco.
+"""
+import pandas as pd
+import pytest
+
+from data import title_index
+from data.title_index import TitleIndex
+
+
+def deals(prices, titles=None):
+    titles = titles or {1: "Half-Life 2", 2: "Portal", 3: "The Witcher 3: Wild Hunt"}
+    return pd.DataFrame({
+        "gameID": list(prices),
+        "title": [titles[game_id] for game_id in prices],
+        "salePrice": pd.array(list(prices.values()), dtype="float32"),
+        "steamAppID": ["220", "400", "292030"][:len(prices)],
+    })
+
+
+@pytest.fixture
+def shared_index(tmp_path, monkeypatch):
+    """Indice condiviso salvato in una cartella temporanea"""
+    path = str(tmp_path / "title_index.npz")
+    monkeypatch.setattr(title_index, "INDEX_FILE", path)
+    monkeypatch.setattr(title_index, "_index", None)
+    return path
+
+
+def test_price_only_update_is_saved(shared_index):
+    assert title_index.update_index(deals({1: 9.99, 2: 4.99, 3: 19.99})) == 3
+
+    # Stessi titoli, prezzi diversi: nessun trigramma cambia ma l'indice va salvato
+    assert title_index.update_index(deals({1: 1.99, 2: 4.99, 3: 14.99})) == 0
+    assert not title_index.get_index().dirty
+
+    reloaded = TitleIndex.load(shared_index)
+    prices = {result["gameID"]: result["cheapest"] for result in reloaded.search("half life 2")}
+    assert prices["1"] == "1.99"
+    assert reloaded.search("witcher 3")[0]["cheapest"] == "14.99"
+
+
+def test_unchanged_snapshot_is_not_dirty(tmp_path):
+    index = TitleIndex()
+    index.update_from_frame(deals({1: 9.99, 2: 4.99}))
+    index.save(str(tmp_path / "index.npz"))
+
+    index.update_from_frame(deals({1: 9.99, 2: 4.99}))
+    assert not index.dirty
+    index.update_from_frame(deals({1: 9.99, 2: 3.99}))
+    assert index.dirty
+
+
+def test_renamed_game_keeps_price_and_is_found(tmp_path):
+    path = str(tmp_path / "index.npz")
+    index = TitleIndex()
+    index.update_from_frame(deals({1: 9.99}))
+    assert index.add(1, "Half-Life 2: Episode One")
+    index.save(path)
+
+    reloaded = TitleIndex.load(path)
+    assert len(reloaded) == 1
+    result = reloaded.search("episode one")[0]
+    assert result["gameID"] == "1"
+    assert result["cheapest"] == "9.99"
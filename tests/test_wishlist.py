@@ -0,0 +1,38 @@
+"""
+Test del controllo prezzi della wishlist (data/wishlist.py) contro il server
+CheapShark locale.
+"""
+from data import wishlist, wishlist_store
+
+
+def item(game_id, target=100.0):
+    return {"gameID": game_id, "title": f"Game {game_id}", "targetPrice": target}
+
+
+def test_items_without_id_are_reported(api, wishlist_db):
+    server, _ = api()
+    items = [item("3"), item(None), item("")]
+
+    report = wishlist.check_wishlist_report(items, deadline=10)
+
+    assert report["checked"] == 1
+    assert [(failure["gameID"], failure["reason"]) for failure in report["failed"]] == [
+        (None, "missing_id"), ("", "missing_id"),
+    ]
+    assert server.requests == 1
+
+
+def test_batch_timeout_fails_whole_batch(api, wishlist_db):
+    server, _ = api(latency=0.5)
+    items = [item(str(game_id)) for game_id in range(1, 6)]
+    for entry in items:
+        wishlist_store.insert(entry)
+
+    report = wishlist.check_wishlist_report(items, deadline=10, batch_timeout=0.05, batch_size=2)
+
+    # Tre lotti (2 + 2 + 1 giochi), ognuno scaduto per conto suo
+    assert report["complete"]
+    assert report["checked"] == 0
+    assert sorted(failure["gameID"] for failure in report["failed"]) == ["1", "2", "3", "4", "5"]
+    assert {failure["reason"] for failure in report["failed"]} == {"timeout"}
+    assert all(entry["lastChecked"] is None for entry in wishlist_store.all_items())
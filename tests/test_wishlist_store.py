@@ -0,0 +1,115 @@
+"""
+Test dell'archivio SQLite della wishlist (data/wishlist_store.py):
+migrazione da wishlist.json e dallo schema 1, idempotenza delle
+migrazioni e di record_checks.
+"""
+import json
+import sqlite3
+
+from data import wishlist_store
+
+LEGACY_ITEMS = [
+    {"gameID": "612", "title": "LEGO Batman", "targetPrice": 5.0, "addedDate": "2024-01-02T10:00:00",
+     "lastChecked": "2024-01-03T10:00:00", "lowestPriceSeen": 6.49},
+    {"gameID": "146", "title": "Portal 2", "targetPrice": 2.5, "addedDate": "2024-01-04T10:00:00",
+     "lastChecked": None, "lowestPriceSeen": None},
+    {"gameID": None, "title": "Senza ID"},
+]
+
+
+def write_legacy(folder, items=LEGACY_ITEMS):
+    path = folder / "wishlist.json"
+    path.write_text(json.dumps(items), encoding="utf-8")
+    return path
+
+
+def schema_version():
+    return wishlist_store._get_conn().execute("PRAGMA user_version").fetchone()[0]
+
+
+def test_legacy_json_round_trip(wishlist_db):
+    legacy = write_legacy(wishlist_db)
+
+    items = wishlist_store.all_items()
+
+    expected = [dict(item, lastPrice=None) for item in LEGACY_ITEMS if item["gameID"] is not None]
+    assert items == expected
+    assert schema_version() == wishlist_store.SCHEMA_VERSION
+    assert not legacy.exists()
+    migrated = wishlist_db / "wishlist.json.migrated"
+    assert json.loads(migrated.read_text(encoding="utf-8")) == LEGACY_ITEMS
+
+
+def test_migration_runs_once(wishlist_db):
+    write_legacy(wishlist_db)
+    assert wishlist_store.count() == 2
+    wishlist_store.delete("146")
+    wishlist_store.close()
+
+    # Un nuovo wishlist.json dopo la migrazione non viene reimportato
+    write_legacy(wishlist_db, [{"gameID": "999", "title": "Nuovo"}])
+    assert [item["gameID"] for item in wishlist_store.all_items()] == ["612"]
+    assert (wishlist_db / "wishlist.json").exists()
+    assert schema_version() == wishlist_store.SCHEMA_VERSION
+
+
+def test_schema_1_database_is_upgraded(wishlist_db):
+    conn = sqlite3.connect(wishlist_store.WISHLIST_DB)
+    conn.execute("""
+        CREATE TABLE wishlist (
+            game_id TEXT PRIMARY KEY,
+            title TEXT,
+            target_price REAL,
+            added_date TEXT,
+            last_checked TEXT,
+            lowest_price_seen REAL
+        )
+    """)
+    conn.execute("INSERT INTO wishlist VALUES ('612', 'LEGO Batman', 5.0, '2024-01-02', NULL, 6.49)")
+    conn.execute("PRAGMA user_version = 1")
+    conn.commit()
+    conn.close()
+    # Con lo schema 1 wishlist.json era già stato importato: non va reimportato
+    write_legacy(wishlist_db)
+
+    assert wishlist_store.all_items() == [{
+        "gameID": "612", "title": "LEGO Batman", "targetPrice": 5.0, "addedDate": "2024-01-02",
+        "lastChecked": None, "lowestPriceSeen": 6.49, "lastPrice": None,
+    }]
+    assert schema_version() == 2
+    assert (wishlist_db / "wishlist.json").exists()
+
+    # Riaprire un database già aggiornato non cambia nulla
+    wishlist_store.close()
+    assert wishlist_store.update_fields("612", lastPrice=7.99)
+    wishlist_store.close()
+    assert wishlist_store.get_item("612")["lastPrice"] == 7.99
+    assert schema_version() == 2
+
+
+def test_record_checks_is_idempotent(wishlist_db):
+    for item in LEGACY_ITEMS[:2]:
+        assert wishlist_store.insert(item)
+    checks = [
+        {"gameID": "612", "lastChecked": "2024-02-01T10:00:00", "lowestPriceSeen": 7.99, "lastPrice": 7.99},
+        {"gameID": "146", "lastChecked": "2024-02-01T10:00:00", "lowestPriceSeen": 1.99, "lastPrice": 1.99},
+        {"gameID": "404", "lastChecked": "2024-02-01T10:00:00", "lowestPriceSeen": 0.99, "lastPrice": 0.99},
+    ]
+
+    assert wishlist_store.record_checks(checks) == 2
+    first = wishlist_store.all_items()
+    assert wishlist_store.record_checks(checks) == 2
+    assert wishlist_store.all_items() == first
+
+    by_id = {item["gameID"]: item for item in first}
+    # Il minimo storico resta il più basso; l'ultimo prezzo è quello del controllo
+    assert by_id["612"]["lowestPriceSeen"] == 6.49
+    assert by_id["612"]["lastPrice"] == 7.99
+    assert by_id["146"]["lowestPriceSeen"] == 1.99
+    assert by_id["146"]["lastChecked"] == "2024-02-01T10:00:00"
+    assert "404" not in by_id
+
+    # Un controllo senza prezzi aggiorna solo la data
+    assert wishlist_store.record_checks([{"gameID": "146", "lastChecked": "2024-02-02T10:00:00"}]) == 1
+    item = wishlist_store.get_item("146")
+    assert (item["lastChecked"], item["lowestPriceSeen"], item["lastPrice"]) == ("2024-02-02T10:00:00", 1.99, 1.99)
@@ -0,0 +1,434 @@
+"""
+Server HTTP locale che emula l'API CheapShark, per test e benchmark offline.
+
+Genera un catalogo sintetico deterministico (stesso seed = stessi dati) e
+risponde a /deals (con paginazione e header X-Total-Page-Count),
+/games?title=, /games?id=, /games?ids= e /stores. Latenza ed errori
+429/5xx possono essere iniettati per simulare un'API sotto carico. Con
+un archivio di fixture (vedi data/replay.py) serve le risposte registrate.
+
+Uso:
+    python -m tools.cheapshark_server --port 8765 --games 100000 --latency 0.02
+
+    # da codice (test/benchmark)
+    server, base_url = serve_in_background(games=1000)
+    client.configure(base_url=base_url)
+"""
+import argparse
+import base64
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+from data.replay import fixture_key, load_archive
+
+STORE_NAMES = [
+    "Steam", "GamersGate", "GreenManGaming", "Amazon", "GameStop", "Direct2Drive",
+    "GOG", "Origin", "Get Games", "Shiny Loot", "Humble Store", "Desura",
+    "Uplay", "IndieGameStand", "Fanatical", "Gamesrocket", "Games Republic",
+    "SilaGames", "Playfield", "ImperialGames", "WinGameStore", "FunStockDigital",
+    "GameBillet", "Voidu", "Epic Games Store", "Razer Game Store", "Gamesplanet",
+    "Gamesload", "2Game", "IndieGala", "Blizzard Shop", "AllYouPlay", "DLGamer",
+    "Noctre", "DreamGame",
+]
+
+TITLE_WORDS = [
+    "Dark", "Lost", "Star", "Iron", "Shadow", "Crystal", "Dragon", "Neon",
+    "Silent", "Crimson", "Eternal", "Broken", "Hidden", "Wild", "Frozen",
+    "Legend", "Kingdom", "Quest", "Tactics", "Souls", "Rising", "Odyssey",
+    "Chronicles", "Empire", "Frontier", "Protocol", "Hunter", "Saga",
+]
+
+RATINGS = [
+    (95, "Overwhelmingly Positive"), (85, "Very Positive"), (75, "Mostly Positive"),
+    (60, "Mixed"), (35, "Mostly Negative"), (0, None),
+]
+
+# PNG 1x1 usata come thumbnail
+THUMB_PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg=="
+)
+
+
+class Catalog:
+    """Catalogo sintetico: `games` giochi, ognuno con `deals_per_game` offerte su store diversi"""
+
+    def __init__(self, games=1000, deals_per_game=3, stores=len(STORE_NAMES), seed=42):
+        self.games = games
+        self.deals_per_game = deals_per_game
+        self.stores = min(stores, len(STORE_NAMES))
+        rng = random.Random(seed)
+
+        total = games * deals_per_game
+        self.store_ids = [0] * total
+        self.sale = [0.0] * total
+        self.normal = [0.0] * total
+        self.game_normal = [0.0] * games
+        self.game_rating = [0] * games
+        self.titles = []
+
+        for game in range(games):
+            words = rng.sample(TITLE_WORDS, 2)
+            self.titles.append(f"{words[0]} {words[1]} {game + 1}")
+            normal = rng.choice([4.99, 9.99, 14.99, 19.99, 29.99, 39.99, 59.99, 69.99])
+            self.game_normal[game] = normal
+            self.game_rating[game] = rng.randint(20, 99)
+            stores = rng.sample(range(1, self.stores + 1), min(deals_per_game, self.stores))
+            for j in range(deals_per_game):
+                i = game * deals_per_game + j
+                self.store_ids[i] = stores[j % len(stores)]
+                discount = rng.choice([0, 0, 10, 25, 33, 50, 60, 75, 80, 90])
+                self.normal[i] = normal
+                self.sale[i] = round(normal * (100 - discount) / 100, 2)
+
+        self._filtered = {}
+        # Prefisso degli URL delle thumbnail (impostato dal server)
+        self.thumb_base = ""
+
+    def deal_id(self, i):
+        return base64.urlsafe_b64encode(f"deal-{i}".encode()).decode().rstrip("=")
+
+    def rating(self, game):
+        percent = self.game_rating[game]
+        for threshold, text in RATINGS:
+            if percent >= threshold:
+                return percent, text
+        return percent, None
+
+    def deal(self, i):
+        game = i // self.deals_per_game
+        sale = self.sale[i]
+        normal = self.normal[i]
+        savings = (1 - sale / normal) * 100 if normal else 0
+        percent, text = self.rating(game)
+        return {
+            "internalName": self.titles[game].upper().replace(" ", ""),
+            "title": self.titles[game],
+            "metacriticLink": None,
+            "dealID": self.deal_id(i),
+            "storeID": str(self.store_ids[i]),
+            "gameID": str(game + 1),
+            "salePrice": f"{sale:.2f}",
+            "normalPrice": f"{normal:.2f}",
+            "isOnSale": "1" if sale < normal else "0",
+            "savings": f"{savings:.6f}",
+            "metacriticScore": str(percent - 5 if percent > 5 else 0),
+            "steamRatingText": text,
+            "steamRatingPercent": str(percent),
+            "steamRatingCount": str(percent * 37),
+            "steamAppID": str(100000 + game),
+            "releaseDate": 1262304000 + game * 3600,
+            "lastChange": 1700000000 + i,
+            "dealRating": f"{savings / 10:.1f}",
+            "thumb": f"{self.thumb_base}/thumb/{game + 1}.png",
+        }
+
+    def filtered_indices(self, store_id=None, upper_price=None, lower_price=None, on_sale=False,
+                         metacritic=None, steam_rating=None):
+        key = (store_id, upper_price, lower_price, on_sale, metacritic, steam_rating)
+        indices = self._filtered.get(key)
+        if indices is None:
+            stores = None
+            if store_id:
+                stores = set(int(s) for s in str(store_id).split(",") if s.strip())
+            indices = []
+            for i in range(len(self.sale)):
+                if stores is not None and self.store_ids[i] not in stores:
+                    continue
+                if upper_price is not None and self.sale[i] > upper_price:
+                    continue
+                if lower_price is not None and self.sale[i] < lower_price:
+                    continue
+                if on_sale and self.sale[i] >= self.normal[i]:
+                    continue
+                if metacritic is not None or steam_rating is not None:
+                    percent = self.game_rating[i // self.deals_per_game]
+                    if steam_rating is not None and percent < steam_rating:
+                        continue
+                    if metacritic is not None and (percent - 5 if percent > 5 else 0) < metacritic:
+                        continue
+                indices.append(i)
+            self._filtered[key] = indices
+        return indices
+
+    def game_details(self, game_id):
+        try:
+            game = int(game_id) - 1
+        except ValueError:
+            return None
+        if game < 0 or game >= self.games:
+            return None
+
+        first = game * self.deals_per_game
+        deals = []
+        for i in range(first, first + self.deals_per_game):
+            normal = self.normal[i]
+            sale = self.sale[i]
+            deals.append({
+                "storeID": str(self.store_ids[i]),
+                "dealID": self.deal_id(i),
+                "price": f"{sale:.2f}",
+                "retailPrice": f"{normal:.2f}",
+                "savings": f"{(1 - sale / normal) * 100 if normal else 0:.6f}",
+            })
+        deals.sort(key=lambda d: float(d["price"]))
+        return {
+            "info": {
+                "title": self.titles[game],
+                "steamAppID": str(100000 + game),
+                "thumb": f"{self.thumb_base}/thumb/{game + 1}.png",
+            },
+            "cheapestPriceEver": {
+                "price": f"{min(self.sale[first:first + self.deals_per_game]) * 0.9:.2f}",
+                "date": 1600000000 + game,
+            },
+            "deals": deals,
+        }
+
+    def search(self, title, limit=60):
+        needle = title.lower()
+        results = []
+        for game, name in enumerate(self.titles):
+            if needle in name.lower():
+                first = game * self.deals_per_game
+                cheapest = min(self.sale[first:first + self.deals_per_game])
+                best = first + self.sale[first:first + self.deals_per_game].index(cheapest)
+                results.append({
+                    "gameID": str(game + 1),
+                    "steamAppID": str(100000 + game),
+                    "cheapest": f"{cheapest:.2f}",
+                    "cheapestDealID": self.deal_id(best),
+                    "external": name,
+                    "internalName": name.upper().replace(" ", ""),
+                    "thumb": f"{self.thumb_base}/thumb/{game + 1}.png",
+                })
+                if len(results) >= limit:
+                    break
+        return results
+
+    def store_list(self):
+        return [
+            {
+                "storeID": str(i + 1),
+                "storeName": STORE_NAMES[i],
+                "isActive": 1,
+                "images": {"banner": "", "logo": "", "icon": ""},
+            }
+            for i in range(self.stores)
+        ]
+
+
+class CheapSharkHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Header e body in un'unica scrittura: evita l'attesa del delayed ACK in keep-alive
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def send_body(self, status, body, content_type="application/json", headers=None):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body, separators=(",", ":")).encode("utf-8")
+        elif isinstance(body, str):
+            body = body.encode("utf-8")
+
+        etag = None
+        if status == 200:
+            etag = '"' + hashlib.md5(body).hexdigest() + '"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if etag:
+            self.send_header("ETag", etag)
+        for name, value in (headers or {}).items():
+            self.send_header(name, str(value))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def inject_faults(self):
+        """Applica latenza ed errori configurati; True se la richiesta è già stata risposta"""
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency * (0.5 + server.rng.random()))
+
+        with server.lock:
+            server.requests += 1
+            roll = server.rng.random()
+        if roll < server.throttle_rate:
+            with server.lock:
+                server.throttled += 1
+            self.send_body(429, {"error": "Too Many Requests"}, headers={"Retry-After": server.retry_after})
+            return True
+        if roll < server.throttle_rate + server.error_rate:
+            with server.lock:
+                server.errors += 1
+            self.send_body(server.rng.choice([500, 502, 503]), {"error": "Server Error"})
+            return True
+        return False
+
+    def do_GET(self):
+        server = self.server
+        parts = urlsplit(self.path)
+        query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        endpoint = parts.path.rstrip("/").rsplit("/", 1)[-1]
+
+        if parts.path.startswith("/thumb/"):
+            self.send_body(200, THUMB_PNG, content_type="image/png")
+            return
+
+        if self.inject_faults():
+            return
+
+        if server.fixtures is not None:
+            entry = server.fixtures.get(fixture_key(self.path))
+            if entry is not None:
+                body = entry["body"].encode("utf-8")
+                extra = {k: v for k, v in entry["headers"].items() if k not in ("Content-Type", "ETag")}
+                self.send_body(entry["status"], body, headers=extra)
+                return
+
+        catalog = server.catalog
+        if endpoint == "deals":
+            self.handle_deals(catalog, query)
+        elif endpoint == "games":
+            self.handle_games(catalog, query)
+        elif endpoint == "stores":
+            self.send_body(200, catalog.store_list())
+        else:
+            self.send_body(404, {"error": "Not Found"})
+
+    def handle_deals(self, catalog, query):
+        def number(name, cast=float):
+            try:
+                return cast(query[name]) if name in query else None
+            except ValueError:
+                return None
+
+        page_size = min(max(number("pageSize", int) or 60, 1), self.server.max_page_size)
+        page_number = max(number("pageNumber", int) or 0, 0)
+        indices = catalog.filtered_indices(
+            store_id=query.get("storeID"),
+            upper_price=number("upperPrice"),
+            lower_price=number("lowerPrice"),
+            on_sale=query.get("onSale") == "1",
+            metacritic=number("metacritic", int),
+            steam_rating=number("steamRating", int),
+        )
+        total_pages = max(1, (len(indices) + page_size - 1) // page_size)
+        start = page_number * page_size
+        page = [catalog.deal(i) for i in indices[start:start + page_size]]
+        self.send_body(200, page, headers={"X-Total-Page-Count": total_pages})
+
+    def handle_games(self, catalog, query):
+        if "ids" in query:
+            ids = [i for i in query["ids"].split(",") if i][:25]
+            result = {}
+            for game_id in ids:
+                details = catalog.game_details(game_id)
+                if details is not None:
+                    result[game_id] = details
+            self.send_body(200, result)
+        elif "id" in query:
+            details = catalog.game_details(query["id"])
+            self.send_body(200, details if details is not None else [])
+        elif "title" in query:
+            self.send_body(200, catalog.search(query["title"], int(query.get("limit", 60))))
+        else:
+            self.send_body(400, {"error": "Missing parameter"})
+
+
+def make_server(host="127.0.0.1", port=0, games=1000, deals_per_game=3, seed=42,
+                latency=0.0, error_rate=0.0, throttle_rate=0.0, retry_after=1,
+                fixtures=None, verbose=False, max_page_size=60):
+    """
+    Crea il server (non ancora avviato)
+
+    Args:
+        games: Numero di giochi nel catalogo sintetico
+        deals_per_game: Offerte per gioco (su store diversi)
+        latency: Latenza media aggiunta a ogni risposta, in secondi
+        error_rate: Frazione di risposte 5xx
+        throttle_rate: Frazione di risposte 429 (con Retry-After)
+        retry_after: Valore dell'header Retry-After
+        fixtures: Archivio di fixture da servire prima del catalogo sintetico
+        max_page_size: pageSize massimo accettato da /deals (60 come l'API reale;
+            valori più alti servono a simulare payload molto grandi)
+    """
+    server = ThreadingHTTPServer((host, port), CheapSharkHandler)
+    server.daemon_threads = True
+    server.catalog = Catalog(games, deals_per_game, seed=seed)
+    server.latency = latency
+    server.error_rate = error_rate
+    server.throttle_rate = throttle_rate
+    server.retry_after = retry_after
+    server.fixtures = load_archive(fixtures) if fixtures else None
+    server.verbose = verbose
+    server.max_page_size = max_page_size
+    bound_host, bound_port = server.server_address[:2]
+    server.catalog.thumb_base = f"http://{bound_host}:{bound_port}"
+    server.rng = random.Random(seed)
+    server.lock = threading.Lock()
+    server.requests = 0
+    server.errors = 0
+    server.throttled = 0
+    return server
+
+
+def serve_in_background(**kwargs):
+    """
+    Avvia il server in un thread daemon
+
+    Returns:
+        (server, base_url) - chiamare server.shutdown() per fermarlo
+    """
+    server = make_server(**kwargs)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}/api/1.0"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Server locale che emula l'API CheapShark")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--games", type=int, default=10000)
+    parser.add_argument("--deals-per-game", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--fixtures", default=None)
+    parser.add_argument("--max-page-size", type=int, default=60)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.games, args.deals_per_game, args.seed,
+                         args.latency, args.error_rate, args.throttle_rate, args.retry_after,
+                         args.fixtures, args.verbose, args.max_page_size)
+    print(f"CheapShark locale su http://{args.host}:{args.port}/api/1.0 "
+          f"({args.games * args.deals_per_game} offerte)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Server SMTP locale minimo, per provare il sink email del daemon offline.
+
+Accetta qualsiasi mittente e destinatario, non consegna nulla: i messaggi
+ricevuti vengono stampati sulla console e, se richiesto, aggiunti a un file
+mbox. Supporta solo i comandi usati da smtplib (EHLO/HELO, MAIL, RCPT, DATA,
+RSET, NOOP, QUIT).
+
+Uso:
+    python -m tools.smtp_server --port 1025 --mbox alerts.mbox
+
+    # da codice (test)
+    server, address = serve_in_background()
+    server.messages  # messaggi ricevuti (email.message.Message)
+"""
+import argparse
+import email
+import socketserver
+import threading
+import time
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode("ascii"))
+
+    def handle(self):
+        self.reply("220 localhost SMTP di test")
+        sender, recipients = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode("utf-8", "replace").strip()
+            verb = command[:4].upper()
+            if verb in ("EHLO", "HELO"):
+                self.reply("250 localhost")
+            elif verb == "MAIL":
+                sender, recipients = command[10:].strip(), []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                recipients.append(command[8:].strip())
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 Termina con <CRLF>.<CRLF>")
+                self.server.store(sender, recipients, self._read_data())
+                self.reply("250 OK")
+            elif verb == "RSET":
+                sender, recipients = None, []
+                self.reply("250 OK")
+            elif verb == "NOOP":
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Ciao")
+                return
+            else:
+                self.reply("502 Comando non supportato")
+
+    def _read_data(self):
+        lines = []
+        while True:
+            line = self.rfile.readline()
+            if not line or line in (b".\r\n", b".\n"):
+                break
+            # Dot-stuffing (RFC 5321): ".." a inizio riga diventa "."
+            if line.startswith(b".."):
+                line = line[1:]
+            lines.append(line)
+        return b"".join(lines)
+
+
+class SMTPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address, mbox=None, verbose=True):
+        super().__init__(address, SMTPHandler)
+        self.mbox = mbox
+        self.verbose = verbose
+        self.messages = []
+        self._lock = threading.Lock()
+
+    def store(self, sender, recipients, data):
+        message = email.message_from_bytes(data)
+        with self._lock:
+            self.messages.append(message)
+            if self.mbox:
+                with open(self.mbox, "ab") as f:
+                    f.write(f"From {sender.strip('<>') or 'unknown'} {time.asctime()}\n".encode("utf-8"))
+                    f.write(data.replace(b"\r\n", b"\n") + b"\n")
+        if self.verbose:
+            print(f"📧 {sender} -> {', '.join(recipients)}: {message.get('Subject')}", flush=True)
+
+
+def serve_in_background(host="127.0.0.1", port=0, mbox=None, verbose=False):
+    """
+    Avvia il server in un thread daemon
+
+    Returns:
+        (server, "host:porta") - chiamare server.shutdown() per fermarlo
+    """
+    server = SMTPServer((host, port), mbox=mbox, verbose=verbose)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address[:2]
+    return server, f"{host}:{port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Server SMTP locale di test")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1025)
+    parser.add_argument("--mbox", default=None, help="File mbox in cui salvare i messaggi")
+    args = parser.parse_args()
+
+    server = SMTPServer((args.host, args.port), mbox=args.mbox)
+    print(f"SMTP locale su {args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()